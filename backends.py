@@ -0,0 +1,271 @@
+"""Interchangeable CPU inference backends for the detector, and picking the fastest one.
+
+Every backend has the same contract:
+
+    backend.detect_batch(frames, confThreshold) -> [(class IDs, confidences, boxes), ...]
+    backend.detect(img, confThreshold)          -> (class IDs, confidences, boxes)
+
+with class IDs numbered like coco.names (1-based, 90 classes) and boxes as
+x, y, w, h in frame pixels, before NMS, exactly like cv2.dnn_DetectionModel.
+So any backend can be passed to DetectionEngine as net. Rank the backends
+whose model files are present on this machine with `python benchmark.py backends`.
+Racing them at startup is opt-in: the checkout applications pass
+load_fastest_detector() as the detector registry's loader, and
+DetectionEngine uses it without a net when given fastest_backend=True.
+"""
+import abc
+import os
+import time
+
+import cv2
+import numpy as np
+
+from preprocess import BlobPreprocessor
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+# Darknet YOLOv3 predicts the 80 contiguous COCO classes; their IDs in coco.names
+COCO80_TO_91 = np.array([
+    1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 27, 28, 31, 32,
+    33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44, 46, 47, 48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59,
+    60, 61, 62, 63, 64, 65, 67, 70, 72, 73, 74, 75, 76, 77, 78, 79, 80, 81, 82, 84, 85, 86, 87, 88, 89, 90,
+], dtype=np.int32)
+
+
+def corners_to_boxes(corners, width, height):
+    """Normalized x1, y1, x2, y2 rows -> int32 x, y, w, h in pixels."""
+    corners = corners * np.array([width, height, width, height], dtype=np.float32)
+    boxes = np.concatenate([corners[:, :2], corners[:, 2:] - corners[:, :2]], axis=1)
+    return boxes.round().astype(np.int32)
+
+
+# -------------------
+# Backends
+# -------------------
+class Backend(abc.ABC):
+    """Base class: detect() runs detect_batch() on a single frame.
+
+    Backends that can take a ready-made input blob also implement
+    preprocessor() (a preprocess.BlobPreprocessor with the model's input
+    size, scale, mean and channel order) and detect_blob(blob, width,
+    height, confThreshold), so preprocessing can happen elsewhere.
+    """
+
+    name = None
+
+    @staticmethod
+    def available(*paths):
+        """True when the model files exist (and the runtime is installed)."""
+        return all(path and os.path.exists(path) for path in paths)
+
+    def detect(self, img, confThreshold=0.5):
+        return self.detect_batch([img], confThreshold)[0]
+
+    @abc.abstractmethod
+    def detect_batch(self, frames, confThreshold=0.5):
+        """[(class IDs, confidences, boxes)] for every frame of the batch."""
+
+
+class OpenCVSSDBackend(Backend):
+    """SSD MobileNet v3 (TensorFlow frozen graph) on the OpenCV DNN module."""
+
+    name = "opencv-ssd"
+
+    def __init__(self, weights_path, config_path, input_size=320,
+                 dnn_backend=cv2.dnn.DNN_BACKEND_OPENCV, dnn_target=cv2.dnn.DNN_TARGET_CPU):
+        self.net = cv2.dnn.readNet(weights_path, config_path)
+        self.net.setPreferableBackend(dnn_backend)
+        self.net.setPreferableTarget(dnn_target)
+        self.input_size = input_size
+
+    def preprocessor(self, buffers=3):
+        return BlobPreprocessor(self.input_size, 1.0 / 127.5, 127.5, swap_rb=True, buffers=buffers)
+
+    def _forward(self, blob, sizes, confThreshold):
+        self.net.setInput(blob)
+        # DetectionOutput rows: [image in batch, class ID, confidence, x1, y1, x2, y2]
+        out = self.net.forward().reshape(-1, 7)
+        out = out[out[:, 2] > confThreshold]
+        results = []
+        for index, (width, height) in enumerate(sizes):
+            rows = out[out[:, 0] == index]
+            results.append((rows[:, 1].astype(np.int32), rows[:, 2].astype(np.float32),
+                            corners_to_boxes(rows[:, 3:7], width, height)))
+        return results
+
+    def detect_batch(self, frames, confThreshold=0.5):
+        blob = cv2.dnn.blobFromImages(frames, 1.0 / 127.5, (self.input_size, self.input_size),
+                                      (127.5, 127.5, 127.5), swapRB=True)
+        return self._forward(blob, [(img.shape[1], img.shape[0]) for img in frames], confThreshold)
+
+    def detect_blob(self, blob, width, height, confThreshold=0.5):
+        return self._forward(blob, [(width, height)], confThreshold)[0]
+
+
+class OpenCVYOLOBackend(Backend):
+    """Darknet YOLOv3 (the cvlib notebook model) on the OpenCV DNN module.
+
+    Only the unconnected YOLO output layers are computed and read back,
+    not every layer of the network.
+    """
+
+    name = "opencv-yolov3"
+
+    @staticmethod
+    def available(*paths):
+        return hasattr(cv2.dnn, "readNetFromDarknet") and Backend.available(*paths)
+
+    def __init__(self, weights_path, config_path, input_size=416,
+                 dnn_backend=cv2.dnn.DNN_BACKEND_OPENCV, dnn_target=cv2.dnn.DNN_TARGET_CPU):
+        self.net = cv2.dnn.readNetFromDarknet(config_path, weights_path)
+        self.net.setPreferableBackend(dnn_backend)
+        self.net.setPreferableTarget(dnn_target)
+        self.output_layers = self.net.getUnconnectedOutLayersNames()
+        self.input_size = input_size
+
+    def preprocessor(self, buffers=3):
+        return BlobPreprocessor(self.input_size, 1.0 / 255.0, 0.0, swap_rb=True, buffers=buffers)
+
+    def _forward(self, blob, sizes, confThreshold):
+        self.net.setInput(blob)
+        # Rows per image: [cx, cy, w, h, objectness, 80 class scores], normalized
+        outs = np.concatenate([out.reshape(len(sizes), -1, out.shape[-1])
+                               for out in self.net.forward(self.output_layers)], axis=1)
+        results = []
+        for (width, height), rows in zip(sizes, outs):
+            scores = rows[:, 5:]
+            classes = scores.argmax(axis=1)
+            confs = scores[np.arange(len(rows)), classes]
+            keep = confs > confThreshold
+            rows, classes, confs = rows[keep], classes[keep], confs[keep]
+            corners = np.concatenate([rows[:, :2] - rows[:, 2:4] / 2, rows[:, :2] + rows[:, 2:4] / 2], axis=1)
+            results.append((COCO80_TO_91[classes], confs.astype(np.float32),
+                            corners_to_boxes(corners, width, height)))
+        return results
+
+    def detect_batch(self, frames, confThreshold=0.5):
+        blob = cv2.dnn.blobFromImages(frames, 1.0 / 255.0, (self.input_size, self.input_size),
+                                      swapRB=True, crop=False)
+        return self._forward(blob, [(img.shape[1], img.shape[0]) for img in frames], confThreshold)
+
+    def detect_blob(self, blob, width, height, confThreshold=0.5):
+        return self._forward(blob, [(width, height)], confThreshold)[0]
+
+
+class ONNXRuntimeBackend(Backend):
+    """SSD MobileNet exported to ONNX (TF Object Detection API layout) on ONNX Runtime's CPU provider.
+
+    Expects a uint8 NHWC RGB input and detection_boxes (y1, x1, y2, x2),
+    detection_classes, detection_scores and num_detections outputs, as in
+    the ONNX model zoo ssd_mobilenet_v1 model. Needs the optional
+    onnxruntime package.
+    """
+
+    name = "onnxruntime"
+
+    @staticmethod
+    def available(*paths):
+        return onnxruntime is not None and Backend.available(*paths)
+
+    def __init__(self, model_path, input_size=320, threads=0):
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        outputs = [output.name for output in self.session.get_outputs()]
+        self.output_names = [next(name for name in outputs if key in name)
+                             for key in ("detection_boxes", "detection_classes", "detection_scores",
+                                         "num_detections")]
+        self.input_size = input_size
+
+    def detect_batch(self, frames, confThreshold=0.5):
+        size = (self.input_size, self.input_size)
+        batch = np.stack([cv2.cvtColor(cv2.resize(img, size), cv2.COLOR_BGR2RGB) for img in frames])
+        boxes, classes, scores, counts = self.session.run(self.output_names, {self.input_name: batch})
+        results = []
+        for index, img in enumerate(frames):
+            count = int(counts[index])
+            keep = scores[index, :count] > confThreshold
+            corners = boxes[index, :count][keep][:, [1, 0, 3, 2]]
+            results.append((classes[index, :count][keep].astype(np.int32),
+                            scores[index, :count][keep].astype(np.float32),
+                            corners_to_boxes(corners, img.shape[1], img.shape[0])))
+        return results
+
+
+# -------------------
+# Ranking and Selection
+# -------------------
+def backend_candidates(ssd_weights=None, ssd_config=None, yolo_weights=None, yolo_config=None,
+                       onnx_model=None):
+    """(backend class, constructor arguments) for every backend whose files are present."""
+    candidates = [
+        (OpenCVSSDBackend, (ssd_weights, ssd_config)),
+        (OpenCVYOLOBackend, (yolo_weights, yolo_config)),
+        (ONNXRuntimeBackend, (onnx_model,)),
+    ]
+    return [(cls, args) for cls, args in candidates if cls.available(*args)]
+
+
+def measure_backend(backend, frames, repeat=10, batch_size=4):
+    """Median single-frame latency (ms) and batched throughput (frames/s) of a loaded backend."""
+    backend.detect(frames[0])  # Warm up
+    latencies = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        backend.detect(frames[i % len(frames)])
+        latencies.append(time.perf_counter() - start)
+    batch = [frames[i % len(frames)] for i in range(batch_size)]
+    backend.detect_batch(batch)
+    start = time.perf_counter()
+    for _ in range(max(1, repeat // batch_size)):
+        backend.detect_batch(batch)
+    elapsed = time.perf_counter() - start
+    return 1000.0 * float(np.median(latencies)), max(1, repeat // batch_size) * batch_size / elapsed
+
+
+def rank_backends(candidates, frames, repeat=10, batch_size=4):
+    """Load and time every candidate; returns [(name, backend, latency ms, FPS)] fastest first."""
+    ranking = []
+    for cls, args in candidates:
+        try:
+            backend = cls(*args)
+        except Exception as e:
+            print(f"Backend {cls.name} could not be loaded: {e}")
+            continue
+        latency, fps = measure_backend(backend, frames, repeat, batch_size)
+        ranking.append((cls.name, backend, latency, fps))
+    ranking.sort(key=lambda entry: entry[2])
+    return ranking
+
+
+def load_fastest_backend(candidates, frame_size=(480, 640), repeat=5):
+    """Time the available backends on blank frames at startup and return the fastest one."""
+    frames = [np.zeros(frame_size + (3,), dtype=np.uint8)]
+    ranking = rank_backends(candidates, frames, repeat)
+    if not ranking:
+        raise RuntimeError("No inference backend available: check the model file paths")
+    name, backend, latency, _ = ranking[0]
+    print(f"Using {name} backend ({latency:.1f} ms/frame)")
+    return backend
+
+
+def load_fastest_detector(weights_path, config_path, input_size=320):
+    """The fastest backend for the SSD model files and any alternative models next to them.
+
+    Same arguments as detection_engine.load_detector(), so it can be the
+    detector registry's loader. The YOLOv3 and ONNX candidates are looked
+    for under their default names (yolov3.weights and yolov3.cfg,
+    ssd_mobilenet.onnx) in the SSD weights' directory and raced against the
+    SSD when present.
+    """
+    folder = os.path.dirname(weights_path)
+    candidates = backend_candidates(weights_path, config_path, os.path.join(folder, "yolov3.weights"),
+                                    os.path.join(folder, "yolov3.cfg"), os.path.join(folder, "ssd_mobilenet.onnx"))
+    # The SSD runs at the requested input size; the other models keep the size they were trained at
+    candidates = [(cls, args + (input_size,)) if cls is OpenCVSSDBackend else (cls, args)
+                  for cls, args in candidates]
+    return load_fastest_backend(candidates)
@@ -0,0 +1,31 @@
+"""Benchmarks for the detection hot path and the sales database.
+
+Run a single benchmark with, for example:
+
+    python benchmark.py postprocess
+
+The full-path suite writes JSON results that can be compared between runs:
+
+    python benchmark.py suite --output before.json
+    python benchmark.py suite --output after.json --baseline before.json --threshold 0.10
+
+The benchmarks live in the benchmarks package, one module per subsystem;
+synthetic models, clips, engine runs and timing are in benchmarks/harness.py.
+"""
+import argparse
+
+from benchmarks import detection, models, pipeline, sales, scaling
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    for module in (detection, pipeline, models, scaling, sales):
+        module.add_parsers(subparsers)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Benchmarks behind benchmark.py, one module per subsystem on the shared harness in harness.py."""
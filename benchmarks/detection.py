@@ -0,0 +1,217 @@
+"""Per-frame detection path: post-processing, tracking, rendering, preprocessing and profiling."""
+import cv2
+import numpy as np
+
+from benchmarks.harness import (ITEMS_OF_INTEREST, ITEMS_PRICES, SyntheticDetector, add_frame_args, add_model_args,
+                                every_frame, make_engine, random_frames, report, synthetic_clip,
+                                synthetic_detections, time_call, timed_run, traced_allocations)
+from detection_engine import load_class_names
+from overlay import InvoiceOverlay, draw_detections
+from postprocess import interest_mask, make_detections, postprocess
+from preprocess import BlobPreprocessor
+from profiling import STAGES, StageProfiler
+from tracking import MultiObjectTracker
+
+
+# -------------------
+# Post-processing
+# -------------------
+def legacy_postprocess(classIds, confs, bbox, classNames, items_of_interest, thres, nms_threshold):
+    """The per-detection Python loop that start_object_detection() used to run."""
+    detections = []
+    if classIds is not None:
+        if isinstance(classIds, np.ndarray) and len(classIds) > 0:
+            indices = cv2.dnn.NMSBoxes(bbox, confs, thres, nms_threshold)
+
+            if len(indices) > 0:
+                indices = indices.flatten()
+
+                for i in indices:
+                    classId = int(classIds[i]) if isinstance(classIds, np.ndarray) else int(classIds)
+                    confidence = float(confs[i]) if isinstance(confs, np.ndarray) else float(confs)
+                    box = bbox[i]
+
+                    class_name = classNames[classId - 1].lower()
+
+                    if class_name in items_of_interest and confidence > thres:
+                        detections.append((class_name, confidence, box))
+    return detections
+
+
+def bench_postprocess(args):
+    class_names = load_class_names(args.class_file)
+    mask = interest_mask(class_names, ITEMS_OF_INTEREST)
+    thres, nms_threshold = 0.45, 0.2
+
+    for count in args.counts:
+        class_ids, confs, boxes = synthetic_detections(count, len(class_names))
+        legacy = time_call(lambda: legacy_postprocess(class_ids, confs, boxes, class_names,
+                                                      ITEMS_OF_INTEREST, thres, nms_threshold), args.repeat)
+        vectorized = time_call(lambda: postprocess(class_ids, confs, boxes, mask, thres, nms_threshold),
+                               args.repeat)
+        print(f"--- {count} raw detections ---")
+        report("legacy loop", legacy)
+        report("vectorized", vectorized)
+        print(f"speed-up x{np.median(legacy) / np.median(vectorized):.1f}")
+
+
+# -------------------
+# Multi-object Tracker
+# -------------------
+def moving_boxes(count, frames, seed=0):
+    """Detection arrays for `count` boxes drifting a few pixels per frame."""
+    rng = np.random.default_rng(seed)
+    start = rng.uniform(0, 1200, (count, 2))
+    velocity = rng.uniform(-4, 4, (count, 2))
+    wh = rng.integers(40, 120, (count, 2))
+    class_ids = rng.integers(1, 4, count).astype(np.int32)
+    confs = np.full(count, 0.9, dtype=np.float32)
+    return [make_detections(class_ids, confs, np.hstack([start + velocity * i, wh]).astype(np.int32))
+            for i in range(frames)]
+
+
+def bench_tracker(args):
+    for count in args.counts:
+        frames = iter(moving_boxes(count, args.frames))
+        tracker = MultiObjectTracker()
+        # Warm up until every box has a confirmed track, so the timed frames are steady state
+        for _ in range(tracker.min_hits):
+            tracker.update(next(frames))
+        times = time_call(lambda: tracker.update(next(frames)), args.frames - tracker.min_hits)
+        print(f"--- {count} moving boxes, {len(tracker.ids)} tracks ---")
+        report("tracker update", times)
+        print(f"{'within 1 ms per frame':<28} {100.0 * np.mean(times < 1000.0):.0f}% of frames")
+
+
+# -------------------
+# Render Path Allocations
+# -------------------
+def legacy_render(img, detected_items, items_prices, fps):
+    """The per-frame invoice panel + np.hstack render start_object_detection() used to run."""
+    height, width = img.shape[:2]
+    panel_width = 320
+    white_panel = np.ones((height, panel_width, 3), dtype=np.uint8) * 255
+    cv2.putText(white_panel, "Invoice", (100, 40), cv2.FONT_HERSHEY_TRIPLEX, 0.8, (0, 0, 255), 2)
+    y_position = 80
+    total = 0
+    for item, count in detected_items.items():
+        price = items_prices[item]
+        item_total = price * count
+        total += item_total
+        cv2.putText(white_panel, f"{item}: {count} x ${price} = ${item_total}",
+                    (20, y_position), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 1)
+        y_position += 30
+    cv2.putText(white_panel, f"Total: ${total}", (20, height - 60), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+    cv2.putText(img, f"FPS: {int(fps)}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+    return np.hstack((img, white_panel))
+
+
+def compare_allocations(variants, frames, repeat):
+    """One line per (name, fn): tracemalloc bytes per frame and median call time."""
+    for name, fn in variants:
+        peaks, retained = traced_allocations(fn, frames)
+        times = time_call(lambda: fn(frames[0]), repeat)
+        print(f"{name:<24} median {np.median(times):8.1f} us   p95 {np.percentile(times, 95):8.1f} us   "
+              f"allocated {np.median(peaks) / 1024:7.1f} KB/frame   retained {np.median(retained) / 1024:6.1f} KB")
+
+
+def bench_overlay(args):
+    class_names = [name.lower() for name in load_class_names(args.class_file)]
+    frames = random_frames(args.frames, args.width, args.height)
+    detections = make_detections([44, 84], [0.9, 0.8], [[40, 60, 120, 200], [300, 100, 160, 220]])
+    detected_items = {"bottle": 2, "book": 1}
+    overlay = InvoiceOverlay(ITEMS_PRICES)
+    fps = 30
+
+    def legacy(img):
+        img = img.copy()
+        draw_detections(img, detections, class_names)
+        return legacy_render(img, detected_items, ITEMS_PRICES, fps)
+
+    def cached(img):
+        frame = overlay.compose(img, detected_items)
+        draw_detections(frame, detections, class_names)
+        cv2.putText(frame, f"FPS: {int(fps)}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+        return overlay.buffer
+
+    # The overlay's remaining few hundred bytes a frame are the label strings and shape tuples, no arrays
+    compare_allocations((("legacy hstack", legacy), ("preallocated overlay", cached)), frames, args.frames)
+
+
+# -------------------
+# Explicit Preprocessing
+# -------------------
+def bench_preprocess(args):
+    frames = random_frames(args.frames, args.width, args.height)
+    size = args.input_size
+    preprocessor = BlobPreprocessor(size)
+
+    def implicit(img):
+        return cv2.dnn.blobFromImage(img, 1.0 / 127.5, (size, size), (127.5, 127.5, 127.5), swapRB=True)
+
+    print(f"{args.width}x{args.height} frame -> 1x3x{size}x{size} float32 blob "
+          f"({4 * 3 * size * size / 1024:.0f} KB)")
+    compare_allocations((("blobFromImage (implicit)", implicit), ("BlobPreprocessor", preprocessor)),
+                        frames, args.repeat)
+
+    # Whole pipeline: where preprocessing runs decides whether it overlaps with inference
+    with synthetic_clip(args.frames, args.width, args.height) as clip:
+        for mode in (None, "inference", "capture"):
+            engine = make_engine(args, source=clip, headless=True, net=SyntheticDetector(args.latency, size),
+                                 preprocess=mode, profile=True, **every_frame())
+            engine.profiler.log_interval = 0
+            fps = timed_run(engine)
+            stages = engine.profiler.snapshot()["stages"]
+            print(f"engine, preprocess={mode or 'implicit':<10} {fps:6.1f} FPS   "
+                  f"preprocess p50 {stages.get('preprocess', {}).get('p50_ms', 0.0):.2f} ms   "
+                  f"inference p50 {stages['inference']['p50_ms']:.2f} ms")
+
+
+# -------------------
+# Profiler Overhead
+# -------------------
+def bench_profiler(args):
+    """Cost of the instrumentation per frame relative to the frame budget."""
+    frame_us = 1e6 / args.fps
+    for enabled in (False, True):
+        profiler = StageProfiler(enabled=enabled, log_interval=0)
+
+        def one_frame():
+            for stage in STAGES:
+                profiler.stop(stage, profiler.start())
+            profiler.frame_done()
+
+        per_frame = np.median(time_call(one_frame, args.repeat))
+        label = "enabled" if enabled else "disabled"
+        print(f"profiler {label:<9} {per_frame:6.2f} us/frame for {len(STAGES)} spans = "
+              f"{100 * per_frame / frame_us:.3f}% of a {frame_us / 1000:.1f} ms frame at {args.fps:g} FPS")
+
+
+def add_parsers(subparsers):
+    p = subparsers.add_parser("postprocess", help="vectorized post-processing vs the per-detection loop")
+    p.add_argument("--class-file", default="coco.names")
+    p.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000])
+    p.add_argument("--repeat", type=int, default=2000)
+    p.set_defaults(func=bench_postprocess)
+
+    p = subparsers.add_parser("tracker", help="multi-object tracker update time per frame")
+    p.add_argument("--counts", type=int, nargs="+", default=[10, 50])
+    p.add_argument("--frames", type=int, default=1000)
+    p.set_defaults(func=bench_tracker)
+
+    p = subparsers.add_parser("overlay", help="per-frame allocations of the invoice render path")
+    p.add_argument("--class-file", default="coco.names")
+    add_frame_args(p, frames=200)
+    p.set_defaults(func=bench_overlay)
+
+    p = subparsers.add_parser("preprocess", help="explicit blob preprocessing vs the implicit path")
+    add_model_args(p, 0.01, "synthetic forward-pass latency in seconds", weights=False)
+    add_frame_args(p, frames=200, width=1280, height=720)
+    p.add_argument("--repeat", type=int, default=500)
+    p.add_argument("--input-size", type=int, default=320)
+    p.set_defaults(func=bench_preprocess)
+
+    p = subparsers.add_parser("profiler", help="overhead of per-stage timing instrumentation")
+    p.add_argument("--fps", type=float, default=30.0, help="frame rate whose budget overhead is compared to")
+    p.add_argument("--repeat", type=int, default=20000)
+    p.set_defaults(func=bench_profiler)
@@ -0,0 +1,255 @@
+"""Shared harness for the benchmarks: timing, synthetic models, clips and engine runs."""
+import contextlib
+import os
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from detection_engine import DetectionEngine
+from gating import MotionGate
+from preprocess import BlobPreprocessor
+from tracking import DetectionScheduler
+
+ITEMS_OF_INTEREST = {"bottle", "book", "toothbrush"}
+ITEMS_PRICES = {"bottle": 5, "book": 10, "toothbrush": 3}
+SSD_CONFIG = "ssd_mobilenet_v3_large_coco_2020_01_14.pbtxt"
+
+
+# -------------------
+# Timing
+# -------------------
+def time_call(fn, repeat):
+    """Return per-call wall times in microseconds."""
+    times = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter_ns()
+        fn()
+        times[i] = (time.perf_counter_ns() - start) / 1000.0
+    return times
+
+
+def median_ms(fn, repeat):
+    return np.median(time_call(fn, repeat)) / 1000.0
+
+
+def report(name, times):
+    print(f"{name:<28} median {np.median(times):8.1f} us   p95 {np.percentile(times, 95):8.1f} us")
+
+
+def traced_allocations(fn, frames):
+    """Per-frame peak bytes allocated and still-held bytes, measured with tracemalloc."""
+    fn(frames[0])  # warm up: first call may allocate the reusable buffers
+    peaks, retained = [], []
+    tracemalloc.start()
+    for img in frames[1:]:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        fn(img)
+        after, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+        retained.append(after - before)
+    tracemalloc.stop()
+    return np.array(peaks), np.array(retained)
+
+
+def spin(duration, busy):
+    """Wait `duration` seconds, on the CPU when busy (like a real forward pass)."""
+    if duration and busy:
+        end = time.thread_time() + duration
+        while time.thread_time() < end:
+            pass
+    elif duration:
+        time.sleep(duration)
+
+
+# -------------------
+# Synthetic Models
+# -------------------
+def synthetic_detections(count, num_classes, seed=0):
+    """Random net.detect() output: (class IDs, confidences, boxes)."""
+    rng = np.random.default_rng(seed)
+    class_ids = rng.integers(1, num_classes + 1, count).astype(np.int32)
+    confs = rng.uniform(0.3, 1.0, count).astype(np.float32)
+    xy = rng.integers(0, 600, (count, 2))
+    wh = rng.integers(20, 200, (count, 2))
+    boxes = np.hstack([xy, wh]).astype(np.int32)
+    return class_ids, confs, boxes
+
+
+class SyntheticDetector:
+    """Stand-in for cv2.dnn_DetectionModel when the model weights are not available.
+
+    Does the same input preprocessing as DetectionModel (resize, mean/scale,
+    RB swap into a blob) and then waits `latency` seconds scaled by the
+    input area relative to 320x320, before returning the same raw detections
+    for every frame. With busy=True it spins on the CPU for that time instead
+    of sleeping. detect_blob() skips the preprocessing, like the raw-network
+    backends.
+    """
+
+    def __init__(self, latency=0.0, input_size=320, count=20, num_classes=90, busy=False):
+        self.latency = latency
+        self.input_size = input_size
+        self.busy = busy
+        self.output = synthetic_detections(count, num_classes)
+
+    def preprocessor(self, buffers=3):
+        return BlobPreprocessor(self.input_size, buffers=buffers)
+
+    def detect(self, img, confThreshold=0.5):
+        blob = cv2.dnn.blobFromImage(img, 1.0 / 127.5, (self.input_size, self.input_size),
+                                     (127.5, 127.5, 127.5), swapRB=True)
+        return self.detect_blob(blob, img.shape[1], img.shape[0], confThreshold)
+
+    def detect_blob(self, blob, width, height, confThreshold=0.5):
+        spin(self.latency * (self.input_size / 320.0) ** 2, self.busy)
+        return self.output
+
+
+class SyntheticNetwork:
+    """Stand-in for the raw cv2.dnn SSD network used by TiledDetector and InferenceServer.
+
+    forward() returns DetectionOutput-shaped rows for every image of the last
+    blob after waiting `fixed` seconds per call plus `latency` seconds per
+    image, scaled by input area relative to 320x320 like SyntheticDetector.
+    The fixed part is the per-call overhead that batching amortises.
+    """
+
+    def __init__(self, latency=0.0, count=20, num_classes=90, fixed=0.0, busy=False):
+        self.latency = latency
+        self.count = count
+        self.num_classes = num_classes
+        self.fixed = fixed
+        self.busy = busy
+        self._blob = None
+
+    def setInput(self, blob):
+        self._blob = blob
+
+    def forward(self):
+        images, _, height, width = self._blob.shape
+        spin((self.fixed + self.latency * images) * (height * width) / (320.0 * 320.0), self.busy)
+        class_ids, confs, boxes = synthetic_detections(self.count, self.num_classes)
+        rows = np.zeros((images, self.count, 7), dtype=np.float32)
+        rows[:, :, 0] = np.arange(images)[:, None]
+        rows[:, :, 1] = class_ids
+        rows[:, :, 2] = confs
+        rows[:, :, 3:5] = boxes[:, :2] / 800.0
+        rows[:, :, 5:7] = (boxes[:, :2] + boxes[:, 2:]) / 800.0
+        return rows.reshape(1, 1, -1, 7)
+
+
+def make_net(args, **options):
+    """None (load the real model) when --weights is given, otherwise a SyntheticDetector."""
+    if getattr(args, "weights", None):
+        return None
+    return SyntheticDetector(latency=getattr(args, "latency", 0.0), input_size=getattr(args, "input_size", 320),
+                             **options)
+
+
+# -------------------
+# Frames and Clips
+# -------------------
+def random_frames(count, width, height):
+    return [np.random.default_rng(i).integers(0, 255, (height, width, 3), dtype=np.uint8) for i in range(count)]
+
+
+def write_synthetic_clip(path, frames=300, width=640, height=480, fps=30):
+    """Write a clip of textured blocks sliding across a noisy background."""
+    rng = np.random.default_rng(0)
+    background = rng.integers(60, 120, (height, width, 3), dtype=np.uint8)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    for i in range(frames):
+        img = background.copy()
+        for k in range(3):
+            x = (40 + 7 * i + 180 * k) % (width - 120)
+            cv2.rectangle(img, (x, 80 + 110 * k), (x + 100, 160 + 110 * k), (40 * k, 200, 255 - 60 * k), -1)
+            cv2.putText(img, str(k), (x + 30, 140 + 110 * k), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 0), 3)
+        writer.write(img)
+    writer.release()
+    return path
+
+
+@contextlib.contextmanager
+def synthetic_clip(frames=300, width=640, height=480, clip=None):
+    """Path of `clip`, or of a synthetic clip in a temporary directory removed on exit."""
+    if clip:
+        yield clip
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        yield write_synthetic_clip(os.path.join(tmp, "clip.avi"), frames, width, height)
+
+
+def load_clip(path):
+    """Decode every frame of a clip into memory so decoding is not timed."""
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        success, img = cap.read()
+        if not success:
+            break
+        frames.append(img)
+    cap.release()
+    return frames
+
+
+def display_available():
+    try:
+        cv2.namedWindow("benchmark")
+        cv2.destroyWindow("benchmark")
+        return True
+    except cv2.error:
+        return False
+
+
+# -------------------
+# Engine Runs
+# -------------------
+def every_frame():
+    """Engine options that send every frame to the detector, so throughput is the detector's."""
+    return dict(scheduler=DetectionScheduler(max_interval=1), motion_gate=MotionGate(enabled=False))
+
+
+def engine_options(args, **options):
+    """DetectionEngine keyword arguments for the model the command line selected."""
+    return dict(class_file=getattr(args, "class_file", "coco.names"), weights_path=getattr(args, "weights", None),
+                config_path=getattr(args, "config", SSD_CONFIG), items_prices=ITEMS_PRICES, **options)
+
+
+def make_engine(args, **options):
+    options.setdefault("net", make_net(args))
+    return DetectionEngine(**engine_options(args, **options))
+
+
+def timed_run(engine):
+    """Run the engine over its source; returns its frames per second of wall time."""
+    start = time.perf_counter()
+    engine.run()
+    return engine.processed_frames / (time.perf_counter() - start)
+
+
+def aggregate_fps(supervisor):
+    """Run a LaneSupervisor; returns the lanes' frames per second, one per lane."""
+    supervisor.run()
+    return [lane.frames / lane.seconds for lane in supervisor.exits.values()]
+
+
+# -------------------
+# Command-line Options
+# -------------------
+def add_model_args(parser, latency, latency_help="synthetic detector latency in seconds", weights=True):
+    parser.add_argument("--class-file", default="coco.names")
+    if weights:
+        parser.add_argument("--weights", help="frozen_inference_graph.pb (default: synthetic detector)")
+        parser.add_argument("--config", default=SSD_CONFIG)
+    parser.add_argument("--latency", type=float, default=latency, help=latency_help)
+
+
+def add_frame_args(parser, frames=None, width=640, height=480):
+    if frames is not None:
+        parser.add_argument("--frames", type=int, default=frames)
+    parser.add_argument("--width", type=int, default=width)
+    parser.add_argument("--height", type=int, default=height)
@@ -0,0 +1,333 @@
+"""Model-side options: tiling, cascade, adaptive resolution, backend ranking and the warm registry."""
+import os
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.harness import (ITEMS_OF_INTEREST, SSD_CONFIG, SyntheticDetector, SyntheticNetwork, add_frame_args,
+                                add_model_args, load_clip, make_engine, random_frames, synthetic_clip,
+                                synthetic_detections)
+from backends import backend_candidates, load_fastest_detector, rank_backends
+from cascade import CascadeDetector
+from detection_engine import load_class_names, load_detector
+from detector_registry import WarmDetector, get_detector, preload
+from postprocess import make_detections
+from resolution import LADDER, AdaptiveResolution
+from tiling import TiledDetector
+from tracking import iou_matrix
+
+
+# -------------------
+# Tiled vs Single-pass Inference
+# -------------------
+def load_labelled_images(folder, class_names):
+    """(image, ground truth) pairs from a folder of images with YOLO-format .txt labels.
+
+    Labels use the folder's classes.txt (as written by labelImg); ground truth
+    is a detection array in COCO class IDs, classes missing from coco.names
+    are skipped.
+    """
+    with open(os.path.join(folder, "classes.txt")) as f:
+        label_names = [line.strip().lower() for line in f if line.strip()]
+    coco_ids = {name: class_id for class_id, name in enumerate(class_names, start=1)}
+
+    samples = []
+    for name in sorted(os.listdir(folder)):
+        stem, ext = os.path.splitext(name)
+        label_path = os.path.join(folder, stem + ".txt")
+        if ext.lower() not in (".jpg", ".jpeg", ".png", ".bmp", ".webp") or not os.path.exists(label_path):
+            continue
+        img = cv2.imread(os.path.join(folder, name))
+        height, width = img.shape[:2]
+        ids, boxes = [], []
+        with open(label_path) as f:
+            for line in f:
+                label, cx, cy, w, h = line.split()
+                class_id = coco_ids.get(label_names[int(label)])
+                if class_id:
+                    ids.append(class_id)
+                    cx, cy, w, h = float(cx) * width, float(cy) * height, float(w) * width, float(h) * height
+                    boxes.append((cx - w / 2, cy - h / 2, w, h))
+        samples.append((img, make_detections(ids, np.ones(len(ids)), np.array(boxes).reshape(-1, 4))))
+    return samples
+
+
+def recall(predictions, ground_truth, iou_threshold=0.5):
+    """Fraction of ground-truth boxes matched by a same-class prediction."""
+    if not len(ground_truth):
+        return None
+    if not len(predictions):
+        return 0.0
+    iou = iou_matrix(ground_truth["box"].astype(np.float32), predictions["box"].astype(np.float32))
+    same_class = ground_truth["class_id"][:, None] == predictions["class_id"][None, :]
+    return float(((iou >= iou_threshold) & same_class).any(axis=1).mean())
+
+
+def bench_tiling(args):
+    class_names = [name.lower() for name in load_class_names(args.class_file)]
+    if args.images:
+        samples = load_labelled_images(args.images, class_names)
+        interest = {class_names[i - 1] for _, gt in samples for i in gt["class_id"]} or ITEMS_OF_INTEREST
+    else:
+        samples = [(img, make_detections([], [], [])) for img in random_frames(10, args.width, args.height)]
+        interest = ITEMS_OF_INTEREST
+
+    if args.weights:
+        single_net = tiled_net = None
+    else:
+        single_net = SyntheticDetector(args.latency, args.input_size)
+        tiled_net = TiledDetector(SyntheticNetwork(args.latency), args.input_size,
+                                  args.tile_size, args.overlap, args.batch_size)
+
+    modes = (
+        ("single pass", dict(net=single_net)),
+        (f"tiled {args.tile_size}px/{args.overlap:.0%}/batch {args.batch_size}",
+         dict(net=tiled_net, tile_size=args.tile_size, tile_overlap=args.overlap, tile_batch=args.batch_size)),
+    )
+    for label, options in modes:
+        engine = make_engine(args, items_of_interest=interest, headless=True, input_size=args.input_size, **options)
+        engine.detect(samples[0][0])  # warm up
+        times, recalls = [], []
+        for _ in range(args.passes):
+            for img, gt in samples:
+                start = time.perf_counter_ns()
+                detections = engine.detect(img)
+                times.append((time.perf_counter_ns() - start) / 1000.0)
+                if args.weights:
+                    recalls.append(recall(detections, gt))
+        recalls = [r for r in recalls if r is not None]
+        recall_text = f"recall@0.5 {np.mean(recalls):.3f}" if recalls else "recall n/a (needs --weights and --images)"
+        print(f"{label:<32} median {np.median(times) / 1000:8.2f} ms   p95 {np.percentile(times, 95) / 1000:8.2f} ms"
+              f"   {recall_text}")
+
+
+# -------------------
+# Two-stage Cascade
+# -------------------
+# Synthetic frame contents: (class ID, confidence) rows a detector reports for them
+SCENARIOS = {
+    "empty": [],
+    "other": [(1, 0.9)],  # A hand (person) over the tray
+    "borderline": [(1, 0.42)],
+    "item": [(44, 0.8)],  # A bottle
+}
+
+
+class ScenarioDetector:
+    """Stand-in detector that reports the scenario coded into pixel (0, 0) of each frame.
+
+    Takes `latency` seconds (scaled by input area like SyntheticDetector),
+    so a first stage and a full detector can share the same scenarios.
+    """
+
+    def __init__(self, latency, input_size):
+        self.latency = latency * (input_size / 320.0) ** 2
+        self.outputs = []
+        for rows in SCENARIOS.values():
+            self.outputs.append((np.array([r[0] for r in rows], dtype=np.int32),
+                                 np.array([r[1] for r in rows], dtype=np.float32),
+                                 np.tile(np.array([[100, 100, 80, 120]], dtype=np.int32), (len(rows), 1))))
+
+    def detect(self, img, confThreshold=0.5):
+        time.sleep(self.latency)
+        class_ids, confs, boxes = self.outputs[int(img[0, 0, 0])]
+        keep = confs > confThreshold
+        return class_ids[keep], confs[keep], boxes[keep]
+
+
+def seconds_per_frame(net, frames, thres):
+    start = time.perf_counter()
+    for img in frames:
+        net.detect(img, confThreshold=thres)
+    return (time.perf_counter() - start) / len(frames)
+
+
+def bench_cascade(args):
+    if args.weights:
+        with synthetic_clip(args.frames, args.width, args.height, clip=args.clip) as clip:
+            frames = load_clip(clip)
+        first = load_detector(args.weights, args.config, args.first_size)
+        full = load_detector(args.weights, args.config, args.input_size)
+    else:
+        mix = dict(zip(SCENARIOS, args.mix))
+        print("Synthetic frames: " + ", ".join(f"{100 * share:.0f}% {name}" for name, share in mix.items()))
+        rng = np.random.default_rng(0)
+        codes = rng.choice(len(SCENARIOS), size=args.frames, p=np.array(args.mix) / sum(args.mix))
+        frames = [np.full((args.height, args.width, 3), code, dtype=np.uint8) for code in codes]
+        first = ScenarioDetector(args.latency, args.first_size)
+        full = ScenarioDetector(args.latency, args.input_size)
+
+    full_only = seconds_per_frame(full, frames, args.thres)
+    cascade = CascadeDetector(first, full, args.thres, args.margin)
+    cascaded = seconds_per_frame(cascade, frames, args.thres)
+
+    print(f"full model on every frame   {full_only * 1000:7.2f} ms/frame")
+    print(f"cascade ({args.first_size} -> {args.input_size})     {cascaded * 1000:7.2f} ms/frame   "
+          f"measured saving {(full_only - cascaded) * 1000:.2f} ms/frame")
+    print(cascade.summary())
+
+
+# -------------------
+# Adaptive Input Resolution
+# -------------------
+class LoadedDetector:
+    """Stand-in detector whose latency follows input area times a CPU load factor."""
+
+    def __init__(self, latency, input_size=320):
+        self.latency = latency
+        self.input_size = input_size
+        self.load = 1.0
+
+    def detect(self, img, confThreshold=0.5):
+        time.sleep(self.latency * self.load * (self.input_size / 320.0) ** 2)
+        return synthetic_detections(0, 90)
+
+
+def bench_resolution(args):
+    budget = 1.0 / args.fps
+    phases = [("idle", 1.0), ("busy", args.busy_load), ("idle", 1.0)]
+    print(f"Budget {budget * 1000:.1f} ms/frame; synthetic detector {args.latency * 1000:.0f} ms at 320, "
+          f"x{args.busy_load:g} while busy; {args.frames} frames per phase")
+    img = np.zeros((args.height, args.width, 3), dtype=np.uint8)
+    for label, adaptive in (("fixed 320", False), ("adaptive", True)):
+        detector = LoadedDetector(args.latency)
+        net = AdaptiveResolution(detector, budget, LADDER, 320, patience=args.patience) if adaptive else detector
+        results = []
+        for phase, load in phases:
+            detector.load = load
+            sizes, over = [], 0
+            for _ in range(args.frames):
+                start = time.perf_counter()
+                net.detect(img)
+                over += time.perf_counter() - start > budget
+                sizes.append(detector.input_size)
+            results.append(f"{phase} {100.0 * over / args.frames:3.0f}% over, mean size {np.mean(sizes):3.0f}")
+        print(f"{label:<10} " + " | ".join(results))
+        if adaptive:
+            print(net.summary())
+            for switch in net.snapshot()["history"]:
+                print(f"  {switch['from']} -> {switch['to']} at {switch['latency_ms']:.1f} ms")
+
+
+# -------------------
+# Inference Backends
+# -------------------
+def bench_backends(args):
+    candidates = backend_candidates(args.ssd_weights, args.ssd_config, args.yolo_weights, args.yolo_config,
+                                    args.onnx_model)
+    if not candidates:
+        print("No backend available: none of the model files were found (or onnxruntime is missing)")
+        return
+    frames = []
+    if args.images:
+        frames = [cv2.imread(os.path.join(args.images, name)) for name in sorted(os.listdir(args.images))]
+        frames = [img for img in frames if img is not None]
+    frames = frames or [np.zeros((args.height, args.width, 3), dtype=np.uint8)]
+
+    for rank, (name, _, latency, fps) in enumerate(rank_backends(candidates, frames, args.repeat,
+                                                                 args.batch_size), start=1):
+        print(f"{rank}. {name:<16} median {latency:8.1f} ms/frame   {fps:8.1f} FPS at batch {args.batch_size}")
+
+
+# -------------------
+# Warm Detector Registry
+# -------------------
+class SyntheticLoader:
+    """Model loader stand-in: takes load_time seconds, then returns a SyntheticDetector."""
+
+    def __init__(self, load_time, latency):
+        self.load_time = load_time
+        self.latency = latency
+
+    def __call__(self, weights_path, config_path, input_size=320):
+        time.sleep(self.load_time)
+        return SyntheticDetector(self.latency, input_size)
+
+
+def first_detection_after(start, args, clip, net, class_names=None):
+    """Seconds from start until a new session's engine billed its first result."""
+    engine = make_engine(args, source=clip, headless=True, net=net, class_names=class_names)
+    engine.run()
+    return engine.first_result_at - start
+
+
+def bench_warm(args):
+    loader = load_fastest_detector if args.weights else SyntheticLoader(args.load_time, args.latency)
+    with synthetic_clip(30, args.width, args.height) as clip:
+        cold = WarmDetector(args.class_file, args.weights, args.config, loader=loader)
+        cold.load()
+        print(f"cold start: load {cold.load_seconds:.2f} s + first forward pass {cold.warmup_seconds * 1000:.0f} ms")
+
+        # Before: every login read the class list and built the model again
+        start = time.perf_counter()
+        net = loader(args.weights, args.config)
+        before = first_detection_after(start, args, clip, net)
+
+        # After: preloaded at application start, while the login window is open
+        preload(args.class_file, args.weights, args.config, loader=loader)
+        time.sleep(args.login_time)
+        sessions = []
+        for _ in range(2):
+            start = time.perf_counter()
+            detector = get_detector(args.class_file, args.weights, args.config, loader=loader)
+            sessions.append(first_detection_after(start, args, clip, detector.net, detector.class_names))
+
+    print(f"login to first detection, model loaded per session:  {before:.3f} s")
+    print(f"login to first detection, warm registry:             {sessions[0]:.3f} s "
+          f"(user took {args.login_time:.1f} s to log in)")
+    print(f"shift change, same warm instance:                    {sessions[1]:.3f} s")
+
+
+def add_parsers(subparsers):
+    p = subparsers.add_parser("tiling", help="tiled batched inference vs a single pass: latency and recall")
+    p.add_argument("--images", help="folder of images with YOLO .txt labels and classes.txt (for recall)")
+    add_model_args(p, 0.005, "synthetic per-image latency in seconds")
+    add_frame_args(p, width=1920, height=1080)
+    p.add_argument("--input-size", type=int, default=320)
+    p.add_argument("--tile-size", type=int, default=640)
+    p.add_argument("--overlap", type=float, default=0.2)
+    p.add_argument("--batch-size", type=int, default=8)
+    p.add_argument("--passes", type=int, default=3)
+    p.set_defaults(func=bench_tiling)
+
+    p = subparsers.add_parser("cascade", help="two-stage cascade vs the full model on every frame")
+    p.add_argument("--weights", help="frozen_inference_graph.pb (default: synthetic detectors)")
+    p.add_argument("--config", default=SSD_CONFIG)
+    p.add_argument("--latency", type=float, default=0.02, help="synthetic full-model latency in seconds")
+    p.add_argument("--clip", help="video for --weights runs (default: a generated synthetic clip)")
+    p.add_argument("--mix", type=float, nargs=4, default=[0.6, 0.15, 0.05, 0.2],
+                   metavar=("EMPTY", "OTHER", "BORDERLINE", "ITEM"), help="synthetic frame mix")
+    add_frame_args(p, frames=300)
+    p.add_argument("--first-size", type=int, default=192, help="first-stage input size")
+    p.add_argument("--input-size", type=int, default=320, help="full-model input size")
+    p.add_argument("--thres", type=float, default=0.45)
+    p.add_argument("--margin", type=float, default=0.1)
+    p.set_defaults(func=bench_cascade)
+
+    p = subparsers.add_parser("resolution", help="adaptive input-size ladder against a frame budget")
+    p.add_argument("--fps", type=float, default=30.0, help="per-lane frame rate whose budget is enforced")
+    p.add_argument("--latency", type=float, default=0.015, help="synthetic latency at 320x320 in seconds")
+    p.add_argument("--busy-load", type=float, default=3.0, help="latency factor while the box is busy")
+    add_frame_args(p, frames=150)
+    p.add_argument("--patience", type=int, default=15)
+    p.set_defaults(func=bench_resolution)
+
+    p = subparsers.add_parser("backends", help="rank the available inference backends by latency and throughput")
+    p.add_argument("--ssd-weights", default="frozen_inference_graph.pb")
+    p.add_argument("--ssd-config", default="ssd_mobilenet_v3_large_coco_2020_01_14.pbtxt")
+    p.add_argument("--yolo-weights", default="yolov3.weights")
+    p.add_argument("--yolo-config", default="yolov3.cfg")
+    p.add_argument("--onnx-model", default="ssd_mobilenet.onnx")
+    p.add_argument("--images", help="folder of sample frames (default: blank frames)")
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--batch-size", type=int, default=4)
+    add_frame_args(p)
+    p.set_defaults(func=bench_backends)
+
+    p = subparsers.add_parser("warm", help="cold start and login-to-first-detection with the detector registry")
+    add_model_args(p, 0.02)
+    p.add_argument("--load-time", type=float, default=1.5, help="synthetic model load time in seconds")
+    p.add_argument("--login-time", type=float, default=3.0, help="seconds the login window stays open")
+    add_frame_args(p)
+    p.set_defaults(func=bench_warm)
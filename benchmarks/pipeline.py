@@ -0,0 +1,144 @@
+"""Whole-pipeline throughput: headless vs GUI, and the full-path replay suite with regression checks."""
+import json
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.harness import (add_frame_args, add_model_args, display_available, load_clip, make_engine,
+                                synthetic_clip, time_call, timed_run)
+from profiling import StageProfiler
+from roi import RegionOfInterest
+
+
+# -------------------
+# Headless vs GUI Throughput
+# -------------------
+def bench_headless(args):
+    with synthetic_clip(args.frames, args.width, args.height) as clip:
+        engine = make_engine(args, source=clip, headless=True)
+        print(f"headless  {timed_run(engine):.1f} FPS over {engine.processed_frames} frames")
+
+        if display_available():
+            engine = make_engine(args, source=clip, headless=False)
+            print(f"GUI       {timed_run(engine):.1f} FPS over {engine.processed_frames} frames")
+        else:
+            # No display: report the drawing work that headless mode skips instead
+            img = load_clip(clip)[0]
+            detections = engine.detect(img)
+            times = time_call(lambda: engine.render(img, detections, 30), 200)
+            print(f"GUI       no display available; render() alone costs {np.median(times):.1f} us/frame "
+                  f"plus imshow/waitKey")
+
+
+# -------------------
+# Full-path Replay Suite
+# -------------------
+SUITE_STAGES = ("preprocess", "inference", "postprocess", "billing", "drawing")
+
+
+def replay(engine, frames, passes):
+    """Push the frames through the engine's detect -> NMS -> billing -> overlay path.
+
+    Stage spans are recorded by a profiler sized to hold every sample, so the
+    percentiles cover the whole replay.
+    """
+    profiler = engine.profiler = StageProfiler(enabled=True, window=len(frames) * passes, log_interval=0)
+    start = time.perf_counter()
+    for _ in range(passes):
+        for img in frames:
+            detections = engine.detect(img)
+            t = profiler.start()
+            engine.update_bill(detections)
+            profiler.stop("billing", t)
+            t = profiler.start()
+            engine.render(img, detections, 30)
+            profiler.stop("drawing", t)
+    elapsed = time.perf_counter() - start
+    stages = profiler.snapshot()["stages"]
+    return {stage: {key: round(stages[stage][f"{key}_ms"] * 1000.0, 1) for key in ("p50", "p95", "p99")}
+            for stage in SUITE_STAGES if stage in stages}, elapsed
+
+
+def compare_results(current, baseline, threshold, min_delta_us=5.0):
+    """Return human-readable regressions of current against baseline beyond threshold.
+
+    Stage latencies that moved by less than min_delta_us are ignored, so
+    near-zero stages do not trip the relative threshold on timer noise.
+    """
+    regressions = []
+    for stage, stats in current["stages"].items():
+        for key in ("p50", "p95"):
+            old = baseline.get("stages", {}).get(stage, {}).get(key)
+            if old and stats[key] > old * (1 + threshold) and stats[key] - old >= min_delta_us:
+                regressions.append(f"{stage} {key}: {old} -> {stats[key]} us")
+    if baseline.get("fps") and current["fps"] < baseline["fps"] * (1 - threshold):
+        regressions.append(f"fps: {baseline['fps']} -> {current['fps']}")
+    if baseline.get("peak_rss_mb") and current["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + threshold):
+        regressions.append(f"peak_rss_mb: {baseline['peak_rss_mb']} -> {current['peak_rss_mb']}")
+    return regressions
+
+
+def bench_suite(args):
+    with synthetic_clip(args.frames, args.width, args.height, clip=args.clip) as clip:
+        frames = load_clip(clip)
+
+    roi = RegionOfInterest.from_rect(*args.roi) if args.roi else None
+    engine = make_engine(args, headless=True, roi=roi, input_size=args.input_size)
+    replay(engine, frames[:10], 1)  # warm up caches, allocators and the model
+    stages, elapsed = replay(engine, frames, args.passes)
+
+    total_frames = len(frames) * args.passes
+    results = {
+        "detector": "synthetic" if not args.weights else os.path.basename(args.weights),
+        "frames": total_frames,
+        "resolution": [int(frames[0].shape[1]), int(frames[0].shape[0])],
+        "input_size": args.input_size,
+        "roi": list(args.roi) if args.roi else None,
+        "stages": stages,
+        "fps": round(total_frames / elapsed, 2),
+        "wall_time": round(elapsed, 3),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+    }
+
+    for stage, stats in results["stages"].items():
+        print(f"{stage:<12} p50 {stats['p50']:9.1f} us   p95 {stats['p95']:9.1f} us   p99 {stats['p99']:9.1f} us")
+    print(f"sustained {results['fps']} FPS over {total_frames} frames, peak RSS {results['peak_rss_mb']} MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.threshold)
+        if regressions:
+            print(f"REGRESSION (threshold {args.threshold:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (threshold {args.threshold:.0%})")
+
+
+def add_parsers(subparsers):
+    p = subparsers.add_parser("headless", help="engine throughput with and without drawing/display")
+    add_model_args(p, 0.0)
+    add_frame_args(p, frames=300)
+    p.set_defaults(func=bench_headless)
+
+    p = subparsers.add_parser("suite", help="replay a clip through the full detection path")
+    p.add_argument("--clip", help="video to replay (default: a generated synthetic clip)")
+    add_model_args(p, 0.0)
+    add_frame_args(p, frames=300)
+    p.add_argument("--passes", type=int, default=3, help="times to replay the clip")
+    p.add_argument("--roi", type=int, nargs=4, metavar=("X", "Y", "W", "H"), help="crop to this tray rectangle")
+    p.add_argument("--input-size", type=int, default=320, help="network input size")
+    p.add_argument("--output", help="write results to this JSON file")
+    p.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    p.add_argument("--threshold", type=float, default=0.10, help="allowed relative slowdown (0.10 = 10%%)")
+    p.set_defaults(func=bench_suite)
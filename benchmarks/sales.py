@@ -0,0 +1,394 @@
+"""Sales database: connection reuse, invoice commits, write-behind, the invoice schema and rollups."""
+import contextlib
+import datetime
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.harness import ITEMS_PRICES, median_ms, report, time_call
+from schema import SALES_V1, check_rollups, local_hour, migrate, rebuild_rollups
+from storage import (Database, InvoiceWriter, WriteBehindQueue, customer_invoices, day_bounds, day_items, day_lanes,
+                     day_summary, item_sales, make_invoice, revenue_between)
+
+# Schema version 1: one sales row per line item
+INSERT_SALE = "INSERT INTO sales (customer_name, item_name, quantity, price, total, date) VALUES (?, ?, ?, ?, ?, ?)"
+CART = {"bottle": 2, "book": 1, "toothbrush": 3}
+
+
+@contextlib.contextmanager
+def migrated_database(**options):
+    """A Database on the current schema in a temporary directory, closed and removed on exit."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "sales.db"), **options)
+        migrate(db, None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+def legacy_sales(lines, days, customers, items, seed=0):
+    """Version 1 sales rows: invoices of 1-4 lines spread evenly over `days` days."""
+    rng = np.random.default_rng(seed)
+    start = datetime.datetime(2024, 1, 1)
+    step = days * 86400 / (lines / 2.5)
+    prices = rng.integers(50, 5000, items) / 100.0
+    written, invoice = 0, 0
+    while written < lines:
+        date = (start + datetime.timedelta(seconds=int(invoice * step))).strftime("%Y-%m-%d %H:%M:%S")
+        customer = f"customer{rng.integers(customers)}"
+        for item in rng.choice(items, min(rng.integers(1, 5), lines - written), replace=False):
+            quantity = int(rng.integers(1, 4))
+            yield customer, f"item{item}", quantity, prices[item], quantity * prices[item], date
+            written += 1
+        invoice += 1
+
+
+def legacy_database(path, rows):
+    """A version 1 sales table holding `rows`, as the scripts wrote it before the migration."""
+    db = Database(path)
+    with db.transaction() as conn:
+        conn.execute(SALES_V1)
+        conn.executemany(INSERT_SALE, rows)
+    return db
+
+
+def query_plan(db, sql, params):
+    return "; ".join(row[-1] for row in db.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+
+# -------------------
+# SQLite Connection Reuse
+# -------------------
+def bench_storage(args):
+    date = "2024-01-01 12:00:00"
+    rows = [("Customer", item, qty, ITEMS_PRICES[item], qty * ITEMS_PRICES[item], date) for item, qty in CART.items()]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        per_call_path, pooled_path = os.path.join(tmp, "per_call.db"), os.path.join(tmp, "pooled.db")
+        pooled = Database(pooled_path)
+        for path in (per_call_path, pooled_path):
+            conn = sqlite3.connect(path)
+            conn.execute(SALES_V1)
+            conn.executemany(INSERT_SALE, rows * (args.rows // len(rows)))
+            conn.execute("CREATE TABLE users (username TEXT PRIMARY KEY, password TEXT)")
+            conn.execute("INSERT INTO users VALUES ('admin', 'secret')")
+            conn.commit()
+            conn.close()
+
+        # The code paths as the scripts run them: save an invoice, log in, load the dashboard
+        def insert_per_call():
+            conn = sqlite3.connect(per_call_path)
+            for row in rows:
+                conn.execute(INSERT_SALE, row)
+            conn.commit()
+            conn.close()
+
+        def insert_pooled():
+            with pooled.transaction() as conn:
+                for row in rows:
+                    conn.execute(INSERT_SALE, row)
+
+        def login_per_call():
+            conn = sqlite3.connect(per_call_path)
+            conn.execute("SELECT * FROM users WHERE username = ? AND password = ?", ("admin", "secret")).fetchone()
+            conn.close()
+
+        def login_pooled():
+            pooled.execute("SELECT * FROM users WHERE username = ? AND password = ?", ("admin", "secret")).fetchone()
+
+        def load_per_call():
+            conn = sqlite3.connect(per_call_path)
+            conn.execute("SELECT * FROM sales").fetchall()
+            conn.close()
+
+        def load_pooled():
+            pooled.execute("SELECT * FROM sales").fetchall()
+
+        print(f"{len(rows)}-line invoices, dashboard table of {args.rows} rows")
+        for name, per_call, reused, repeat in (("invoice", insert_per_call, insert_pooled, args.repeat),
+                                               ("login", login_per_call, login_pooled, args.repeat),
+                                               ("dashboard", load_per_call, load_pooled, max(1, args.repeat // 20))):
+            report(f"{name} connect-per-call", time_call(per_call, repeat))
+            report(f"{name} pooled", time_call(reused, repeat))
+        pooled.close()
+
+
+# -------------------
+# Invoice Commits
+# -------------------
+def save_row_by_row(db, customer_name, detected_items, items_prices):
+    """The original save_to_sales_db()'s pattern on the current schema.
+
+    Each cart line is its own statements (product upsert and line INSERT)
+    in a deferred transaction, instead of one executemany() under BEGIN IMMEDIATE.
+    """
+    invoice = make_invoice(customer_name, detected_items, items_prices)
+    total = sum(quantity * price_cents for _, quantity, price_cents in invoice.lines)
+    with db.transaction() as conn:
+        invoice_id = conn.execute("INSERT INTO invoices (customer, date, total_cents) VALUES (?, ?, ?)",
+                                  (invoice.customer, invoice.date, total)).lastrowid
+        for item, quantity, price_cents in invoice.lines:
+            conn.execute("INSERT INTO products (name, price_cents) VALUES (?, ?) ON CONFLICT (name) DO NOTHING",
+                         (item, price_cents))
+            conn.execute('''INSERT INTO invoice_lines (invoice_id, product_id, quantity, price_cents, total_cents, date)
+                            SELECT ?, id, ?, ?, ?, ? FROM products WHERE name = ?''',
+                         (invoice_id, quantity, price_cents, quantity * price_cents, invoice.date, item))
+
+
+def bench_invoices(args):
+    print(f"{len(CART)}-line invoices, {args.invoices} per writer, synchronous={args.synchronous}, "
+          f"group window {args.window * 1000:.0f} ms")
+    for writers in args.writers:
+        results = []
+        for mode in ("row-by-row", "executemany", "group commit"):
+            # Every mode writes the same migrated schema, so only the write pattern differs
+            with migrated_database(synchronous=args.synchronous) as db:
+                writer = InvoiceWriter(db, args.window if mode == "group commit" else 0.0)
+                save = (lambda: save_row_by_row(db, "Customer", CART, ITEMS_PRICES)) if mode == "row-by-row" else \
+                    (lambda: writer.save("Customer", CART, ITEMS_PRICES))
+
+                def work():
+                    for _ in range(args.invoices):
+                        save()
+
+                threads = [threading.Thread(target=work) for _ in range(writers)]
+                start = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - start
+                assert db.execute("SELECT count(*) FROM sales").fetchone()[0] == writers * args.invoices * len(CART)
+            commits = f", {writers * args.invoices / writer.transactions:.1f} invoices/commit" \
+                if mode == "group commit" else ""
+            results.append(f"{mode} {writers * args.invoices / elapsed:7.0f}/s{commits}")
+        print(f"{writers:>2} writers: " + " | ".join(results))
+
+
+# -------------------
+# Write-behind Invoice Queue
+# -------------------
+def hold_write_lock(path, hold, every, stop):
+    """Another writer (a report, a second till) taking the write lock for `hold` s every `every` s."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    while not stop.wait(every):
+        conn.execute("BEGIN IMMEDIATE")
+        time.sleep(hold)
+        conn.execute("COMMIT")
+    conn.close()
+
+
+def bench_writebehind(args):
+    budget = 1000.0 / args.fps
+    print(f"{args.frames} frames at {args.fps:.0f} FPS ({budget:.1f} ms budget), an invoice every "
+          f"{args.every} frames; another writer holds the lock {args.hold * 1000:.0f} ms every "
+          f"{args.lock_every:.1f} s; busy timeout {args.busy_timeout * 1000:.0f} ms")
+    for mode in ("inline", "write-behind"):
+        with migrated_database(timeout=args.busy_timeout, synchronous="FULL") as db:
+            writer = InvoiceWriter(db)
+            saver = WriteBehindQueue(writer).start() if mode == "write-behind" else writer
+            stop = threading.Event()
+            locker = threading.Thread(target=hold_write_lock, args=(db.path, args.hold, args.lock_every, stop))
+            locker.start()
+
+            stalls, errors = [], 0
+            for i in range(args.frames):
+                frame_start = time.perf_counter()
+                if i % args.every == 0:
+                    try:
+                        saver.save("Customer", CART, ITEMS_PRICES)
+                    except sqlite3.OperationalError:
+                        errors += 1
+                    stalls.append(1000.0 * (time.perf_counter() - frame_start))
+                time.sleep(max(0.0, budget / 1000.0 - (time.perf_counter() - frame_start)))
+            if mode == "write-behind":
+                saver.close()
+            stop.set()
+            locker.join()
+            saved = db.execute("SELECT count(*) FROM sales").fetchone()[0] // len(CART)
+        stalls = np.array(stalls)
+        print(f"{mode:<13} save() in the frame loop: p50 {np.median(stalls):7.3f} ms  max {stalls.max():7.1f} ms  "
+              f"frames over budget {int((stalls > budget).sum())}  saved {saved}/{len(stalls)}  errors {errors}")
+        if mode == "write-behind":
+            print(saver.summary())
+
+
+# -------------------
+# Invoice Schema
+# -------------------
+def bench_schema(args):
+    day = datetime.datetime(2024, 1, 1) + datetime.timedelta(days=args.days // 2)
+    week = day + datetime.timedelta(days=7)
+    month = day + datetime.timedelta(days=30)
+    text = lambda date: date.strftime("%Y-%m-%d %H:%M:%S")
+    epoch = lambda date: int(date.timestamp())
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        path = os.path.join(tmp, "sales.db")
+        start = time.perf_counter()
+        db = legacy_database(path, legacy_sales(args.lines, args.days, args.customers, args.items))
+        print(f"{args.lines:,} line items over {args.days} days written in {time.perf_counter() - start:.1f} s, "
+              f"{os.path.getsize(path) / 2 ** 20:.0f} MB")
+
+        legacy = [
+            ("one day's revenue", "SELECT count(DISTINCT customer_name || date), sum(total) FROM sales "
+                                  "WHERE date >= ? AND date < ?", (text(day), text(day + datetime.timedelta(days=1)))),
+            ("one item, one week", "SELECT sum(quantity), sum(total) FROM sales "
+                                   "WHERE item_name = ? AND date >= ? AND date < ?", ("item7", text(day), text(week))),
+            ("one customer, 30 days", "SELECT date, sum(total) FROM sales WHERE customer_name = ? AND date >= ? "
+                                      "AND date < ? GROUP BY date ORDER BY date",
+             ("customer3", text(day), text(month))),
+        ]
+        legacy_results = []
+        for _, sql, params in legacy:
+            db.execute(sql, params).fetchall()  # Warm the page cache
+            legacy_results.append((median_ms(lambda: db.execute(sql, params).fetchall(), args.legacy_repeat),
+                                   query_plan(db, sql, params)))
+
+        start = time.perf_counter()
+        migrate(db, None)
+        print(f"migrated to schema version {db.execute('PRAGMA user_version').fetchone()[0]} in "
+              f"{time.perf_counter() - start:.1f} s, {os.path.getsize(path) / 2 ** 20:.0f} MB")
+
+        # The storage query functions, timed with their SQL so the plan can be shown
+        current = [
+            (lambda: revenue_between(db, epoch(day), epoch(day + datetime.timedelta(days=1))),
+             "SELECT count(*), sum(total_cents) FROM invoices WHERE date >= ? AND date < ?",
+             (epoch(day), epoch(day + datetime.timedelta(days=1)))),
+            (lambda: item_sales(db, "item7", epoch(day), epoch(week)),
+             "SELECT sum(quantity), sum(total_cents) FROM invoice_lines WHERE product_id = "
+             "(SELECT id FROM products WHERE name = ?) AND date >= ? AND date < ?", ("item7", epoch(day), epoch(week))),
+            (lambda: customer_invoices(db, "customer3", epoch(day), epoch(month)),
+             "SELECT date, total_cents FROM invoices WHERE customer = ? AND date >= ? AND date < ? ORDER BY date",
+             ("customer3", epoch(day), epoch(month))),
+        ]
+        for (name, _, _), (legacy_ms, legacy_plan), (query, sql, params) in zip(legacy, legacy_results, current):
+            query()
+            current_ms = median_ms(query, args.repeat)
+            print(f"{name:<22} sales table {legacy_ms:9.2f} ms   invoice tables {current_ms:7.3f} ms   "
+                  f"({legacy_ms / max(current_ms, 1e-6):,.0f}x)")
+            print(f"{'':<22} before: {legacy_plan}\n{'':<22} after:  {query_plan(db, sql, params)}")
+        db.close()
+
+
+# -------------------
+# Sales Rollups
+# -------------------
+def raw_day_report(db, day):
+    """The end-of-day report of day_items(), day_summary() and day_lanes() from the invoice rows."""
+    start, end = day_bounds(day)
+    items = db.execute('''SELECT p.name, sum(l.quantity), sum(l.total_cents) AS total FROM invoices i
+                          JOIN invoice_lines l ON l.invoice_id = i.id JOIN products p ON p.id = l.product_id
+                          WHERE i.date >= ? AND i.date < ? GROUP BY l.product_id ORDER BY total DESC''',
+                       (start, end)).fetchall()
+    lanes = db.execute(f'''SELECT {local_hour('date')} AS hour, coalesce(lane, '') AS lane, count(*), sum(total_cents)
+                          FROM invoices WHERE date >= ? AND date < ? GROUP BY 1, 2 ORDER BY 1, 2''',
+                       (start, end)).fetchall()
+    return items, revenue_between(db, start, end), lanes
+
+
+def rollup_day_report(db, day):
+    return day_items(db, day), day_summary(db, day), day_lanes(db, day)
+
+
+def bench_rollups(args):
+    # All-time revenue per item, as a dashboard total would show it
+    raw_totals = "SELECT product_id, sum(total_cents) FROM invoice_lines GROUP BY product_id"
+    rollup_totals = "SELECT product_id, sum(total_cents) FROM daily_item_sales GROUP BY product_id"
+    print(f"{args.lines_per_day:,} line items a day; end-of-day report and all-time item totals in ms")
+    print(f"{'history':>12} {'days':>5} {'migrate s':>9} {'day raw':>8} {'day rollup':>10} "
+          f"{'totals raw':>10} {'totals rollup':>13} {'check s':>8} {'rebuild s':>9}")
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        for lines in args.lines:
+            days = max(1, lines // args.lines_per_day)
+            path = os.path.join(tmp, f"sales{lines}.db")
+            db = legacy_database(path, legacy_sales(lines, days, args.customers, args.items))
+            start = time.perf_counter()
+            migrate(db, None)
+            migrate_s = time.perf_counter() - start
+
+            day = datetime.date(2024, 1, 1) + datetime.timedelta(days=days // 2)
+            raw, rolled = raw_day_report(db, day), rollup_day_report(db, day)
+            if sorted(raw[0]) != sorted(rolled[0]) or raw[1] != rolled[1] or raw[2] != rolled[2]:
+                raise RuntimeError("Rollup report differs from the invoice rows")
+            day_raw = median_ms(lambda: raw_day_report(db, day), args.repeat)
+            day_rollup = median_ms(lambda: rollup_day_report(db, day), args.repeat)
+            totals_raw = median_ms(lambda: db.execute(raw_totals).fetchall(), 3)
+            totals_rollup = median_ms(lambda: db.execute(rollup_totals).fetchall(), args.repeat)
+
+            start = time.perf_counter()
+            with db.transaction() as conn:
+                if any(check_rollups(conn).values()):
+                    raise RuntimeError("Rollup tables differ from the invoice rows")
+            check_s = time.perf_counter() - start
+            start = time.perf_counter()
+            with db.transaction(immediate=True) as conn:
+                rebuild_rollups(conn)
+            rebuild_s = time.perf_counter() - start
+            print(f"{lines:>12,} {days:>5} {migrate_s:>9.1f} {day_raw:>8.2f} {day_rollup:>10.3f} "
+                  f"{totals_raw:>10.1f} {totals_rollup:>13.2f} {check_s:>8.1f} {rebuild_s:>9.1f}")
+            if lines != args.lines[-1]:
+                db.close()
+                os.remove(path)
+
+        # What the triggers add to a checkout's commit, on the largest database
+        cart = {f"item{i}": 1 + i % 3 for i in range(args.cart)}
+        prices = {item: 1.99 for item in cart}
+        writer = InvoiceWriter(db)
+        print(f"{args.cart}-line invoice commits on the {args.lines[-1]:,}-line database")
+        for label in ("rollup triggers", "no triggers"):
+            writer.save("customer", cart, prices)
+            report(f"commit, {label}", time_call(lambda: writer.save("customer", cart, prices), args.invoices))
+            for (name,) in db.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+                db.execute(f"DROP TRIGGER {name}")
+        db.close()
+
+
+def add_parsers(subparsers):
+    p = subparsers.add_parser("storage", help="connect-per-call vs pooled, tuned SQLite connections")
+    p.add_argument("--rows", type=int, default=3000, help="rows already in the sales table")
+    p.add_argument("--repeat", type=int, default=500)
+    p.set_defaults(func=bench_storage)
+
+    p = subparsers.add_parser("invoices", help="invoice commits per second with concurrent writers")
+    p.add_argument("--writers", type=int, nargs="+", default=[1, 4, 16])
+    p.add_argument("--invoices", type=int, default=200, help="invoices per writer")
+    p.add_argument("--window", type=float, default=0.003, help="group-commit window in seconds")
+    p.add_argument("--synchronous", default="NORMAL", choices=["OFF", "NORMAL", "FULL"])
+    p.set_defaults(func=bench_invoices)
+
+    p = subparsers.add_parser("writebehind", help="frame-loop stalls of inline vs queued invoice writes")
+    p.add_argument("--frames", type=int, default=600)
+    p.add_argument("--fps", type=float, default=30.0)
+    p.add_argument("--every", type=int, default=10, help="commit an invoice every this many frames")
+    p.add_argument("--hold", type=float, default=0.15, help="seconds another writer holds the lock")
+    p.add_argument("--lock-every", type=float, default=1.0, help="seconds between the other writer's locks")
+    p.add_argument("--busy-timeout", type=float, default=0.05, help="SQLite busy timeout in seconds")
+    p.set_defaults(func=bench_writebehind)
+
+    p = subparsers.add_parser("schema", help="date-range and per-item queries before and after the invoice migration")
+    p.add_argument("--lines", type=int, default=10_000_000, help="line items in the generated history")
+    p.add_argument("--days", type=int, default=730)
+    p.add_argument("--customers", type=int, default=5000)
+    p.add_argument("--items", type=int, default=80)
+    p.add_argument("--repeat", type=int, default=50)
+    p.add_argument("--legacy-repeat", type=int, default=3, help="repeats of the (full-scan) queries on the old table")
+    p.add_argument("--dir", help="directory for the temporary database (needs a few GB at 10M lines)")
+    p.set_defaults(func=bench_schema)
+
+    p = subparsers.add_parser("rollups", help="end-of-day reports from the rollup tables as history grows")
+    p.add_argument("--lines", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000],
+                   help="line items of history, one database each")
+    p.add_argument("--lines-per-day", type=int, default=13_700)
+    p.add_argument("--customers", type=int, default=5000)
+    p.add_argument("--items", type=int, default=80)
+    p.add_argument("--repeat", type=int, default=50)
+    p.add_argument("--cart", type=int, default=5, help="lines per invoice in the commit comparison")
+    p.add_argument("--invoices", type=int, default=500)
+    p.add_argument("--dir", help="directory for the temporary databases (needs a few GB at 10M lines)")
+    p.set_defaults(func=bench_rollups)
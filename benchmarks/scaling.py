@@ -0,0 +1,168 @@
+"""Scaling across processes: lanes, the shared inference server and the shared-memory frame ring."""
+import multiprocessing
+import time
+
+import numpy as np
+
+from benchmarks.harness import (SyntheticDetector, SyntheticNetwork, add_frame_args, add_model_args, aggregate_fps,
+                                engine_options, every_frame, synthetic_clip)
+from frame_ring import FrameRing
+from inference_server import InferenceServer
+from lanes import LaneSupervisor, available_cpus
+
+
+# -------------------
+# Multi-lane Scaling
+# -------------------
+def bench_lanes(args):
+    cpus = available_cpus()
+    print(f"{len(cpus)} CPUs available; synthetic detector busy for {args.latency * 1000:.0f} ms/frame"
+          if not args.weights else f"{len(cpus)} CPUs available")
+    with synthetic_clip(args.frames, args.width, args.height) as clip:
+        net = None if args.weights else SyntheticDetector(args.latency, busy=True)
+        options = engine_options(args, net=net, **every_frame())
+        baseline = None
+        for count in args.lanes:
+            lane_fps = aggregate_fps(LaneSupervisor({str(i + 1): clip for i in range(count)}, options,
+                                                    pin_cpus=not args.no_pin))
+            total = sum(lane_fps)
+            baseline = baseline or total
+            print(f"{count:>2} lanes   aggregate {total:7.1f} FPS   per lane {np.mean(lane_fps):6.1f} FPS "
+                  f"(min {min(lane_fps):6.1f})   scaling {total / baseline:4.2f}x")
+
+
+# -------------------
+# Shared Inference Server
+# -------------------
+def bench_server(args):
+    if args.weights:
+        print("Model per lane vs one shared server, real model")
+    else:
+        print(f"Synthetic model: {args.fixed * 1000:.0f} ms per forward pass + "
+              f"{args.latency * 1000:.0f} ms per image (CPU-bound)")
+    with synthetic_clip(args.frames, args.width, args.height) as clip:
+        for count in args.lanes:
+            lanes = {str(i + 1): clip for i in range(count)}
+
+            net = None if args.weights else SyntheticDetector(args.fixed + args.latency, busy=True)
+            fps = sum(aggregate_fps(LaneSupervisor(lanes, engine_options(args, net=net, **every_frame()))))
+            print(f"{count:>2} lanes, model per lane   aggregate {fps:7.1f} FPS")
+
+            network = None if args.weights else SyntheticNetwork(args.latency, fixed=args.fixed, busy=True)
+            server = InferenceServer(lanes, args.weights, args.config, max_batch_size=args.max_batch_size,
+                                     max_wait=args.max_wait, network=network)
+            server.start()
+            fps = sum(aggregate_fps(LaneSupervisor(lanes, engine_options(args, **every_frame()),
+                                                   lane_options={lane: {"net": server.client(lane)}
+                                                                 for lane in lanes})))
+            stats = server.stop()
+            latency = max(lane["p95_ms"] for lane in stats["lanes"].values())
+            print(f"{count:>2} lanes, shared server    aggregate {fps:7.1f} FPS   mean batch "
+                  f"{stats['mean_batch']:.2f}   worst lane p95 {latency:.1f} ms")
+            for line in server.summary()[1:]:
+                print(line)
+
+
+# -------------------
+# Shared-memory Frame Ring
+# -------------------
+def ring_consumer(ring, frames, results):
+    reader = ring.reader()
+    checksum = 0
+    frame = None
+    while reader.seq < frames:
+        seq, frame = reader.next(timeout=2.0)
+        if seq is None:
+            break
+        checksum += int(frame[::32, ::32, 0].sum())
+        reader.done(seq)
+    del frame
+    results.put((reader.frames, reader.skipped))
+    ring.close()
+
+
+def queue_consumer(frames_queue, results):
+    received = 0
+    checksum = 0
+    while True:
+        frame = frames_queue.get()
+        if frame is None:
+            break
+        checksum += int(frame[::32, ::32, 0].sum())
+        received += 1
+    results.put((received, 0))
+
+
+def bench_ring(args):
+    shape = (args.height, args.width, 3)
+    rng = np.random.default_rng(0)
+    source = [rng.integers(0, 255, shape, dtype=np.uint8) for _ in range(8)]
+    context = multiprocessing.get_context("spawn")
+    print(f"{args.consumers} consumers, {args.frames} frames of {args.width}x{args.height} at {args.fps:.0f} FPS")
+
+    for mode in ("queue", "ring"):
+        results = context.Queue()
+        if mode == "ring":
+            ring = FrameRing(shape, slots=args.slots)
+            consumers = [context.Process(target=ring_consumer, args=(ring, args.frames, results))
+                         for _ in range(args.consumers)]
+        else:
+            queues = [context.Queue() for _ in range(args.consumers)]
+            consumers = [context.Process(target=queue_consumer, args=(q, results)) for q in queues]
+        for consumer in consumers:
+            consumer.start()
+        time.sleep(1.0)  # Let the consumers finish importing
+
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        for i in range(args.frames):
+            img = source[i % len(source)]
+            if mode == "ring":
+                ring.write(img)
+            else:
+                for q in queues:
+                    q.put(img)
+            time.sleep(max(0.0, start + (i + 1) / args.fps - time.perf_counter()))
+        if mode == "queue":
+            for q in queues:
+                q.put(None)
+        received = [results.get(timeout=60) for _ in consumers]
+        cpu_per_frame = (time.process_time() - cpu_start) / args.frames * 1e6
+        for consumer in consumers:
+            consumer.join()
+        if mode == "ring":
+            ring.close()
+            ring.unlink()
+
+        # queue: pickled once per consumer in the producer and unpickled in each consumer;
+        # ring: written once into shared memory and read in place
+        copies = 1 if mode == "ring" else 2 * args.consumers
+        frames = [count for count, _ in received]
+        print(f"{mode:<6} {copies:>2} frame copies/frame ({copies * img.nbytes / 1e6:6.1f} MB)   "
+              f"producer CPU {cpu_per_frame:8.1f} us/frame   frames read per consumer "
+              f"min {min(frames)} max {max(frames)}   skipped {sum(s for _, s in received)}")
+
+
+def add_parsers(subparsers):
+    p = subparsers.add_parser("lanes", help="aggregate throughput with 1..N lane worker processes")
+    p.add_argument("--lanes", type=int, nargs="+", default=[1, 2, 4])
+    add_model_args(p, 0.01, "synthetic detector CPU time per frame in seconds")
+    add_frame_args(p, frames=300)
+    p.add_argument("--no-pin", action="store_true", help="don't pin lanes to CPU cores")
+    p.set_defaults(func=bench_lanes)
+
+    p = subparsers.add_parser("server", help="model per lane vs one batched inference server")
+    p.add_argument("--lanes", type=int, nargs="+", default=[1, 2, 4])
+    add_model_args(p, 0.004, "synthetic CPU time per image in seconds")
+    p.add_argument("--fixed", type=float, default=0.006, help="synthetic CPU time per forward pass in seconds")
+    p.add_argument("--max-batch-size", type=int, default=8)
+    p.add_argument("--max-wait", type=float, default=0.005, help="seconds the server waits for a fuller batch")
+    add_frame_args(p, frames=300)
+    p.set_defaults(func=bench_server)
+
+    p = subparsers.add_parser("ring", help="frame copies of the frame ring vs per-consumer queues")
+    p.add_argument("--consumers", type=int, default=3)
+    p.add_argument("--fps", type=float, default=60.0)
+    p.add_argument("--slots", type=int, default=4)
+    add_frame_args(p, frames=300, width=1280, height=720)
+    p.set_defaults(func=bench_ring)
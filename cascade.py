@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+
+
+# -------------------
+# Two-stage Cascade
+# -------------------
+class CascadeDetector:
+    """Run a cheap first-stage detector on every frame and the full detector only when needed.
+
+    The first stage (e.g. the same SSD at a 192x192 input) looks for
+    candidates down to thres - margin. The full detector runs only when a
+    candidate's confidence is within `margin` of thres, where the cheap
+    model's answer is too uncertain to trust: a low-confidence item may or
+    may not be on the tray, and a borderline other class may be a
+    misclassified item. Frames with nothing, or only confident detections,
+    keep the first-stage result.
+
+    Has the same detect() contract as cv2.dnn_DetectionModel, so it can be
+    passed to DetectionEngine as net.
+    """
+
+    def __init__(self, first, full, thres=0.45, margin=0.1):
+        self.first = first
+        self.full = full
+        self.thres = thres
+        self.margin = margin
+
+        self.frames = 0
+        self.full_runs = 0
+        self.first_seconds = 0.0
+        self.full_seconds = 0.0
+
+    def needs_full(self, confs):
+        """True when the first stage reported a candidate within margin of thres."""
+        if confs is None or not len(confs):
+            return False
+        confs = np.asarray(confs, dtype=np.float32).reshape(-1)
+        return bool((np.abs(confs - self.thres) <= self.margin).any())
+
+    def detect(self, img, confThreshold=0.5):
+        self.frames += 1
+        start = time.perf_counter()
+        result = self.first.detect(img, confThreshold=max(0.0, min(confThreshold, self.thres) - self.margin))
+        self.first_seconds += time.perf_counter() - start
+        if not self.needs_full(result[1]):
+            return result
+
+        start = time.perf_counter()
+        result = self.full.detect(img, confThreshold=confThreshold)
+        self.full_seconds += time.perf_counter() - start
+        self.full_runs += 1
+        return result
+
+    def saved_seconds(self):
+        """Estimated detector time saved against running the full model on every frame."""
+        if not self.full_runs:
+            return 0.0
+        full_latency = self.full_seconds / self.full_runs
+        return (self.frames - self.full_runs) * full_latency - self.first_seconds
+
+    def summary(self):
+        """One-line report of how often each stage ran and the latency saved."""
+        if not self.frames:
+            return "Cascade: no frames"
+        saved = self.saved_seconds()
+        return (f"Cascade: first stage ran on {self.frames} frames, full detector on {self.full_runs} "
+                f"({100.0 * self.full_runs / self.frames:.0f}%), saved {1000.0 * saved / self.frames:.1f} ms/frame "
+                f"({saved:.2f} s)")
@@ -1,27 +1,17 @@
+import datetime
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import sqlite3
-import datetime
 import pandas as pd
 
+from schema import migrate
+from storage import day_summary, invoice_writer, sales_db
+
 # -------------------
 # Database Setup
 # -------------------
 def init_sales_db():
-    """Initialize the SQLite database with a sales table if it doesn't exist."""
-    conn = sqlite3.connect("sales.db")
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS sales (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    customer_name TEXT,
-                    item_name TEXT,
-                    quantity INTEGER,
-                    price REAL,
-                    total REAL,
-                    date TEXT
-                )''')
-    conn.commit()
-    conn.close()
+    """Create the sales database or upgrade it to the current schema (see schema.py)."""
+    migrate(sales_db())
 
 init_sales_db()
 
@@ -36,6 +26,8 @@ class SalesApp:
 
         # Header
         tk.Label(master, text="Sales Records", font=("Arial", 14, "bold")).pack(pady=10)
+        self.today_label = tk.Label(master, font=("Arial", 11))
+        self.today_label.pack()
 
         # Table Frame
         self.tree = ttk.Treeview(master, columns=("ID", "Customer", "Item", "Qty", "Price", "Total", "Date"), show="headings")
@@ -61,13 +53,13 @@ class SalesApp:
     def load_sales_data(self):
         """Load sales data into the table."""
         self.tree.delete(*self.tree.get_children())  # Clear existing records
-        conn = sqlite3.connect("sales.db")
-        c = conn.cursor()
-        c.execute("SELECT * FROM sales")
-        rows = c.fetchall()
+        rows = sales_db().execute("SELECT * FROM sales").fetchall()
         for row in rows:
             self.tree.insert("", "end", values=row)
-        conn.close()
+
+        # Read from the daily rollups, so it costs the same however long the history
+        invoices, revenue = day_summary(sales_db(), datetime.date.today())
+        self.today_label.config(text=f"Today: {invoices} invoices, ${revenue / 100:.2f}")
 
     def add_sale_window(self):
         """Open a window to add a new sale."""
@@ -110,17 +102,7 @@ class SalesApp:
             messagebox.showerror("Error", "Quantity must be a number and Price must be a valid decimal!")
             return
 
-        qty = int(qty)
-        price = float(price)
-        total = qty * price
-        date_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        conn = sqlite3.connect("sales.db")
-        c = conn.cursor()
-        c.execute("INSERT INTO sales (customer_name, item_name, quantity, price, total, date) VALUES (?, ?, ?, ?, ?, ?)",
-                  (customer, item, qty, price, total, date_time))
-        conn.commit()
-        conn.close()
+        invoice_writer().save(customer, {item: int(qty)}, {item: float(price)})
 
         messagebox.showinfo("Success", "Sale added successfully!")
         self.new_window.destroy()
@@ -128,11 +110,7 @@ class SalesApp:
 
     def export_to_excel(self):
         """Export sales data to an Excel file."""
-        conn = sqlite3.connect("sales.db")
-        c = conn.cursor()
-        c.execute("SELECT * FROM sales")
-        data = c.fetchall()
-        conn.close()
+        data = sales_db().execute("SELECT * FROM sales").fetchall()
 
         if not data:
             messagebox.showerror("Error", "No sales data to export!")
@@ -0,0 +1,461 @@
+import collections
+import queue
+import threading
+import time
+
+import cv2
+
+from backends import OpenCVSSDBackend, load_fastest_detector
+from cascade import CascadeDetector
+from gating import MotionGate
+from overlay import InvoiceOverlay, draw_detections
+from postprocess import empty_detections, interest_mask, postprocess
+from profiling import StageProfiler
+from resolution import LADDER, AdaptiveResolution
+from tiling import TiledDetector
+from tracking import DetectionScheduler, MultiObjectTracker
+
+
+# -------------------
+# Model Loading
+# -------------------
+def load_class_names(class_file):
+    """Read the class list (one name per line) from a coco.names style file."""
+    with open(class_file, 'rt') as f:
+        return f.read().rstrip('\n').split('\n')
+
+
+def load_detector(weights_path, config_path, input_size=320):
+    """Build the SSD MobileNet detection model with the preprocessing it was trained with."""
+    net = cv2.dnn_DetectionModel(weights_path, config_path)
+    net.setInputSize(input_size, input_size)
+    net.setInputScale(1.0 / 127.5)
+    net.setInputMean((127.5, 127.5, 127.5))
+    net.setInputSwapRB(True)
+    return net
+
+
+def load_network(weights_path, config_path):
+    """Load the raw SSD MobileNet network, for callers that build their own input blobs."""
+    return cv2.dnn.readNet(weights_path, config_path)
+
+
+# -------------------
+# Stage Queues
+# -------------------
+class LatestQueue:
+    """Bounded hand-off between pipeline stages where the newest item always wins.
+
+    When the queue is full, putting a new item drops the oldest one instead of
+    blocking the producer, so a slow consumer only ever sees fresh frames.
+    """
+
+    def __init__(self, maxsize=1):
+        self._items = collections.deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        """Add an item, discarding the oldest one if the queue is full; returns the discarded item."""
+        with self._cond:
+            discarded = None
+            if len(self._items) == self._items.maxlen:
+                discarded = self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+            return discarded
+
+    def get(self, timeout=None):
+        """Return the oldest waiting item, or None on timeout or once closed and drained."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self._closed, timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def close(self):
+        """Wake up consumers; get() returns None once the remaining items are taken."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+# -------------------
+# Cart Events and Commands
+# -------------------
+# kind is one of "item_added", "quantity_changed", "cart_cleared" or
+# "invoice_committed"; items is a snapshot of the cart after the change
+CartEvent = collections.namedtuple('CartEvent', ['kind', 'item', 'quantity', 'items', 'total', 'timestamp'])
+
+# Keyboard shortcuts in GUI mode and the commands they send
+KEY_COMMANDS = {
+    ord('q'): 'quit',
+    ord('c'): 'clear',
+    13: 'increase',  # Enter
+    ord('s'): 'save',
+}
+
+
+# -------------------
+# Detection Engine
+# -------------------
+class DetectionEngine:
+    """Camera -> detector -> invoice display pipeline shared by every checkout script.
+
+    Capture and inference each run on their own thread and hand frames over
+    through LatestQueue, so the detector always works on the newest frame.
+    Billing, drawing and key handling happen in the render stage on the
+    thread that calls run(); on_save is called there too, so it should hand
+    the invoice off (e.g. to storage.invoice_queue()) rather than write it.
+
+    With headless=True nothing is drawn: cart changes are reported through
+    on_event (a callable or anything with put(), such as a queue.Queue) and
+    commands arrive through send_command() and its wrappers.
+
+    The optional stages are described where they live: roi
+    (roi.RegionOfInterest), tile_size (tiling.TiledDetector), cascade_size
+    (cascade.CascadeDetector), frame_budget (resolution.AdaptiveResolution),
+    preprocess='inference' or 'capture' (preprocess.BlobPreprocessor),
+    frame_ring (frame_ring.FrameRing) and fastest_backend=True
+    (backends.load_fastest_detector; otherwise the SSD is loaded without
+    racing the backends). A preloaded net and class_names (see
+    detector_registry) skip loading the model.
+
+    profile=True records per-stage latencies in self.profiler and prints
+    the stage summaries when run() ends; show_stats=True also draws them.
+    Without either, run() prints nothing.
+    """
+
+    def __init__(self, class_file, weights_path, config_path, items_prices,
+                 items_of_interest=None, source=0, thres=0.45, nms_threshold=0.2,
+                 on_save=None, on_event=None, headless=False, scheduler=None, motion_gate=None, net=None,
+                 roi=None, input_size=320, tile_size=None, tile_overlap=0.2, tile_batch=8,
+                 cascade_size=None, cascade_margin=0.1, frame_budget=None, resolution_ladder=LADDER,
+                 preprocess=None, frame_ring=None, class_names=None, fastest_backend=False, profile=False,
+                 show_stats=False, window_name="Object Detection & Billing System"):
+        self.class_names = [name.lower() for name in (class_names or load_class_names(class_file))]
+        self.items_prices = items_prices
+        self.items_of_interest = set(items_of_interest or items_prices)
+        self.interest_mask = interest_mask(self.class_names, self.items_of_interest)
+        if net is None and tile_size:
+            net = TiledDetector(load_network(weights_path, config_path), input_size,
+                                tile_size, tile_overlap, tile_batch)
+        if net is None and cascade_size:
+            net = CascadeDetector(load_detector(weights_path, config_path, cascade_size),
+                                  load_detector(weights_path, config_path, input_size),
+                                  thres, cascade_margin)
+        if net is None and preprocess:
+            net = OpenCVSSDBackend(weights_path, config_path, input_size)
+        if net is None:
+            net = (load_fastest_detector if fastest_backend else load_detector)(weights_path, config_path, input_size)
+        self.net = net
+        self.preprocess = preprocess
+        self.preprocessor = None
+        if preprocess:
+            if preprocess not in ('inference', 'capture'):
+                raise ValueError(f"preprocess must be 'inference' or 'capture', not {preprocess!r}")
+            if not hasattr(self.net, 'detect_blob'):
+                raise ValueError("An explicit preprocessing stage needs a net with preprocessor() and detect_blob()")
+            if frame_budget:
+                raise ValueError("frame_budget changes the input size, which an explicit preprocessing stage fixes")
+            self.preprocessor = self.net.preprocessor()
+        if frame_budget:
+            self.net = AdaptiveResolution(self.net, frame_budget, resolution_ladder, input_size)
+        self.roi = roi
+        self.frame_ring = frame_ring
+        self.source = source
+        self.thres = thres
+        self.nms_threshold = nms_threshold
+        self.on_save = on_save
+        self._emit = getattr(on_event, 'put', on_event)
+        self.headless = headless
+        self.scheduler = scheduler or DetectionScheduler()
+        self.motion_gate = motion_gate or MotionGate()
+        self._last_detections = empty_detections()
+        self.profiler = StageProfiler(enabled=profile or show_stats)
+        if isinstance(self.net, AdaptiveResolution):
+            self.profiler.register('resolution', self.net.snapshot)
+        self.show_stats = show_stats
+        self.window_name = window_name
+
+        # Billing state (owned by the render stage)
+        self.detected_items = {}  # Stores item counts
+        self.tracker = MultiObjectTracker()  # Counts each physical item once
+        self.last_detected_item = None  # Tracks the last detected item
+        self.overlay = InvoiceOverlay(items_prices)
+
+        self.frames = LatestQueue()
+        self.results = LatestQueue()
+        self.commands = queue.Queue()
+        self.processed_frames = 0
+        self.first_result_at = None  # perf_counter() when the first detection result was billed
+        self._prepared = None  # (blob index, width, height) filled by the capture stage for this frame
+        self._stop = threading.Event()
+        self._quit = False
+        self.error = None  # Exception that stopped the capture or inference thread
+
+    # --- Capture stage --- #
+    def _capture_loop(self, cap):
+        """Read frames as fast as the camera delivers them."""
+        try:
+            while not self._stop.is_set():
+                start = self.profiler.start()
+                success, img = cap.read()
+                self.profiler.stop('capture', start)
+                if not success:
+                    break
+                if self.frame_ring:
+                    self.frame_ring.write(img)
+                prepared = None
+                if self.preprocess == 'capture':
+                    start = self.profiler.start()
+                    region = self.roi.crop(img) if self.roi else img
+                    index = self.preprocessor.acquire()
+                    self.preprocessor(region, index)
+                    prepared = (index, region.shape[1], region.shape[0])
+                    self.profiler.stop('preprocess', start)
+                dropped = self.frames.put((img, prepared))
+                if dropped and dropped[1]:
+                    self.preprocessor.release(dropped[1][0])
+        except Exception as e:
+            self.error = e
+        finally:
+            self.frames.close()
+
+    # --- Inference stage --- #
+    def _run_net(self, img):
+        """Raw detector output for one frame, preprocessing it here unless the capture stage did."""
+        if self._prepared:
+            index, width, height = self._prepared
+            start = self.profiler.start()
+            result = self.net.detect_blob(self.preprocessor.blob(index), width, height, confThreshold=self.thres)
+            self.profiler.stop('inference', start)
+            return result
+
+        start = self.profiler.start()
+        region = self.roi.crop(img) if self.roi else img
+        if self.preprocessor:
+            index = self.preprocessor.acquire()
+            try:
+                blob = self.preprocessor(region, index)
+                self.profiler.stop('preprocess', start)
+                start = self.profiler.start()
+                result = self.net.detect_blob(blob, region.shape[1], region.shape[0], confThreshold=self.thres)
+            finally:
+                self.preprocessor.release(index)
+        else:
+            self.profiler.stop('preprocess', start)
+            start = self.profiler.start()
+            result = self.net.detect(region, confThreshold=self.thres)
+        self.profiler.stop('inference', start)
+        return result
+
+    def detect(self, img):
+        """Run the detector on one frame and return a detection array of items of interest."""
+        classIds, confs, bbox = self._run_net(img)
+
+        start = self.profiler.start()
+        detections = postprocess(classIds, confs, bbox, self.interest_mask, self.thres, self.nms_threshold)
+        if self.roi:
+            self.roi.to_frame(detections)
+        self.profiler.stop('postprocess', start)
+        return detections
+
+    def process_frame(self, img):
+        """Detections for one frame: reused on a static scene, otherwise detected or propagated."""
+        start = self.profiler.start()
+        changed = self.motion_gate.changed(self.roi.crop(img) if self.roi else img)
+        self.profiler.stop('gate', start)
+        if changed:
+            self._last_detections = self.scheduler.process(img, self.detect)
+        return self._last_detections
+
+    def _inference_loop(self):
+        """Detect objects on the newest captured frame and pass the result on."""
+        try:
+            while True:
+                item = self.frames.get()
+                if item is None:
+                    break
+                img, self._prepared = item
+                try:
+                    detections = self.process_frame(img)
+                finally:
+                    if self._prepared:
+                        self.preprocessor.release(self._prepared[0])
+                        self._prepared = None
+                self.results.put((img, detections))
+        except Exception as e:
+            self.error = e
+            self.stop()
+        finally:
+            self.results.close()
+
+    # --- Render stage --- #
+    def _event(self, kind, item=None, quantity=None):
+        """Report a cart change to the on_event callback or queue."""
+        if self._emit:
+            self._emit(CartEvent(kind, item, quantity, dict(self.detected_items),
+                                 self.cart_total(), time.time()))
+
+    def update_bill(self, detections):
+        """Add one cart line for every newly confirmed item track."""
+        for _, class_id in self.tracker.update(detections):
+            class_name = self.class_names[class_id - 1]
+            self.detected_items[class_name] = self.detected_items.get(class_name, 0) + 1
+            self.last_detected_item = class_name  # Store last detected item
+            self.overlay.invalidate()
+            self._event('item_added', class_name, self.detected_items[class_name])
+
+    def cart_total(self):
+        """Return the total price of the current cart."""
+        return sum(self.items_prices[item] * count for item, count in self.detected_items.items())
+
+    def render(self, img, detections, fps):
+        """Compose the display image: camera frame, boxes, FPS counter and invoice panel."""
+        frame = self.overlay.compose(img, self.detected_items)
+        if self.roi:
+            self.roi.draw(frame)
+        draw_detections(frame, detections, self.class_names)
+        cv2.putText(frame, f"FPS: {int(fps)}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+        if self.show_stats:
+            self.profiler.draw(frame)
+        return self.overlay.buffer
+
+    def apply_command(self, command):
+        """Apply one of the KEY_COMMANDS values to the cart (render stage only)."""
+        if command == 'quit':
+            self._quit = True
+        elif command == 'clear':  # Reset counts
+            self.detected_items.clear()
+            self.tracker.reset()  # Items still in view are counted again
+            self.last_detected_item = None
+            self.overlay.invalidate()
+            self._event('cart_cleared')
+        elif command == 'increase':  # Increase quantity of the last item
+            if self.last_detected_item:
+                self.detected_items[self.last_detected_item] += 1
+                self.overlay.invalidate()
+                self._event('quantity_changed', self.last_detected_item,
+                            self.detected_items[self.last_detected_item])
+        elif command == 'save':  # Commit the invoice
+            if self.on_save:
+                self.on_save(dict(self.detected_items), self.items_prices, self.cart_total())
+            self._event('invoice_committed')
+            # Reset the detected items after saving; tracks stay so paid items
+            # still on the tray are not billed again
+            self.detected_items.clear()
+            self.last_detected_item = None
+            self.overlay.invalidate()
+
+    def _apply_pending_commands(self):
+        while True:
+            try:
+                self.apply_command(self.commands.get_nowait())
+            except queue.Empty:
+                return
+
+    def _poll_keys(self):
+        command = KEY_COMMANDS.get(cv2.waitKey(1))
+        if command:
+            self.apply_command(command)
+
+    def _render_loop(self):
+        """Bill each detection result as it arrives and, unless headless, draw and display it."""
+        while True:
+            self._apply_pending_commands()
+            if self._quit:
+                break
+
+            result = self.results.get(timeout=0.1)
+            if result is None:
+                if self.results.closed:
+                    break
+                # Keep the window responsive while the detector is busy
+                if not self.headless:
+                    self._poll_keys()
+                continue
+
+            img, detections = result
+            start = self.profiler.start()
+            self.update_bill(detections)
+            self.profiler.stop('billing', start)
+            self.processed_frames += 1
+            if self.first_result_at is None:
+                self.first_result_at = time.perf_counter()
+            if self.headless:
+                self.profiler.frame_done()
+                continue
+
+            start = self.profiler.start()
+            combined = self.render(img, detections, self.profiler.fps())
+            self.profiler.stop('drawing', start)
+
+            # Show the frame and handle key presses
+            start = self.profiler.start()
+            cv2.imshow(self.window_name, combined)
+            self._poll_keys()
+            self.profiler.stop('display', start)
+            self.profiler.frame_done()
+
+        # Commands sent while the source was ending still apply, e.g. a final commit
+        self._apply_pending_commands()
+
+    # --- Commands --- #
+    def send_command(self, command):
+        """Queue a command for the render stage; safe to call from any thread."""
+        self.commands.put(command)
+
+    def quit(self):
+        self.send_command('quit')
+
+    def clear_cart(self):
+        self.send_command('clear')
+
+    def increase_quantity(self):
+        self.send_command('increase')
+
+    def commit_invoice(self):
+        self.send_command('save')
+
+    # --- Lifecycle --- #
+    def stop(self):
+        """Ask the capture stage to stop; the other stages drain and exit."""
+        self._stop.set()
+
+    def run(self):
+        """Start capture and inference threads and run the render stage until quit.
+
+        An exception raised in the capture or inference thread is re-raised
+        here once the pipeline has shut down.
+        """
+        cap = cv2.VideoCapture(self.source)
+        capture = threading.Thread(target=self._capture_loop, args=(cap,), daemon=True)
+        inference = threading.Thread(target=self._inference_loop, daemon=True)
+        capture.start()
+        inference.start()
+        try:
+            self._render_loop()
+        finally:
+            self.stop()
+            capture.join()
+            inference.join()
+            cap.release()
+            if isinstance(self.net, AdaptiveResolution):
+                self.net.restore()  # The net may be the warm detector the next session reuses
+            if not self.headless:
+                cv2.destroyAllWindows()
+            if self.profiler.enabled:
+                print(self.motion_gate.summary())
+                print(self.scheduler.summary())
+                if isinstance(self.net, (CascadeDetector, AdaptiveResolution)):
+                    print(self.net.summary())
+                print(self.profiler.summary())
+        if self.error:
+            raise self.error
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import numpy as np
+
+from detection_engine import load_class_names, load_detector
+
+
+# -------------------
+# Warm Detector
+# -------------------
+class WarmDetector:
+    """A detector and its class list, loaded once and warmed up with a dummy forward pass.
+
+    Loading happens on a background thread started by the registry; get()
+    waits for it. The same instance is handed to every detection session,
+    so sessions should run one at a time (cv2.dnn models are not meant to
+    be called from several threads at once).
+
+    The default loader builds the SSD on cv2.dnn_DetectionModel; pass
+    loader=backends.load_fastest_detector to time every inference backend
+    whose model files are present and keep the fastest instead.
+    """
+
+    def __init__(self, class_file, weights_path, config_path, input_size=320, loader=load_detector):
+        self.class_file = class_file
+        self.weights_path = weights_path
+        self.config_path = config_path
+        self.input_size = input_size
+        self.loader = loader
+
+        self.class_names = None
+        self.net = None
+        self.error = None
+        self.load_seconds = None  # Reading the class list and building the model
+        self.warmup_seconds = None  # First (dummy) forward pass
+        self._ready = threading.Event()
+
+    def load(self):
+        """Load and warm up the detector (runs on the registry's background thread)."""
+        try:
+            start = time.perf_counter()
+            self.class_names = load_class_names(self.class_file)
+            self.net = self.loader(self.weights_path, self.config_path, self.input_size)
+            loaded = time.perf_counter()
+            self.net.detect(np.zeros((self.input_size, self.input_size, 3), dtype=np.uint8), confThreshold=0.5)
+            self.load_seconds = loaded - start
+            self.warmup_seconds = time.perf_counter() - loaded
+        except Exception as e:
+            self.error = e
+        finally:
+            self._ready.set()
+
+    @property
+    def ready(self):
+        return self._ready.is_set() and self.error is None
+
+    def get(self, timeout=None):
+        """Wait for loading to finish; re-raises a loading error."""
+        if not self._ready.wait(timeout):
+            raise TimeoutError(f"Detector {self.weights_path} is still loading after {timeout} s")
+        if self.error:
+            raise self.error
+        return self
+
+    def summary(self):
+        if not self.ready:
+            return f"Detector {self.weights_path} not loaded"
+        return (f"Detector loaded in {self.load_seconds:.2f} s, "
+                f"warm-up forward pass {self.warmup_seconds * 1000:.0f} ms")
+
+
+# -------------------
+# Process-wide Registry
+# -------------------
+_detectors = {}
+_lock = threading.Lock()
+
+
+def preload(class_file, weights_path, config_path, input_size=320, loader=load_detector):
+    """Start loading a detector in the background (once per process) and return it without waiting.
+
+    Call this at application start, before the login window, so the model
+    is warm by the time a session needs it.
+    """
+    key = (class_file, weights_path, config_path, input_size, loader)
+    with _lock:
+        detector = _detectors.get(key)
+        if detector is None or detector.error:
+            detector = WarmDetector(class_file, weights_path, config_path, input_size, loader)
+            _detectors[key] = detector
+            threading.Thread(target=detector.load, name="detector-preload", daemon=True).start()
+    return detector
+
+
+def get_detector(class_file, weights_path, config_path, input_size=320, loader=load_detector,
+                 timeout=None):
+    """The shared warm detector for these files, loading it first if nobody preloaded it."""
+    return preload(class_file, weights_path, config_path, input_size, loader).get(timeout)
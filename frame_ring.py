@@ -0,0 +1,138 @@
+import time
+
+import numpy as np
+from multiprocessing import shared_memory
+
+
+# -------------------
+# Frame Ring Buffer
+# -------------------
+class FrameRing:
+    """Fixed-size ring of frames in shared memory: one producer, any number of readers.
+
+    The producer writes each frame once into the next slot and publishes it
+    with an increasing sequence number (starting at 1). Readers in any
+    process get the newest frame as a NumPy view of the shared slot, without
+    copying or pickling it. A slot is rewritten after `slots` further frames,
+    so a reader that holds a view for longer than that must check
+    still_valid(seq) before trusting what it computed from it.
+
+    Layout: int64 header [latest seq, seq of slot 0 .. slot N-1] followed by
+    the frames. A slot's seq is set to 0 while it is being written.
+
+    Create the ring in the producing process with FrameRing(shape, slots)
+    and hand it to other processes as an argument; they attach by name. The
+    creator calls unlink() when done.
+    """
+
+    def __init__(self, shape, slots=4, name=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        header_size = (slots + 1) * 8
+        frame_size = int(np.prod(self.shape))
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=header_size + slots * frame_size)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self._header = np.ndarray((slots + 1,), dtype=np.int64, buffer=self.shm.buf)
+        self._seqs = self._header[1:]
+        self._frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=header_size)
+        if self.owner:
+            self._header[:] = 0
+
+    def __reduce__(self):
+        return (FrameRing, (self.shape, self.slots, self.shm.name))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def latest(self):
+        """Sequence number of the newest published frame (0 before the first one)."""
+        return int(self._header[0])
+
+    # --- Producer --- #
+    def writable(self):
+        """View of the slot the next frame goes into; fill it in place, then publish()."""
+        slot = (self.latest + 1) % self.slots
+        self._seqs[slot] = 0
+        return self._frames[slot]
+
+    def publish(self):
+        """Publish the frame written into writable() and return its sequence number."""
+        seq = self.latest + 1
+        self._seqs[seq % self.slots] = seq
+        self._header[0] = seq
+        return seq
+
+    def write(self, img):
+        """Copy img into the next slot and publish it."""
+        np.copyto(self.writable(), img)
+        return self.publish()
+
+    # --- Readers --- #
+    def still_valid(self, seq):
+        """True while frame seq has not been overwritten."""
+        return seq > 0 and int(self._seqs[seq % self.slots]) == seq
+
+    def read_latest(self, after=0, timeout=None, poll_interval=0.0005):
+        """(seq, frame view) of the newest frame newer than `after`, or (None, None) on timeout."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            seq = self.latest
+            if seq > after:
+                frame = self._frames[seq % self.slots]
+                if self.still_valid(seq):
+                    return seq, frame
+                continue  # Overwritten between reading latest and the slot; take the newer one
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None, None
+            time.sleep(poll_interval)
+
+    def reader(self):
+        return FrameReader(self)
+
+    def close(self):
+        del self._header, self._seqs, self._frames
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+class FrameReader:
+    """One consumer's position in a FrameRing with read-latest semantics.
+
+    next() always jumps to the newest frame, so a slow consumer skips the
+    frames it could not keep up with instead of falling behind; skipped
+    counts them and overrun counts frames whose slot was rewritten before
+    the consumer said it was done with them (done(seq) returns False).
+    """
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.seq = 0
+        self.frames = 0
+        self.skipped = 0
+        self.overrun = 0
+
+    def next(self, timeout=None):
+        """(seq, frame view) of the newest unseen frame, or (None, None) on timeout."""
+        seq, frame = self.ring.read_latest(self.seq, timeout)
+        if seq is None:
+            return None, None
+        if self.seq:
+            self.skipped += seq - self.seq - 1
+        self.seq = seq
+        self.frames += 1
+        return seq, frame
+
+    def done(self, seq):
+        """Report that the consumer finished with frame seq; False if it was overwritten meanwhile."""
+        if self.ring.still_valid(seq):
+            return True
+        self.overrun += 1
+        return False
@@ -0,0 +1,63 @@
+import cv2
+
+
+# -------------------
+# Motion Gate
+# -------------------
+class MotionGate:
+    """Skip inference while the checkout tray is not changing.
+
+    Each frame is shrunk by `scale`, converted to grayscale and compared with
+    the last frame that was let through. If fewer than `changed_fraction` of
+    the pixels differ by more than `pixel_threshold` grey levels, the scene is
+    considered static and the previous detections can be reused. Comparing
+    against the last processed frame (not the previous one) means slow drifts
+    still add up and eventually open the gate; `max_skip` forces a refresh
+    after that many skipped frames regardless.
+    """
+
+    def __init__(self, scale=0.125, pixel_threshold=25, changed_fraction=0.005, max_skip=300,
+                 enabled=True):
+        self.scale = scale
+        self.pixel_threshold = pixel_threshold
+        self.changed_fraction = changed_fraction
+        self.max_skip = max_skip
+        self.enabled = enabled
+
+        self.frames = 0
+        self.skipped = 0
+        self._reference = None
+        self._since_open = 0
+
+    def _small_gray(self, img):
+        small = cv2.resize(img, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def changed(self, img):
+        """True when img differs enough from the last processed frame to run inference."""
+        self.frames += 1
+        if not self.enabled:
+            return True
+
+        gray = self._small_gray(img)
+        if (self._reference is not None and self._reference.shape == gray.shape
+                and self._since_open < self.max_skip):
+            diff = cv2.absdiff(gray, self._reference)
+            _, moved = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+            if cv2.countNonZero(moved) < self.changed_fraction * moved.size:
+                self.skipped += 1
+                self._since_open += 1
+                return False
+
+        self._reference = gray
+        self._since_open = 0
+        return True
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def summary(self):
+        """One-line report of how often inference was skipped."""
+        return (f"Motion gate skipped {self.skipped}/{self.frames} frames "
+                f"({100.0 * self.skip_ratio:.0f}%)")
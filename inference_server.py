@@ -0,0 +1,232 @@
+import collections
+import multiprocessing
+import os
+import queue
+import time
+
+import cv2
+import numpy as np
+from multiprocessing import shared_memory
+
+from detection_engine import load_network
+
+# A lane's frame is waiting in its slot: (lane index, client pid, sequence number,
+# perf_counter when submitted, confidence threshold)
+Request = collections.namedtuple('Request', ['lane', 'pid', 'seq', 'submitted', 'threshold'])
+
+
+# -------------------
+# Lane Client
+# -------------------
+class InferenceClient:
+    """Drop-in for cv2.dnn_DetectionModel in a lane process, backed by the inference server.
+
+    detect() resizes the frame into this lane's shared-memory slot, queues a
+    request and waits for the server's answer, then scales the normalized
+    boxes back to the frame. Each lane has one slot, so it has at most one
+    request in flight. The client can be pickled into a (spawned) lane
+    process; it attaches to the shared memory on first use.
+    """
+
+    # The server allocated the slots at one input size, so it cannot be changed per lane
+    fixed_input_size = True
+
+    def __init__(self, lane, shm_name, slots, input_size, requests, responses, timeout=5.0):
+        self.lane = lane
+        self.shm_name = shm_name
+        self.slots = slots
+        self.input_size = input_size
+        self.requests = requests
+        self.responses = responses
+        self.timeout = timeout
+        self._shm = None
+        self._slot = None
+        self._seq = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_shm'] = state['_slot'] = None
+        return state
+
+    def _attach(self):
+        self._shm = shared_memory.SharedMemory(name=self.shm_name)
+        size = self.input_size
+        self._slot = np.ndarray((self.slots, size, size, 3), dtype=np.uint8, buffer=self._shm.buf)[self.lane]
+
+    def detect(self, img, confThreshold=0.5):
+        if self._slot is None:
+            self._attach()
+        cv2.resize(img, (self.input_size, self.input_size), dst=self._slot)
+        self._seq += 1
+        pid = os.getpid()
+        self.requests.put(Request(self.lane, pid, self._seq, time.perf_counter(), confThreshold))
+
+        # Answers to requests of an earlier (restarted) lane process are skipped
+        while True:
+            try:
+                answer_pid, seq, rows = self.responses.get(timeout=self.timeout)
+            except queue.Empty:
+                raise RuntimeError(f"Inference server did not answer lane {self.lane} "
+                                   f"within {self.timeout} s") from None
+            if (answer_pid, seq) == (pid, self._seq):
+                break
+
+        # rows: [class ID, confidence, x1, y1, x2, y2] with coordinates relative to the frame
+        height, width = img.shape[:2]
+        scale = np.array([width, height, width, height], dtype=np.float32)
+        corners = rows[:, 2:6] * scale
+        boxes = np.concatenate([corners[:, :2], corners[:, 2:] - corners[:, :2]], axis=1)
+        return rows[:, 0].astype(np.int32), rows[:, 1].astype(np.float32), boxes.round().astype(np.int32)
+
+
+# -------------------
+# Server Process
+# -------------------
+def next_batch(requests, max_batch_size, max_wait):
+    """Block for one request, then collect more until the batch is full or max_wait has passed.
+
+    Returns (batch, stop); stop is True once the shutdown sentinel was seen.
+    """
+    first = requests.get()
+    if first is None:
+        return [], True
+    batch = [first]
+    deadline = time.perf_counter() + max_wait
+    while len(batch) < max_batch_size:
+        remaining = deadline - time.perf_counter()
+        try:
+            request = requests.get(timeout=remaining) if remaining > 0 else requests.get_nowait()
+        except queue.Empty:
+            break
+        if request is None:
+            return batch, True
+        batch.append(request)
+    return batch, False
+
+
+def serve(network, weights_path, config_path, shm_name, lane_names, input_size, max_batch_size, max_wait,
+          requests, responses, stats):
+    """Server process entry point: batch lane requests and answer them until stopped."""
+    if network is None:
+        network = load_network(weights_path, config_path)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slots = np.ndarray((len(lane_names), input_size, input_size, 3), dtype=np.uint8, buffer=shm.buf)
+
+    latencies = {lane: collections.deque(maxlen=10000) for lane in range(len(lane_names))}
+    batch_sizes = []
+    first_request = last_answer = None
+    # Each lane has at most one request in flight, so waiting for more than that is pointless
+    max_batch_size = min(max_batch_size, len(lane_names))
+    stop = False
+    while not stop:
+        batch, stop = next_batch(requests, max_batch_size, max_wait)
+        if not batch:
+            continue
+        if first_request is None:
+            first_request = min(request.submitted for request in batch)
+
+        blob = cv2.dnn.blobFromImages([slots[request.lane] for request in batch], 1.0 / 127.5,
+                                      (input_size, input_size), (127.5, 127.5, 127.5), swapRB=True)
+        network.setInput(blob)
+        # DetectionOutput rows: [image in batch, class ID, confidence, x1, y1, x2, y2]
+        out = network.forward().reshape(-1, 7)
+
+        for index, request in enumerate(batch):
+            rows = out[(out[:, 0] == index) & (out[:, 2] > request.threshold), 1:]
+            responses[request.lane].put((request.pid, request.seq, rows))
+        last_answer = time.perf_counter()
+        for request in batch:
+            latencies[request.lane].append(last_answer - request.submitted)
+        batch_sizes.append(len(batch))
+
+    elapsed = (last_answer - first_request) if batch_sizes else 0.0
+    lanes = {}
+    for index, samples in latencies.items():
+        if samples:
+            ms = np.fromiter(samples, dtype=np.float64) * 1000.0
+            p50, p95 = np.percentile(ms, (50, 95))
+            lanes[lane_names[index]] = {"frames": len(ms), "p50_ms": float(p50), "p95_ms": float(p95)}
+    frames = int(sum(batch_sizes))
+    stats.put({
+        "frames": frames,
+        "batches": len(batch_sizes),
+        "mean_batch": frames / len(batch_sizes) if batch_sizes else 0.0,
+        "fps": frames / elapsed if elapsed > 0 else 0.0,
+        "lanes": lanes,
+    })
+    shm.close()
+
+
+class InferenceServer:
+    """One detector process that serves every lane with dynamically batched forward passes.
+
+    The network is loaded once, in the server process. Lane processes get
+    an InferenceClient from client(lane) (pass it to DetectionEngine as
+    net) and hand frames over through one shared-memory slot per lane. The
+    server takes the first waiting request, gathers more for at most
+    max_wait seconds or until max_batch_size, runs one blobFromImages +
+    forward over the batch and routes each lane its own rows. network may be
+    a picklable stand-in with setInput/forward; by default the SSD model is
+    loaded from weights_path/config_path.
+
+    Batching trades latency for one model in memory and fewer forward-pass
+    overheads, so it pays off with many lanes per machine, little memory,
+    or a backend that runs batches much faster than single frames. With a
+    few lanes on a few CPU cores a model per lane is faster: on one core,
+    two lanes ran 48 FPS on their own models against 36 FPS through the
+    server (`python benchmark.py server` measures it on this machine),
+    which is why lanes.py only uses it with --shared-model.
+    """
+
+    def __init__(self, lanes, weights_path=None, config_path=None, input_size=320, max_batch_size=8,
+                 max_wait=0.005, network=None):
+        self.lane_names = list(lanes)
+        self.input_size = input_size
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        size = len(self.lane_names) * input_size * input_size * 3
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self._context = multiprocessing.get_context("spawn")
+        self.requests = self._context.Queue()
+        self.responses = [self._context.Queue() for _ in self.lane_names]
+        self._stats = self._context.Queue()
+        self.process = self._context.Process(
+            target=serve, name="inference-server", daemon=True,
+            args=(network, weights_path, config_path, self.shm.name, self.lane_names, input_size,
+                  max_batch_size, max_wait, self.requests, self.responses, self._stats))
+        self.stats = None
+
+    def client(self, lane):
+        index = self.lane_names.index(lane)
+        return InferenceClient(index, self.shm.name, len(self.lane_names), self.input_size,
+                               self.requests, self.responses[index])
+
+    def start(self):
+        self.process.start()
+
+    def stop(self, timeout=10.0):
+        """Finish the requests already queued, stop the server and collect its statistics."""
+        self.requests.put(None)
+        try:
+            self.stats = self._stats.get(timeout=timeout)
+        except queue.Empty:
+            self.stats = None
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.shm.close()
+        self.shm.unlink()
+        return self.stats
+
+    def summary(self):
+        """Report lines with aggregate throughput and per-lane latency."""
+        if not self.stats:
+            return ["Inference server: no statistics"]
+        s = self.stats
+        lines = [f"Inference server: {s['frames']} frames in {s['batches']} batches "
+                 f"(mean batch {s['mean_batch']:.2f}), {s['fps']:.1f} FPS aggregate"]
+        for lane, lane_stats in s["lanes"].items():
+            lines.append(f"  lane {lane}: {lane_stats['frames']} frames, latency p50 {lane_stats['p50_ms']:.1f} ms "
+                         f"p95 {lane_stats['p95_ms']:.1f} ms")
+        return lines
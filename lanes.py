@@ -0,0 +1,300 @@
+"""Run several checkout lanes on one machine, one detector process per camera.
+
+    python lanes.py --lane 1=0 --lane 2=1 --lane 3=recordings/lane3.avi
+
+Every lane runs a headless DetectionEngine in its own worker process, pinned
+to its own share of the CPU cores. Cart events from all lanes are printed as
+they arrive. With --shared-model the lanes share one batched inference
+server process instead of loading the model once per lane, which saves
+memory but is usually slower with a few lanes on a few cores (see
+inference_server.InferenceServer). Type "LANE COMMAND" (e.g. "2 save") on
+stdin to send a lane one of the engine commands: save, clear, increase or
+quit. With --save-invoices every
+committed invoice is written to the sales database, tagged with its lane.
+"""
+import argparse
+import collections
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+
+import cv2
+
+from detection_engine import DetectionEngine
+from inference_server import InferenceServer
+from roi import load_roi
+from schema import migrate
+from storage import invoice_queue, sales_db
+
+ITEMS_PRICES = {"bottle": 5, "book": 10, "toothbrush": 3}
+
+# Sent by a worker when its engine stops: frames processed and seconds it ran
+LaneExit = collections.namedtuple('LaneExit', ['frames', 'seconds'])
+
+
+# -------------------
+# CPU Planning
+# -------------------
+def available_cpus():
+    """CPU IDs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_cpus(lane_names, cpus):
+    """Split cpus into one disjoint, equal share per lane.
+
+    With more lanes than CPUs every lane gets a single CPU, assigned round
+    robin, so lanes share cores but no worker spreads over all of them.
+    """
+    share = max(1, len(cpus) // len(lane_names))
+    if share * len(lane_names) <= len(cpus):
+        return {lane: cpus[i * share:(i + 1) * share] for i, lane in enumerate(lane_names)}
+    return {lane: [cpus[i % len(cpus)]] for i, lane in enumerate(lane_names)}
+
+
+# -------------------
+# Lane Worker
+# -------------------
+def lane_worker(lane, source, engine_options, cpus, threads, events, commands, roi_file=None):
+    """Process entry point: run one lane's engine and forward its cart events."""
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    # One OpenCV thread per core of the lane's share so lanes don't oversubscribe the CPU
+    cv2.setNumThreads(threads)
+
+    engine = DetectionEngine(source=source, headless=True, on_event=lambda event: events.put((lane, event)),
+                             roi=load_roi(lane, roi_file) if roi_file else None, **engine_options)
+
+    def forward_commands():
+        while True:
+            command = commands.get()
+            if command is None:
+                break
+            engine.send_command(command)
+
+    threading.Thread(target=forward_commands, daemon=True).start()
+    start = time.perf_counter()
+    engine.run()
+    events.put((lane, LaneExit(engine.processed_frames, time.perf_counter() - start)))
+
+
+# -------------------
+# Lane Supervisor
+# -------------------
+class LaneSupervisor:
+    """Start one worker process per lane, restart the ones that crash and collect their events.
+
+    lanes maps a lane name to its camera source (index, file or URL);
+    engine_options are passed on to every lane's DetectionEngine, updated
+    with lane_options[lane] where given (e.g. each lane's InferenceClient
+    from inference_server.InferenceServer as net). Workers
+    are spawned (not forked) so no OpenCV threads are inherited. A worker
+    that exits with an error is restarted after restart_delay seconds, at
+    most max_restarts times; a worker whose source simply ended stays down.
+    on_event is called with (lane, CartEvent) in the supervisor process.
+    """
+
+    def __init__(self, lanes, engine_options, on_event=None, pin_cpus=True, roi_file=None,
+                 restart_delay=1.0, max_restarts=5, lane_options=None):
+        self.lanes = dict(lanes)
+        self.engine_options = {lane: dict(engine_options, **(lane_options or {}).get(lane, {}))
+                               for lane in self.lanes}
+        self.on_event = on_event
+        self.roi_file = roi_file
+        self.restart_delay = restart_delay
+        self.max_restarts = max_restarts
+
+        cpus = available_cpus()
+        self.cpus = plan_cpus(list(self.lanes), cpus)
+        self.threads = {lane: len(share) for lane, share in self.cpus.items()}
+        if not pin_cpus:
+            self.cpus = {lane: None for lane in self.lanes}
+
+        self._context = multiprocessing.get_context("spawn")
+        self.events = self._context.Queue()
+        self.commands = {lane: self._context.Queue() for lane in self.lanes}
+        self.workers = {}
+        self.restarts = {lane: 0 for lane in self.lanes}
+        self.exits = {}  # lane -> LaneExit of its last run
+        self._restart_at = {}
+        self._given_up = set()
+        self._stopping = False
+
+    def _spawn(self, lane):
+        worker = self._context.Process(
+            target=lane_worker, name=f"lane-{lane}", daemon=True,
+            args=(lane, self.lanes[lane], self.engine_options[lane], self.cpus[lane], self.threads[lane],
+                  self.events, self.commands[lane], self.roi_file))
+        worker.start()
+        self.workers[lane] = worker
+
+    def start(self):
+        for lane in self.lanes:
+            self._spawn(lane)
+
+    def send_command(self, lane, command):
+        """Send an engine command ('save', 'clear', 'increase', 'quit') to one lane."""
+        self.commands[lane].put(command)
+
+    @property
+    def running(self):
+        return any(worker.is_alive() for worker in self.workers.values()) or bool(self._restart_at)
+
+    def _check_workers(self):
+        """Schedule restarts for crashed workers and start the ones that are due."""
+        if self._stopping:
+            return
+        now = time.monotonic()
+        for lane, worker in self.workers.items():
+            if (worker.is_alive() or worker.exitcode == 0
+                    or lane in self._restart_at or lane in self._given_up):
+                continue
+            if self.restarts[lane] < self.max_restarts:
+                print(f"Lane {lane} worker exited with code {worker.exitcode}; "
+                      f"restarting in {self.restart_delay:.1f} s")
+                self._restart_at[lane] = now + self.restart_delay
+            else:
+                print(f"Lane {lane} worker exited with code {worker.exitcode}; giving up")
+                self._given_up.add(lane)
+        for lane, due in list(self._restart_at.items()):
+            if now >= due:
+                del self._restart_at[lane]
+                self.restarts[lane] += 1
+                self._spawn(lane)
+
+    def poll(self, timeout=0.1):
+        """Deliver the cart events that arrive within timeout and look after the workers."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                lane, event = self.events.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if isinstance(event, LaneExit):
+                self.exits[lane] = event
+            elif self.on_event:
+                self.on_event(lane, event)
+        self._check_workers()
+
+    def run(self):
+        """Start every lane and supervise until all of them have stopped."""
+        self.start()
+        try:
+            while self.running:
+                self.poll()
+        finally:
+            self.stop()
+
+    def stop(self, timeout=5.0):
+        """Ask every lane to quit, then terminate the ones that don't."""
+        self._stopping = True
+        self._restart_at.clear()
+        for lane, worker in self.workers.items():
+            if worker.is_alive():
+                self.send_command(lane, 'quit')
+                self.commands[lane].put(None)
+        deadline = time.monotonic() + timeout
+        for worker in self.workers.values():
+            worker.join(max(0.0, deadline - time.monotonic()))
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        # Pick up the events sent while the lanes were shutting down
+        self.poll(timeout=0)
+
+
+# -------------------
+# Command Line
+# -------------------
+def print_event(lane, event):
+    item = f" {event.item} x{event.quantity}" if event.item else ""
+    print(f"[lane {lane}] {event.kind}{item}  cart {event.items}  total ${event.total}")
+
+
+def save_lane_invoice(lane, event):
+    """Print the event and queue the invoice of a committed cart, tagged with its lane."""
+    print_event(lane, event)
+    if event.kind == 'invoice_committed':
+        invoice_queue().save(None, event.items, ITEMS_PRICES, lane=lane)
+
+
+def read_commands(supervisor):
+    """Forward "LANE COMMAND" lines from stdin to the lanes."""
+    for line in sys.stdin:
+        parts = line.split()
+        if len(parts) == 2 and parts[0] in supervisor.lanes:
+            supervisor.send_command(*parts)
+        elif parts:
+            print(f"Expected LANE COMMAND with LANE one of {', '.join(supervisor.lanes)}")
+
+
+def parse_lane(spec):
+    lane, _, source = spec.partition("=")
+    if not source:
+        raise argparse.ArgumentTypeError(f"expected LANE=SOURCE, got {spec!r}")
+    return lane, int(source) if source.isdigit() else source
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lane", type=parse_lane, action="append", required=True, metavar="LANE=SOURCE",
+                        help="lane name and camera index, video file or stream URL (repeatable)")
+    parser.add_argument("--class-file", default="coco.names")
+    parser.add_argument("--weights", default="frozen_inference_graph.pb")
+    parser.add_argument("--config", default="ssd_mobilenet_v3_large_coco_2020_01_14.pbtxt")
+    parser.add_argument("--thres", type=float, default=0.45)
+    parser.add_argument("--frame-budget", type=float,
+                        help="seconds of inference per frame; adapts each lane's input size to fit it")
+    parser.add_argument("--roi-file", help="per-lane regions of interest written by roi.py")
+    parser.add_argument("--no-pin", action="store_true", help="don't pin lanes to CPU cores")
+    parser.add_argument("--shared-model", action="store_true",
+                        help="run one batched inference server for all lanes instead of a model per lane")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait", type=float, default=0.005, help="seconds to wait for a fuller batch")
+    parser.add_argument("--save-invoices", action="store_true",
+                        help="write committed invoices to the sales database with their lane")
+    args = parser.parse_args()
+    if args.shared_model and args.frame_budget:
+        parser.error("--frame-budget adapts a lane's own model and cannot be used with --shared-model")
+
+    lanes = dict(args.lane)
+    engine_options = dict(class_file=args.class_file, weights_path=args.weights, config_path=args.config,
+                          items_prices=ITEMS_PRICES, thres=args.thres, frame_budget=args.frame_budget)
+    server = None
+    lane_options = None
+    if args.shared_model:
+        server = InferenceServer(lanes, args.weights, args.config, max_batch_size=args.max_batch_size,
+                                 max_wait=args.max_wait)
+        server.start()
+        lane_options = {lane: {"net": server.client(lane)} for lane in lanes}
+    on_event = print_event
+    if args.save_invoices:
+        migrate(sales_db())
+        on_event = save_lane_invoice
+    supervisor = LaneSupervisor(lanes, engine_options, on_event=on_event, pin_cpus=not args.no_pin,
+                                roi_file=args.roi_file, lane_options=lane_options)
+    for lane, cpus in supervisor.cpus.items():
+        print(f"Lane {lane}: source {supervisor.lanes[lane]}, CPUs {cpus or 'any'}, "
+              f"{supervisor.threads[lane]} OpenCV threads")
+    threading.Thread(target=read_commands, args=(supervisor,), daemon=True).start()
+    try:
+        supervisor.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server:
+            server.stop()
+            for line in server.summary():
+                print(line)
+        if args.save_invoices:
+            invoice_queue().flush()
+            print(invoice_queue().summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,25 @@
 import tkinter as tk
 from tkinter import messagebox
-import sqlite3
+
+from storage import users_db
 
 # -------------------
 # Database Setup
 # -------------------
 def init_user_db():
     """Initialize the SQLite database with a user table if it doesn't exist."""
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT,
-                    password TEXT
-                )''')
-    conn.commit()
-    conn.close()
+    with users_db().transaction() as conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS users (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            username TEXT,
+                            password TEXT
+                        )''')
 
 # Create an example user if the database is empty
 def create_example_user():
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
-    c.execute("SELECT * FROM users")
-    if not c.fetchall():  # If no users exist, create an example user
-        c.execute("INSERT INTO users (username, password) VALUES (?, ?)", ("admin", "password123"))
-        conn.commit()
-    conn.close()
+    with users_db().transaction() as conn:
+        if not conn.execute("SELECT * FROM users").fetchall():  # If no users exist, create an example user
+            conn.execute("INSERT INTO users (username, password) VALUES (?, ?)", ("admin", "password123"))
 
 init_user_db()
 create_example_user()
@@ -62,11 +56,8 @@ class LoginApp:
             messagebox.showerror("Error", "Please enter both username and password!")
             return
 
-        conn = sqlite3.connect("users.db")
-        c = conn.cursor()
-        c.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password))
-        user = c.fetchone()
-        conn.close()
+        user = users_db().execute("SELECT * FROM users WHERE username=? AND password=?",
+                                  (username, password)).fetchone()
 
         if user:
             messagebox.showinfo("Success", "Login successful!")
@@ -1,139 +1,54 @@
 import tkinter as tk
-from tkinter import messagebox, filedialog, ttk
-import sqlite3
-import cv2
-import numpy as np
+from tkinter import messagebox
 import time
-import pandas as pd
-import datetime
+
+from backends import load_fastest_detector
+from detection_engine import DetectionEngine
+from detector_registry import get_detector, preload
+from schema import migrate
+from storage import invoice_queue, sales_db, users_db
+
+CLASS_FILE = 'coco.names'
+WEIGHTS_PATH = 'frozen_inference_graph.pb'
+CONFIG_PATH = 'ssd_mobilenet_v3_large_coco_2020_01_14.pbtxt'
 
 # --- Initialize Databases --- #
 
 # Sales Database Setup (Tracking sales)
 def init_sales_db():
-    conn = sqlite3.connect("sales.db")
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS sales (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    customer_name TEXT,
-                    item_name TEXT,
-                    quantity INTEGER,
-                    price REAL,
-                    total REAL,
-                    date TEXT
-                )''')
-    conn.commit()
-    conn.close()
+    migrate(sales_db())
 
 # User Database Setup (Login system)
 def init_db():
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-                    username TEXT PRIMARY KEY,
-                    password TEXT
-                )''')
-    conn.commit()
-    conn.close()
+    with users_db().transaction() as conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS users (
+                            username TEXT PRIMARY KEY,
+                            password TEXT
+                        )''')
 
 init_sales_db()
 init_db()
 
 # Object Detection System (with billing logic)
-def object_detection_and_billing_system():
-    thres = 0.45  # Confidence threshold
-    nms_threshold = 0.2
-    cap = cv2.VideoCapture(0)
-
-    # Load class names from coco.names file
-    classNames = []
-    classFile = 'coco.names'
-    with open(classFile, 'rt') as f:
-        classNames = f.read().rstrip('\n').split('\n')
-
-    # Define objects of interest and prices
-    items_of_interest = {"bottle", "book", "toothbrush"}
-    items_prices = {"bottle": 5, "book": 10, "toothbrush": 3}
-
-    detected_items = {}  # Stores item counts
-    seen_items = set()   # Ensures each item is counted only once
-    last_detected_item = None  # Tracks the last detected item
-
-    weightsPath = 'frozen_inference_graph.pb'
-    configPath = 'ssd_mobilenet_v3_large_coco_2020_01_14.pbtxt'
-
-    # Load pre-trained model
-    net = cv2.dnn_DetectionModel(weightsPath, configPath)
-    net.setInputSize(320, 320)
-    net.setInputScale(1.0 / 127.5)
-    net.setInputMean((127.5, 127.5, 127.5))
-    net.setInputSwapRB(True)
-
-    prev_time = 0
-    while True:
-        success, img = cap.read()
-        if not success:
-            break
-
-        classIds, confs, bbox = net.detect(img, confThreshold=thres)
-        if classIds is not None:
-            if isinstance(classIds, np.ndarray) and len(classIds) > 0:
-                indices = cv2.dnn.NMSBoxes(bbox, confs, thres, nms_threshold)
-
-                if len(indices) > 0:
-                    indices = indices.flatten()
-
-                    for i in indices:
-                        classId = int(classIds[i]) if isinstance(classIds, np.ndarray) else int(classIds)
-                        confidence = float(confs[i]) if isinstance(confs, np.ndarray) else float(confs)
-                        box = bbox[i]
-
-                        class_name = classNames[classId - 1].lower()
-
-                        if class_name in items_of_interest and confidence > thres:
-                            cv2.rectangle(img, box, (0, 255, 0), 2)
-                            cv2.putText(img, f"{class_name.upper()} ({confidence:.2f})",
-                                       (box[0] + 10, box[1] + 30),
-                                       cv2.FONT_HERSHEY_COMPLEX, 0.8, (0, 255, 0), 2)
-
-                            if class_name not in seen_items:
-                                detected_items[class_name] = detected_items.get(class_name, 0) + 1
-                                seen_items.add(class_name)
-                                last_detected_item = class_name
-
-        height, width = img.shape[:2]
-        panel_width = 320
-        white_panel = np.ones((height, panel_width, 3), dtype=np.uint8) * 255
-
-        cv2.putText(white_panel, "Invoice", (100, 40),
-                   cv2.FONT_HERSHEY_TRIPLEX, 0.8, (0, 0, 255), 2)
-
-        y_position = 80
-        total = 0
-        for item, count in detected_items.items():
-            price = items_prices[item]
-            item_total = price * count
-            total += item_total
-            cv2.putText(white_panel, f"{item}: {count} x ${price} = ${item_total}",
-                       (20, y_position), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 1)
-            y_position += 30
-
-        cv2.putText(white_panel, f"Total: ${total}", (20, height - 60),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
-
-        curr_time = time.time()
-        fps = 1 / (curr_time - prev_time) if prev_time > 0 else 0
-        prev_time = curr_time
-        cv2.putText(img, f"FPS: {int(fps)}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-
-        combined = np.hstack((img, white_panel))
-        cv2.imshow("Object Detection & Billing System", combined)
-
-        key = cv2.waitKey(1)
-        if key == ord('q'):
-            break
-        cap.release()
-cv2.destroyAllWindows()
+def save_invoice(detected_items, items_prices, total):
+    # Queue the committed cart for the background writer, like objectdetection.py
+    invoice_queue().save("Customer", detected_items, items_prices)
+
+def object_detection_and_billing_system(login_time=None):
+    # The detector was preloaded at startup; this only waits if it is still loading
+    detector = get_detector(CLASS_FILE, WEIGHTS_PATH, CONFIG_PATH, loader=load_fastest_detector)
+    engine = DetectionEngine(
+        class_file=CLASS_FILE,
+        weights_path=WEIGHTS_PATH,
+        config_path=CONFIG_PATH,
+        items_prices={"bottle": 5, "book": 10, "toothbrush": 3},
+        on_save=save_invoice,
+        net=detector.net,
+        class_names=detector.class_names)
+    engine.run()
+    invoice_queue().flush()  # Saved invoices are in the database before the session ends
+    if engine.profiler.enabled and login_time is not None and engine.first_result_at is not None:
+        print(f"Login to first detection: {engine.first_result_at - login_time:.2f} s")
 
 # ------------------- User Login System ------------------- #
 class LoginApp:
@@ -160,16 +75,13 @@ class LoginApp:
         username = self.entry_username.get()
         password = self.entry_password.get()
 
-        conn = sqlite3.connect("users.db")
-        c = conn.cursor()
-        c.execute("SELECT * FROM users WHERE username = ? AND password = ?", (username, password))
-        result = c.fetchone()
-        conn.close()
+        result = users_db().execute("SELECT * FROM users WHERE username = ? AND password = ?",
+                                    (username, password)).fetchone()
 
         if result:
             messagebox.showinfo("Login Successful", "Welcome!")
             self.master.destroy()
-            object_detection_and_billing_system()
+            object_detection_and_billing_system(time.perf_counter())
         else:
             messagebox.showerror("Error", "Invalid username or password")
 
@@ -206,22 +118,18 @@ class RegisterWindow:
             messagebox.showerror("Error", "Incorrect Employer Password!")
             return
 
-        conn = sqlite3.connect("users.db")
-        c = conn.cursor()
-
-        c.execute("SELECT * FROM users WHERE username = ?", (username,))
-        if c.fetchone():
+        if users_db().execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone():
             messagebox.showerror("Error", "Username already taken!")
         else:
-            c.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
-            conn.commit()
+            with users_db().transaction() as conn:
+                conn.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
             messagebox.showinfo("Success", "Account created successfully!")
             self.window.destroy()
 
-        conn.close()
-
 # ------------------- Running the Application ------------------- #
 if __name__ == "__main__":
+    # Warm the fastest backend up while the user logs in
+    preload(CLASS_FILE, WEIGHTS_PATH, CONFIG_PATH, loader=load_fastest_detector)
     root = tk.Tk()
     app = LoginApp(root)
     root.mainloop()
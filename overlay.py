@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+
+
+# -------------------
+# Frame Annotations
+# -------------------
+def draw_detections(img, detections, class_names):
+    """Draw bounding boxes and labels onto the camera frame."""
+    for class_id, confidence, box in detections.tolist():
+        class_name = class_names[class_id - 1]
+        cv2.rectangle(img, box, (0, 255, 0), 2)
+        cv2.putText(img, f"{class_name.upper()} ({confidence:.2f})",
+                    (box[0] + 10, box[1] + 30),
+                    cv2.FONT_HERSHEY_COMPLEX, 0.8, (0, 255, 0), 2)
+
+
+# -------------------
+# Invoice Overlay
+# -------------------
+class InvoiceOverlay:
+    """Camera frame and invoice panel composed into one reusable output buffer.
+
+    The buffer is allocated once per frame size. Every frame the camera image
+    is copied into its left part in place; the invoice panel on the right is
+    only redrawn after invalidate() is called, i.e. when the cart changed.
+    Once the buffer exists compose() allocates no arrays; what remains per
+    frame is a few hundred bytes of short-lived Python objects (shape
+    tuples), checked by tests/test_overlay.py.
+    """
+
+    def __init__(self, items_prices, panel_width=320):
+        self.items_prices = items_prices
+        self.panel_width = panel_width
+        self.buffer = None
+        self.frame = None
+        self.panel = None
+        self._dirty = True
+
+    def invalidate(self):
+        """Mark the invoice panel as stale; it is redrawn on the next compose()."""
+        self._dirty = True
+
+    def _allocate(self, height, width):
+        self.buffer = np.empty((height, width + self.panel_width, 3), dtype=np.uint8)
+        self.frame = self.buffer[:, :width]
+        self.panel = self.buffer[:, width:]
+        self._dirty = True
+
+    def _render_panel(self, detected_items):
+        """Draw the invoice for the current cart into the panel area."""
+        panel = self.panel
+        height = panel.shape[0]
+        panel.fill(255)
+
+        # Invoice Header
+        cv2.putText(panel, "Invoice", (100, 40),
+                    cv2.FONT_HERSHEY_TRIPLEX, 0.8, (0, 0, 255), 2)
+
+        # Display detected items and prices
+        y_position = 80
+        total = 0
+        for item, count in detected_items.items():
+            price = self.items_prices[item]
+            item_total = price * count
+            total += item_total
+            cv2.putText(panel, f"{item}: {count} x ${price} = ${item_total}",
+                        (20, y_position), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 1)
+            y_position += 30
+
+        # Display total cost
+        cv2.putText(panel, f"Total: ${total}", (20, height - 60),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+        self._dirty = False
+
+    def compose(self, img, detected_items):
+        """Copy img into the output buffer and return the view to draw frame overlays on."""
+        height, width = img.shape[:2]
+        if self.frame is None or self.frame.shape != img.shape:
+            self._allocate(height, width)
+        np.copyto(self.frame, img)
+        if self._dirty:
+            self._render_panel(detected_items)
+        return self.frame
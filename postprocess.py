@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+
+
+# -------------------
+# Detection Records
+# -------------------
+# One row per detection; box is x, y, w, h in frame pixels
+DETECTION_DTYPE = np.dtype([
+    ('class_id', np.int32),
+    ('confidence', np.float32),
+    ('box', np.int32, (4,)),
+])
+
+
+def empty_detections():
+    """Return a detection array with no rows."""
+    return np.empty(0, dtype=DETECTION_DTYPE)
+
+
+def make_detections(class_ids, confidences, boxes):
+    """Pack parallel class ID / confidence / box arrays into a detection array."""
+    detections = np.empty(len(class_ids), dtype=DETECTION_DTYPE)
+    detections['class_id'] = class_ids
+    detections['confidence'] = confidences
+    detections['box'] = np.asarray(boxes).reshape(-1, 4)
+    return detections
+
+
+# -------------------
+# Post-processing
+# -------------------
+def interest_mask(class_names, items_of_interest):
+    """Boolean lookup table indexed by the detector's 1-based class ID.
+
+    Index 0 and any ID past the end of coco.names map to False, so the mask can
+    be indexed with raw detector output without further checks.
+    """
+    mask = np.zeros(len(class_names) + 2, dtype=bool)
+    for class_id, name in enumerate(class_names, start=1):
+        mask[class_id] = name.lower() in items_of_interest
+    return mask
+
+
+def postprocess(class_ids, confs, boxes, mask, thres, nms_threshold):
+    """Turn raw net.detect() output into a detection array of items of interest.
+
+    Uninteresting classes and low-confidence boxes are dropped in one
+    vectorized step, then a single class-aware NMS runs over the survivors.
+    """
+    if class_ids is None or len(class_ids) == 0:
+        return empty_detections()
+
+    class_ids = np.asarray(class_ids, dtype=np.int32).reshape(-1)
+    confs = np.asarray(confs, dtype=np.float32).reshape(-1)
+    boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+
+    lookup = np.clip(class_ids, 0, len(mask) - 1)
+    keep = np.flatnonzero(mask[lookup] & (confs > thres))
+    if keep.size > 1:
+        indices = cv2.dnn.NMSBoxesBatched(boxes[keep], confs[keep], class_ids[keep], thres, nms_threshold)
+        keep = keep[np.asarray(indices, dtype=np.intp).reshape(-1)]
+    return make_detections(class_ids[keep], confs[keep], boxes[keep])
@@ -0,0 +1,60 @@
+import threading
+
+import cv2
+import numpy as np
+
+
+# -------------------
+# Blob Preprocessing
+# -------------------
+class BlobPreprocessor:
+    """Turn frames into NCHW float32 network input blobs without allocating per frame.
+
+    Produces the same blob as cv2.dnn.blobFromImage(img, scale, (size, size),
+    (mean, mean, mean), swapRB): the frame is resized into a preallocated
+    uint8 buffer, then mean subtraction, scaling and the BGR -> RGB channel
+    swap are written straight into one of `buffers` preallocated blobs.
+
+    Blobs are handed out by index so one thread can fill the next blob while
+    another runs inference on the previous one: acquire() a free index,
+    fill it with __call__(img, index) and release() it when the network is
+    done with it. The resize buffer is shared, so only one thread should
+    fill blobs at a time. DetectionEngine(preprocess='capture') fills them
+    on the capture thread, so the next blob is prepared while inference
+    runs on the current one; preprocess='inference' fills them just before
+    detect_blob().
+    """
+
+    def __init__(self, input_size=320, scale=1.0 / 127.5, mean=127.5, swap_rb=True, buffers=3):
+        self.input_size = input_size
+        self.scale = np.float32(scale)
+        self.mean = np.float32(mean)
+        self.swap_rb = swap_rb
+        self._resized = np.empty((input_size, input_size, 3), dtype=np.uint8)
+        self._blobs = np.empty((buffers, 1, 3, input_size, input_size), dtype=np.float32)
+        self._free = list(range(buffers))
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Index of a blob buffer nobody is using."""
+        with self._lock:
+            if not self._free:
+                raise RuntimeError("All preprocessing buffers are in use; release() them after inference")
+            return self._free.pop()
+
+    def release(self, index):
+        with self._lock:
+            self._free.append(index)
+
+    def blob(self, index):
+        return self._blobs[index]
+
+    def __call__(self, img, index=0):
+        """Fill blob `index` from img in place and return it."""
+        size = self.input_size
+        cv2.resize(img, (size, size), dst=self._resized)
+        channels = self._resized[:, :, ::-1] if self.swap_rb else self._resized
+        blob = self._blobs[index]
+        np.subtract(channels.transpose(2, 0, 1), self.mean, out=blob[0], dtype=np.float32)
+        np.multiply(blob, self.scale, out=blob)
+        return blob
@@ -0,0 +1,110 @@
+import collections
+import time
+
+import cv2
+import numpy as np
+
+# Pipeline stages in the order a frame passes through them
+STAGES = ("capture", "gate", "preprocess", "inference", "postprocess", "billing", "drawing", "display")
+
+# Histogram bucket edges in microseconds (the last bucket is open-ended)
+HISTOGRAM_EDGES_US = (0, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, np.inf)
+
+
+# -------------------
+# Stage Profiler
+# -------------------
+class StageProfiler:
+    """Rolling per-stage latency statistics for the detection pipeline.
+
+    Each stage keeps the last `window` span durations (perf_counter_ns) in a
+    deque; percentiles and histograms are only computed when a snapshot is
+    taken, so recording a span is a clock read and a deque append. When
+    disabled, start() returns 0 without reading the clock and stop() returns
+    immediately. The FPS counter is kept either way.
+
+    Other components can register() a function whose result is included in
+    every snapshot under its name, e.g. the adaptive resolution controller.
+    """
+
+    def __init__(self, enabled=False, window=600, log_interval=30.0, log=print):
+        self.enabled = enabled
+        self.log_interval = log_interval
+        self.log = log
+        self._samples = {stage: collections.deque(maxlen=window) for stage in STAGES}
+        self._frame_times = collections.deque(maxlen=window)
+        self._last_log = time.perf_counter_ns()
+        self._overlay_lines = []
+        self._overlay_time = 0
+        self._gauges = {}
+
+    # --- Recording --- #
+    def start(self):
+        """Timestamp marking the beginning of a span."""
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def stop(self, stage, start):
+        """Record the span for stage that began at start."""
+        if self.enabled:
+            self._samples[stage].append(time.perf_counter_ns() - start)
+
+    def frame_done(self):
+        """Mark a frame as finished; emits the periodic summary line when due."""
+        now = time.perf_counter_ns()
+        self._frame_times.append(now)
+        if self.enabled and self.log_interval and now - self._last_log >= self.log_interval * 1e9:
+            self._last_log = now
+            self.log(self.summary())
+
+    def register(self, name, snapshot):
+        """Include snapshot() in every snapshot of this profiler under name."""
+        self._gauges[name] = snapshot
+
+    # --- Reporting --- #
+    def fps(self):
+        """Frames per second averaged over the rolling window."""
+        if len(self._frame_times) < 2:
+            return 0.0
+        first, last = self._frame_times[0], self._frame_times[-1]
+        return (len(self._frame_times) - 1) * 1e9 / max(last - first, 1)
+
+    def snapshot(self):
+        """Per-stage statistics in milliseconds plus a latency histogram."""
+        stages = {}
+        for stage, samples in self._samples.items():
+            if not samples:
+                continue
+            us = np.fromiter(samples, dtype=np.float64) / 1000.0
+            p50, p95, p99 = np.percentile(us, (50, 95, 99)) / 1000.0
+            counts, _ = np.histogram(us, bins=HISTOGRAM_EDGES_US)
+            stages[stage] = {
+                "count": len(us),
+                "mean_ms": float(us.mean()) / 1000.0,
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "max_ms": float(us.max()) / 1000.0,
+                "histogram": dict(zip((f"<{edge}us" for edge in HISTOGRAM_EDGES_US[1:]), counts.tolist())),
+            }
+        snapshot = {"fps": self.fps(), "stages": stages}
+        for name, gauge in self._gauges.items():
+            snapshot[name] = gauge()
+        return snapshot
+
+    def summary(self):
+        """One log line with FPS and the p50/p95 latency of every recorded stage."""
+        snapshot = self.snapshot()
+        parts = [f"{stage} {s['p50_ms']:.1f}/{s['p95_ms']:.1f}ms" for stage, s in snapshot["stages"].items()]
+        return f"[stats] {snapshot['fps']:.1f} FPS | p50/p95 " + " | ".join(parts)
+
+    def draw(self, img, origin=(20, 70), refresh=0.5):
+        """Draw per-stage p50 latencies onto the frame, recomputed every `refresh` seconds."""
+        now = time.perf_counter_ns()
+        if now - self._overlay_time >= refresh * 1e9:
+            self._overlay_time = now
+            self._overlay_lines = [f"{stage}: {s['p50_ms']:.1f} ms"
+                                   for stage, s in self.snapshot()["stages"].items()]
+        x, y = origin
+        for line in self._overlay_lines:
+            cv2.putText(img, line, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+            y += 20
@@ -0,0 +1,126 @@
+import collections
+import time
+
+# Input sizes the controller moves between, smallest first
+LADDER = (192, 256, 320, 416)
+
+
+# -------------------
+# Adaptive Input Resolution
+# -------------------
+class AdaptiveResolution:
+    """Move the detector's input size up and down a ladder to fit a per-lane frame budget.
+
+    Wraps a detector whose input size can be changed (cv2.dnn_DetectionModel
+    via setInputSize, or a backend or TiledDetector through its input_size
+    attribute; see resizable()) and keeps an
+    exponential moving average of its latency. When the average stays over
+    `budget` seconds for `patience` consecutive frames, it steps down a rung;
+    when the next rung up is predicted (latency scaling with input area) to
+    stay under headroom * budget for `patience` frames, it steps up. The gap
+    between the two conditions plus the patience keep it from flapping.
+
+    Has the same detect() contract as cv2.dnn_DetectionModel, so it can be
+    passed to DetectionEngine as net; snapshot() is what the engine's
+    profiler reports under "resolution". The wrapped net is resized in
+    place, and it may be the warm detector shared by every session, so
+    restore() puts it back at the size it had (input_size for nets without
+    an input_size attribute); the engine calls it when run() ends.
+    """
+
+    def __init__(self, net, budget, ladder=LADDER, input_size=320, patience=30, headroom=0.7,
+                 smoothing=0.1, history=100):
+        if not self.resizable(net):
+            raise ValueError(f"{type(net).__name__} has a fixed input size, so it cannot adapt to a frame budget")
+        self.net = net
+        self.original_size = getattr(net, 'input_size', input_size)
+        self.budget = budget
+        self.ladder = tuple(sorted(ladder))
+        self.rung = min(range(len(self.ladder)), key=lambda i: abs(self.ladder[i] - input_size))
+        self.patience = patience
+        self.headroom = headroom
+        self.smoothing = smoothing
+        self.history = collections.deque(maxlen=history)  # (time, from size, to size, latency ms)
+
+        self.latency = None
+        self.switches = 0
+        self._over = 0
+        self._under = 0
+        self._apply(self.input_size)
+
+    @staticmethod
+    def resizable(net):
+        """True when net's input size can be changed while it runs.
+
+        A cascade.CascadeDetector runs two models at two fixed sizes, and an
+        inference_server.InferenceClient shares the server's fixed-size slots.
+        """
+        if hasattr(net, 'setInputSize'):
+            return True
+        return hasattr(net, 'input_size') and not getattr(net, 'fixed_input_size', False)
+
+    @property
+    def input_size(self):
+        return self.ladder[self.rung]
+
+    def _apply(self, size):
+        if hasattr(self.net, 'setInputSize'):
+            self.net.setInputSize(size, size)
+        else:
+            self.net.input_size = size
+
+    def restore(self):
+        """Put the wrapped net back at the input size it had before it was wrapped."""
+        self._apply(self.original_size)
+
+    def _switch(self, rung):
+        old, new = self.input_size, self.ladder[rung]
+        self.history.append((time.time(), old, new, 1000.0 * self.latency))
+        self.switches += 1
+        self.rung = rung
+        self._apply(new)
+        # Start the new rung from the predicted latency so it is not judged on the old one
+        self.latency *= (new / old) ** 2
+        self._over = self._under = 0
+
+    def observe(self, seconds):
+        """Feed one measured inference latency and switch rungs when warranted."""
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += self.smoothing * (seconds - self.latency)
+
+        self._over = self._over + 1 if self.latency > self.budget else 0
+        if self.rung + 1 < len(self.ladder):
+            predicted = self.latency * (self.ladder[self.rung + 1] / self.input_size) ** 2
+            self._under = self._under + 1 if predicted < self.headroom * self.budget else 0
+
+        if self._over >= self.patience and self.rung > 0:
+            self._switch(self.rung - 1)
+        elif self._under >= self.patience and self.rung + 1 < len(self.ladder):
+            self._switch(self.rung + 1)
+
+    def detect(self, img, confThreshold=0.5):
+        start = time.perf_counter()
+        result = self.net.detect(img, confThreshold=confThreshold)
+        self.observe(time.perf_counter() - start)
+        return result
+
+    def snapshot(self):
+        """Current rung, smoothed latency against the budget and the switch history."""
+        return {
+            "input_size": self.input_size,
+            "rung": self.rung,
+            "ladder": list(self.ladder),
+            "budget_ms": 1000.0 * self.budget,
+            "latency_ms": 1000.0 * self.latency if self.latency is not None else None,
+            "switches": self.switches,
+            "history": [{"time": t, "from": old, "to": new, "latency_ms": ms}
+                        for t, old, new, ms in self.history],
+        }
+
+    def summary(self):
+        """One-line report of the current rung and how often it changed."""
+        latency = f"{1000.0 * self.latency:.1f}" if self.latency is not None else "-"
+        return (f"Input size {self.input_size} (rung {self.rung + 1}/{len(self.ladder)}), "
+                f"latency {latency} ms of {1000.0 * self.budget:.1f} ms budget, {self.switches} switches")
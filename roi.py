@@ -0,0 +1,143 @@
+"""Per-lane region of interest: the part of the camera frame that shows the tray.
+
+Pick a rectangle for a lane from a live camera frame and save it:
+
+    python roi.py --lane 1 --source 0
+
+Polygons can be written into roi.json by hand as a list of [x, y] points.
+"""
+import argparse
+import json
+import os
+import threading
+
+import cv2
+import numpy as np
+
+ROI_FILE = "roi.json"
+
+
+# -------------------
+# Region of Interest
+# -------------------
+class RegionOfInterest:
+    """A polygon (or rectangle) in frame coordinates that the detector is limited to.
+
+    crop() cuts the polygon's bounding rectangle out of the frame and, for
+    non-rectangular polygons, blanks the pixels outside the polygon so the
+    detector only sees the tray. to_frame() shifts boxes found in the crop
+    back to full-frame coordinates. Each thread crops into its own buffer,
+    so the capture and inference stages can both crop the same ROI. The
+    engine feeds the crop to both the motion gate and the detector, and a
+    tight ROI usually allows a smaller input_size.
+    """
+
+    def __init__(self, points):
+        self.points = np.asarray(points, dtype=np.int32).reshape(-1, 2)
+        self.x, self.y, self.w, self.h = cv2.boundingRect(self.points)
+        self.is_rectangle = len(self.points) == 4 and len(np.unique(self.points[:, 0])) == 2 \
+            and len(np.unique(self.points[:, 1])) == 2
+        self._mask = None
+        self._local = threading.local()
+
+    @classmethod
+    def from_rect(cls, x, y, w, h):
+        return cls([(x, y), (x + w - 1, y), (x + w - 1, y + h - 1), (x, y + h - 1)])
+
+    def _clip(self, img):
+        """Bounding rectangle limited to the frame."""
+        height, width = img.shape[:2]
+        x1, y1 = max(self.x, 0), max(self.y, 0)
+        x2, y2 = min(self.x + self.w, width), min(self.y + self.h, height)
+        return x1, y1, x2, y2
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_local'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def crop(self, img):
+        """The ROI part of img as a view (rectangles) or this thread's reused masked buffer (polygons)."""
+        x1, y1, x2, y2 = self._clip(img)
+        crop = img[y1:y2, x1:x2]
+        if self.is_rectangle:
+            return crop
+
+        mask = self._mask
+        if mask is None or mask.shape != crop.shape[:2]:
+            # Filled before it is published, so another thread never sees a half-drawn mask
+            mask = np.zeros(crop.shape[:2], dtype=np.uint8)
+            cv2.fillPoly(mask, [self.points - (x1, y1)], 255)
+            self._mask = mask
+        masked = getattr(self._local, 'masked', None)
+        if masked is None or masked.shape != crop.shape:
+            masked = self._local.masked = np.empty_like(crop)
+        masked.fill(0)
+        cv2.copyTo(crop, mask, masked)
+        return masked
+
+    def to_frame(self, detections):
+        """Shift detection boxes from crop coordinates to frame coordinates (in place)."""
+        detections['box'][:, 0] += max(self.x, 0)
+        detections['box'][:, 1] += max(self.y, 0)
+        return detections
+
+    def draw(self, img):
+        """Outline the ROI on the frame."""
+        cv2.polylines(img, [self.points], True, (255, 128, 0), 1)
+
+    def to_json(self):
+        return {"points": self.points.tolist()}
+
+
+# -------------------
+# Per-lane Storage
+# -------------------
+def load_roi(lane, path=ROI_FILE):
+    """The saved ROI for a lane, or None when the lane has none."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        lanes = json.load(f)
+    entry = lanes.get(str(lane))
+    return RegionOfInterest(entry["points"]) if entry else None
+
+
+def save_roi(lane, roi, path=ROI_FILE):
+    """Store the ROI for a lane, keeping the other lanes' entries."""
+    lanes = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            lanes = json.load(f)
+    lanes[str(lane)] = roi.to_json()
+    with open(path, "w") as f:
+        json.dump(lanes, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lane", required=True)
+    parser.add_argument("--source", default="0", help="camera index or video file")
+    parser.add_argument("--file", default=ROI_FILE)
+    args = parser.parse_args()
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    cap = cv2.VideoCapture(source)
+    success, img = cap.read()
+    cap.release()
+    if not success:
+        raise SystemExit(f"Cannot read a frame from {args.source}")
+
+    x, y, w, h = cv2.selectROI(f"Select the tray for lane {args.lane}", img)
+    cv2.destroyAllWindows()
+    if w and h:
+        save_roi(args.lane, RegionOfInterest.from_rect(x, y, w, h), args.file)
+        print(f"Saved ROI {x},{y},{w},{h} for lane {args.lane} to {args.file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""Versioned schema of the sales database and the migrations between versions.
+
+The version lives in PRAGMA user_version; migrate() applies every step
+the database has not seen yet, each in its own transaction, so it is safe
+to call on every start (the checkout scripts do, from init_sales_db()).
+Upgrade a database by hand and show what is in it with:
+
+    python schema.py --db sales.db --csv account/sales.csv
+
+and check the rollup tables against the invoice rows, then recompute
+them from scratch, with:
+
+    python schema.py --db sales.db --rebuild-rollups
+"""
+import argparse
+import csv
+import os
+
+from storage import SALES_DB, Database
+
+# Seconds between consecutive lines of one customer that still belong to the same old checkout
+INVOICE_GAP = 2
+
+
+# -------------------
+# Version 1: one denormalized row per line item
+# -------------------
+SALES_V1 = '''CREATE TABLE IF NOT EXISTS sales (
+                  id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  customer_name TEXT,
+                  item_name TEXT,
+                  quantity INTEGER,
+                  price REAL,
+                  total REAL,
+                  date TEXT
+              )'''
+
+
+def create_sales_table(conn, legacy_csv):
+    conn.execute(SALES_V1)
+
+
+# -------------------
+# Version 2: invoices, invoice lines and products
+# -------------------
+# Money in integer cents, times in integer seconds since the epoch. Lines
+# carry their invoice's date so per-item date ranges need no join, and
+# the indexes include the summed columns so range queries never touch
+# the tables themselves.
+INVOICES_V2 = (
+    '''CREATE TABLE products (
+           id INTEGER PRIMARY KEY,
+           name TEXT NOT NULL UNIQUE,
+           price_cents INTEGER NOT NULL DEFAULT 0
+       )''',
+    '''CREATE TABLE invoices (
+           id INTEGER PRIMARY KEY,
+           customer TEXT,
+           date INTEGER NOT NULL,
+           total_cents INTEGER NOT NULL
+       )''',
+    '''CREATE TABLE invoice_lines (
+           id INTEGER PRIMARY KEY,
+           invoice_id INTEGER NOT NULL REFERENCES invoices (id),
+           product_id INTEGER NOT NULL REFERENCES products (id),
+           quantity INTEGER NOT NULL,
+           price_cents INTEGER NOT NULL,
+           total_cents INTEGER NOT NULL,
+           date INTEGER NOT NULL
+       )''',
+    "CREATE INDEX idx_invoices_date ON invoices (date, total_cents)",
+    "CREATE INDEX idx_invoices_customer_date ON invoices (customer, date, total_cents)",
+    "CREATE INDEX idx_lines_product_date ON invoice_lines (product_id, date, quantity, total_cents)",
+    "CREATE INDEX idx_lines_invoice ON invoice_lines (invoice_id)",
+)
+
+# The old table's shape, for the dashboards and exports that read it
+SALES_VIEW = '''CREATE VIEW sales AS
+                SELECT l.id AS id, i.customer AS customer_name, p.name AS item_name, l.quantity AS quantity,
+                       l.price_cents / 100.0 AS price, l.total_cents / 100.0 AS total,
+                       datetime(l.date, 'unixepoch', 'localtime') AS date
+                FROM invoice_lines l
+                JOIN invoices i ON i.id = l.invoice_id
+                JOIN products p ON p.id = l.product_id'''
+
+
+def read_legacy_csv(path):
+    """Rows of an exported sales table as (customer, item, quantity, price, total, date); "None" customers are NULL."""
+    with open(path, newline="") as f:
+        return [(None if row["Customer"] in ("", "None") else row["Customer"], row["Item"], int(row["Qty"]),
+                 float(row["Price"]), float(row["Total"]), row["Date"])
+                for row in csv.DictReader(f)]
+
+
+def create_invoice_tables(conn, legacy_csv):
+    """Move the sales rows (and exported rows not already among them) into the invoice tables.
+
+    The old checkout wrote one row per cart line, each stamped with its own
+    time, so a cart's lines have consecutive IDs, the same customer and
+    times at most a second or two apart. A line starts a new invoice unless
+    it follows a line of the same customer within INVOICE_GAP seconds; two
+    carts of one customer saved that close together become one invoice.
+    Invoices are numbered in order of their first line, take that line's
+    time, and lines keep their sales IDs. It all happens in SQL, so tables
+    far bigger than memory migrate too. Old timestamps are local time.
+    """
+    if legacy_csv and os.path.exists(legacy_csv):
+        conn.executemany('''INSERT INTO sales (customer_name, item_name, quantity, price, total, date)
+                            SELECT ?1, ?2, ?3, ?4, ?5, ?6
+                            WHERE NOT EXISTS (SELECT 1 FROM sales WHERE customer_name IS ?1 AND item_name = ?2
+                                              AND quantity = ?3 AND price = ?4 AND date = ?6)''',
+                         read_legacy_csv(legacy_csv))
+
+    for statement in INVOICES_V2:
+        conn.execute(statement)
+    # The latest price of each item becomes its catalogue price
+    conn.execute('''INSERT INTO products (name, price_cents)
+                    SELECT item_name, cents FROM (SELECT item_name, CAST(round(price * 100) AS INTEGER) AS cents,
+                                                         max(date) FROM sales GROUP BY item_name)''')
+    # Invoice number of every sales row: a running count of the rows that start an invoice.
+    # A table on disk rather than a temp one, as it has a row per line item.
+    conn.execute(f'''CREATE TABLE legacy_lines AS
+                     SELECT id, sum(starts) OVER (ORDER BY id) AS invoice_id, date
+                     FROM (SELECT id, date, CASE WHEN customer_name IS lag(customer_name) OVER w
+                                                  AND date - lag(date) OVER w BETWEEN 0 AND {INVOICE_GAP}
+                                                 THEN 0 ELSE 1 END AS starts
+                           FROM (SELECT id, customer_name, CAST(strftime('%s', date, 'utc') AS INTEGER) AS date
+                                 FROM sales)
+                           WINDOW w AS (ORDER BY id))''')
+    conn.execute('''INSERT INTO invoices (id, customer, date, total_cents)
+                    SELECT l.invoice_id, s.customer_name, min(l.date),
+                           sum(s.quantity * CAST(round(s.price * 100) AS INTEGER))
+                    FROM legacy_lines l JOIN sales s ON s.id = l.id
+                    GROUP BY l.invoice_id ORDER BY l.invoice_id''')
+    conn.execute('''INSERT INTO invoice_lines (id, invoice_id, product_id, quantity, price_cents, total_cents, date)
+                    SELECT s.id, i.id, p.id, s.quantity, CAST(round(s.price * 100) AS INTEGER),
+                           s.quantity * CAST(round(s.price * 100) AS INTEGER), i.date
+                    FROM sales s
+                    JOIN legacy_lines l ON l.id = s.id
+                    JOIN invoices i ON i.id = l.invoice_id
+                    JOIN products p ON p.name = s.item_name
+                    ORDER BY s.id''')
+    conn.execute("DROP TABLE legacy_lines")
+    conn.execute("DROP TABLE sales")
+    conn.execute(SALES_VIEW)
+
+
+# -------------------
+# Version 3: lanes and rollup tables
+# -------------------
+# Sales per local day and product, and invoices per hour and lane ('' for
+# invoices not saved by a lane), kept up to date by triggers in the same
+# transaction as the rows they summarize, so a day's report reads a few
+# dozen rollup rows however much history the database holds. Days and
+# hours are on the machine's local clock, so every hour falls inside one
+# local day even with a half-hour UTC offset; run
+# `python schema.py --rebuild-rollups` after changing the time zone.
+ROLLUPS_V3 = (
+    "ALTER TABLE invoices ADD COLUMN lane TEXT",
+    '''CREATE TABLE daily_item_sales (
+           day TEXT NOT NULL,
+           product_id INTEGER NOT NULL,
+           quantity INTEGER NOT NULL,
+           total_cents INTEGER NOT NULL,
+           lines INTEGER NOT NULL,
+           PRIMARY KEY (day, product_id)
+       ) WITHOUT ROWID''',
+    '''CREATE TABLE hourly_lane_sales (
+           hour INTEGER NOT NULL,
+           lane TEXT NOT NULL,
+           invoices INTEGER NOT NULL,
+           total_cents INTEGER NOT NULL,
+           PRIMARY KEY (hour, lane)
+       ) WITHOUT ROWID''',
+    "CREATE TRIGGER rollup_line_insert AFTER INSERT ON invoice_lines BEGIN {add_line} END",
+    "CREATE TRIGGER rollup_line_delete AFTER DELETE ON invoice_lines BEGIN {remove_line} END",
+    '''CREATE TRIGGER rollup_line_update AFTER UPDATE OF product_id, quantity, total_cents, date ON invoice_lines
+       BEGIN {remove_line} {add_line} END''',
+    "CREATE TRIGGER rollup_invoice_insert AFTER INSERT ON invoices BEGIN {add_invoice} END",
+    "CREATE TRIGGER rollup_invoice_delete AFTER DELETE ON invoices BEGIN {remove_invoice} END",
+    '''CREATE TRIGGER rollup_invoice_update AFTER UPDATE OF date, total_cents, lane ON invoices
+       BEGIN {remove_invoice} {add_invoice} END''',
+)
+
+
+def local_hour(date):
+    """SQL for the epoch seconds at the start of the local hour that epoch-seconds column `date` falls in."""
+    return f"{date} - CAST(strftime('%s', {date}, 'unixepoch', 'localtime') AS INTEGER) % 3600"
+
+
+# Trigger bodies that add a new row to, or take an old row out of, the rollups
+ROLLUP_TRIGGER_STEPS = dict(
+    add_line='''INSERT INTO daily_item_sales (day, product_id, quantity, total_cents, lines)
+                VALUES (date(new.date, 'unixepoch', 'localtime'), new.product_id, new.quantity, new.total_cents, 1)
+                ON CONFLICT (day, product_id) DO UPDATE SET quantity = quantity + excluded.quantity,
+                                                            total_cents = total_cents + excluded.total_cents,
+                                                            lines = lines + 1;''',
+    remove_line='''UPDATE daily_item_sales SET quantity = quantity - old.quantity,
+                                               total_cents = total_cents - old.total_cents, lines = lines - 1
+                   WHERE day = date(old.date, 'unixepoch', 'localtime') AND product_id = old.product_id;
+                   DELETE FROM daily_item_sales
+                   WHERE day = date(old.date, 'unixepoch', 'localtime') AND product_id = old.product_id
+                     AND lines = 0;''',
+    add_invoice=f'''INSERT INTO hourly_lane_sales (hour, lane, invoices, total_cents)
+                    VALUES ({local_hour('new.date')}, coalesce(new.lane, ''), 1, new.total_cents)
+                    ON CONFLICT (hour, lane) DO UPDATE SET invoices = invoices + 1,
+                                                           total_cents = total_cents + excluded.total_cents;''',
+    remove_invoice=f'''UPDATE hourly_lane_sales SET invoices = invoices - 1, total_cents = total_cents - old.total_cents
+                       WHERE hour = {local_hour('old.date')} AND lane = coalesce(old.lane, '');
+                       DELETE FROM hourly_lane_sales
+                       WHERE hour = {local_hour('old.date')} AND lane = coalesce(old.lane, '') AND invoices = 0;''',
+)
+
+# Each rollup table's key and its rows recomputed from the raw rows, in the table's column order
+ROLLUPS = {
+    "daily_item_sales": ("day, product_id",
+                         '''SELECT date(date, 'unixepoch', 'localtime') AS day, product_id, sum(quantity) AS quantity,
+                                   sum(total_cents) AS total_cents, count(*) AS lines
+                            FROM invoice_lines GROUP BY 1, 2'''),
+    "hourly_lane_sales": ("hour, lane",
+                          f'''SELECT {local_hour('date')} AS hour, coalesce(lane, '') AS lane, count(*) AS invoices,
+                                     sum(total_cents) AS total_cents
+                              FROM invoices GROUP BY 1, 2'''),
+}
+
+
+def rebuild_rollups(conn):
+    """Recompute every rollup table from the invoice tables (inside the caller's transaction)."""
+    for table, (_, query) in ROLLUPS.items():
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"INSERT INTO {table} {query}")
+
+
+def check_rollups(conn):
+    """{rollup table: rows that are missing, extra or wrong compared with the raw rows}."""
+    wrong = {}
+    for table, (key, query) in ROLLUPS.items():
+        # Keys of the rows that differ on either side, so a wrong row counts once
+        sql = f'''SELECT count(*) FROM (SELECT {key} FROM (SELECT * FROM {table} EXCEPT {query})
+                                       UNION SELECT {key} FROM ({query} EXCEPT SELECT * FROM {table}))'''
+        wrong[table] = conn.execute(sql).fetchone()[0]
+    return wrong
+
+
+def create_rollup_tables(conn, legacy_csv):
+    for statement in ROLLUPS_V3:
+        conn.execute(statement.format(**ROLLUP_TRIGGER_STEPS))
+    rebuild_rollups(conn)
+
+
+# -------------------
+# Migrations
+# -------------------
+# Step n upgrades a database from version n - 1 to n
+MIGRATIONS = (
+    create_sales_table,
+    create_invoice_tables,
+    create_rollup_tables,
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(db):
+    return db.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db, legacy_csv=None):
+    """Bring db (a storage.Database) up to SCHEMA_VERSION; returns the versions applied.
+
+    Each step runs in its own BEGIN IMMEDIATE transaction that also bumps
+    user_version, so a failed step leaves the database at the previous
+    version and two processes starting together apply each step once.
+    legacy_csv is an optional exported sales table whose rows are carried
+    into the invoice tables along with the old sales rows; only the
+    schema.py command line passes one, so starting a checkout never
+    imports whatever CSV happens to sit in the working directory.
+    """
+    applied = []
+    for version, step in enumerate(MIGRATIONS, start=1):
+        with db.transaction(immediate=True) as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                continue
+            step(conn, legacy_csv)
+            conn.execute(f"PRAGMA user_version = {version}")
+        applied.append(version)
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=SALES_DB)
+    parser.add_argument("--csv", help="exported sales table to carry over when upgrading (e.g. account/sales.csv)")
+    parser.add_argument("--rebuild-rollups", action="store_true",
+                        help="check the rollup tables against the invoice rows and recompute them")
+    args = parser.parse_args()
+
+    db = Database(args.db)
+    before = schema_version(db)
+    applied = migrate(db, args.csv)
+    print(f"{args.db}: schema version {before} -> {schema_version(db)}"
+          + (f" (applied {', '.join(map(str, applied))})" if applied else " (up to date)"))
+    for table in ("products", "invoices", "invoice_lines") + tuple(ROLLUPS):
+        print(f"  {table}: {db.execute(f'SELECT count(*) FROM {table}').fetchone()[0]} rows")
+
+    if args.rebuild_rollups:
+        with db.transaction(immediate=True) as conn:
+            for table, wrong in check_rollups(conn).items():
+                print(f"  {table}: {wrong} rows differed from the invoice rows" if wrong else f"  {table}: correct")
+            rebuild_rollups(conn)
+            wrong = sum(check_rollups(conn).values())
+            if wrong:
+                raise RuntimeError(f"{wrong} rollup rows still differ after the rebuild")
+        print("Rollup tables rebuilt")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
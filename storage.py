@@ -0,0 +1,494 @@
+import atexit
+import collections
+import contextlib
+import datetime
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+SALES_DB = "sales.db"
+USERS_DB = "users.db"
+
+# An invoice as written to the database: lines are (item, quantity, price in cents), date is epoch
+# seconds and lane the checkout lane that saved it (None outside lanes.py)
+Invoice = collections.namedtuple('Invoice', ['customer', 'date', 'lines', 'lane'], defaults=(None,))
+
+
+# -------------------
+# Connections
+# -------------------
+class Database:
+    """Long-lived, tuned connections to one SQLite file, one per thread.
+
+    sqlite3 connections must stay on the thread that opened them, so each
+    thread that touches the database gets its own connection on first use
+    and keeps it until close(). Every connection is opened with:
+
+    - journal_mode=WAL: readers (the dashboard) no longer block the writer
+      (a checkout commit) and a commit appends to the log instead of
+      rewriting pages
+    - synchronous=NORMAL (by default): fsync at checkpoints rather than
+      every commit; a power cut can lose the last commits but never
+      corrupts the file
+    - a page cache of cache_kb KiB and temp tables in memory
+    - a cache of statement_cache prepared statements, so the same INSERT
+      or SELECT is only compiled once per connection
+
+    Use transaction() for writes; it commits on success and rolls back on
+    an exception.
+    """
+
+    def __init__(self, path, cache_kb=8192, statement_cache=256, timeout=5.0, synchronous="NORMAL"):
+        self.path = path
+        self.synchronous = synchronous
+        self.cache_kb = cache_kb
+        self.statement_cache = statement_cache
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _open(self):
+        # Each connection is only used by the thread that opened it (self._local);
+        # check_same_thread=False just lets close() run from another thread
+        conn = sqlite3.connect(self.path, timeout=self.timeout, cached_statements=self.statement_cache,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size=-{self.cache_kb}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def connection(self):
+        """This thread's connection, opened on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def execute(self, sql, params=()):
+        """Run one statement on this thread's connection and return the cursor."""
+        return self.connection().execute(sql, params)
+
+    @contextlib.contextmanager
+    def transaction(self, immediate=False):
+        """This thread's connection inside a transaction that commits on exit.
+
+        immediate=True takes the write lock at BEGIN, so a writer waits for
+        other writers up front instead of failing to upgrade a read lock.
+        """
+        conn = self.connection()
+        with conn:
+            if immediate:
+                conn.execute("BEGIN IMMEDIATE")
+            yield conn
+
+    def close(self):
+        """Close every thread's connection (the owning threads must be done with them)."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+# -------------------
+# Invoice Writes
+# -------------------
+def to_cents(amount):
+    return int(round(amount * 100))
+
+
+def make_invoice(customer_name, detected_items, items_prices, date=None, lane=None):
+    """An Invoice for a cart, all lines stamped with the same time (now by default)."""
+    return Invoice(customer_name, int(time.time() if date is None else date),
+                   [(item, quantity, to_cents(items_prices.get(item, 0))) for item, quantity in detected_items.items()],
+                   lane)
+
+
+def insert_invoices(conn, invoices, product_ids):
+    """Insert invoices and all their lines (one executemany) on conn, inside the caller's transaction.
+
+    product_ids caches name -> (id, price cents) between calls; products
+    are added, or their catalogue price updated, when a line's price
+    differs from the cached one. The rollup tables are updated by
+    triggers (see schema.py), so they commit or roll back with the rows.
+    """
+    lines = []
+    for invoice in invoices:
+        total = sum(quantity * price_cents for _, quantity, price_cents in invoice.lines)
+        invoice_id = conn.execute("INSERT INTO invoices (customer, date, total_cents, lane) VALUES (?, ?, ?, ?)",
+                                  (invoice.customer, invoice.date, total, invoice.lane)).lastrowid
+        for item, quantity, price_cents in invoice.lines:
+            cached = product_ids.get(item)
+            if cached is None or cached[1] != price_cents:
+                conn.execute('''INSERT INTO products (name, price_cents) VALUES (?, ?)
+                                ON CONFLICT (name) DO UPDATE SET price_cents = excluded.price_cents''',
+                             (item, price_cents))
+                product_id = conn.execute("SELECT id FROM products WHERE name = ?", (item,)).fetchone()[0]
+                cached = product_ids[item] = (product_id, price_cents)
+            lines.append((invoice_id, cached[0], quantity, price_cents, quantity * price_cents, invoice.date))
+    conn.executemany('''INSERT INTO invoice_lines (invoice_id, product_id, quantity, price_cents, total_cents, date)
+                        VALUES (?, ?, ?, ?, ?, ?)''', lines)
+
+
+class _PendingInvoice:
+    __slots__ = ("invoice", "done", "error")
+
+    def __init__(self, invoice):
+        self.invoice = invoice
+        self.done = False
+        self.error = None
+
+
+class InvoiceWriter:
+    """Write committed invoices to the invoice tables, one transaction per commit.
+
+    An invoice is one invoices row plus its lines in a single
+    executemany(), inside a BEGIN IMMEDIATE transaction. With a
+    group_window (seconds), invoices saved by concurrent threads (several
+    lanes or sessions in one process) share commits: one caller at a time
+    commits every invoice pending at that point, including those that
+    queued up while the previous commit was being written, so N
+    concurrent invoices cost one WAL append (and, with synchronous=FULL,
+    one fsync) instead of N. If the previous commit was shared, it first
+    waits up to group_window for as many invoices as that commit had; a
+    lone writer never waits. save() returns once the invoice is committed
+    and re-raises a failed write in every caller it affects.
+    """
+
+    def __init__(self, db, group_window=0.0, max_group=64):
+        self.db = db
+        self.group_window = group_window
+        self.max_group = max_group
+        self.invoices = 0
+        self.transactions = 0
+        self._pending = []
+        self._last_group = 1
+        self._committing = False
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._product_ids = {}
+
+    def write(self, invoices):
+        """Insert a list of Invoices in one transaction."""
+        with self._write_lock:
+            try:
+                with self.db.transaction(immediate=True) as conn:
+                    insert_invoices(conn, invoices, self._product_ids)
+            except Exception:
+                self._product_ids.clear()  # Products added by the rolled-back transaction are gone
+                raise
+            self.invoices += len(invoices)
+            self.transactions += 1
+
+    def save(self, customer_name, detected_items, items_prices, lane=None):
+        invoice = make_invoice(customer_name, detected_items, items_prices, lane=lane)
+        if not invoice.lines:
+            return
+        if not self.group_window:
+            self.write([invoice])
+            return
+
+        pending = _PendingInvoice(invoice)
+        with self._cond:
+            self._pending.append(pending)
+            self._cond.notify_all()
+        # Wait for a commit that includes this invoice, or commit the next group ourselves
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: pending.done or not self._committing)
+                if pending.done:
+                    break
+                self._committing = True
+                expected = min(self._last_group, self.max_group)
+                self._cond.wait_for(lambda: len(self._pending) >= expected, self.group_window)
+                group, self._pending = self._pending[:self.max_group], self._pending[self.max_group:]
+                self._last_group = len(group)
+            self._commit_group(group)
+        if pending.error:
+            raise pending.error
+
+    def _commit_group(self, group):
+        try:
+            self.write([pending.invoice for pending in group])
+        except Exception as e:
+            for pending in group:
+                pending.error = e
+        finally:
+            with self._cond:
+                for pending in group:
+                    pending.done = True
+                self._committing = False
+                self._cond.notify_all()
+
+
+# -------------------
+# Write-behind Queue
+# -------------------
+def is_locked_error(error):
+    """True for the SQLite errors that go away by retrying ("database is locked", "busy")."""
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in str(error) or "busy" in str(error))
+
+
+class WriteBehindQueue:
+    """Persist invoices on a background thread so the detection loop never waits for SQLite.
+
+    save() stamps the invoice and puts it on a bounded queue (blocking only
+    when maxsize invoices are already waiting); a writer thread takes
+    everything queued, up to max_batch invoices, and commits it through
+    writer.write() in one transaction. A commit that fails with "database
+    is locked" is retried `retries` times with a doubling delay; invoices
+    that still cannot be written are kept in self.failed and reported.
+
+    flush() waits until everything queued so far is written; close()
+    flushes and stops the thread, and runs at exit for the shared queue
+    (see invoice_queue()). snapshot() reports the queue depth and the
+    write and end-to-end (save() to commit) latencies.
+    """
+
+    def __init__(self, writer, maxsize=256, max_batch=64, retries=5, retry_delay=0.05, window=600):
+        self.writer = writer
+        self.max_batch = max_batch
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.written = 0
+        self.batches = 0
+        self.retried = 0
+        self.max_depth = 0
+        self.failed = []
+        self._queue = queue.Queue(maxsize)
+        self._write_ms = collections.deque(maxlen=window)
+        self._commit_ms = collections.deque(maxlen=window)
+        self._thread = None
+        self._closed = False
+        self._close_lock = threading.Lock()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="invoice-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def save(self, customer_name, detected_items, items_prices, lane=None):
+        """Queue an invoice (same arguments as InvoiceWriter.save()); writes inline once closed."""
+        invoice = make_invoice(customer_name, detected_items, items_prices, lane=lane)
+        if not invoice.lines:
+            return
+        # Under the lock close() takes, so nothing is queued behind its stop sentinel
+        with self._close_lock:
+            if not self._closed:
+                self._queue.put((invoice, time.perf_counter()))
+                self.max_depth = max(self.max_depth, self._queue.qsize())
+                return
+        self.writer.write([invoice])
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            # Take everything queued (up to max_batch) so it shares one commit; None means stop
+            batch = []
+            item = self._queue.get()
+            while item is not None:
+                batch.append(item)
+                if len(batch) == self.max_batch:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if item is None:
+                stopping = True
+                self._queue.task_done()
+            if batch:
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        invoices = [invoice for invoice, _ in batch]
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            try:
+                self.writer.write(invoices)
+                break
+            except Exception as e:
+                if not is_locked_error(e) or attempt == self.retries:
+                    print(f"Could not save {len(invoices)} invoices: {e}")
+                    self.failed.extend(invoices)
+                    return
+                self.retried += 1
+                time.sleep(delay)
+                delay *= 2
+        done = time.perf_counter()
+        self._write_ms.append(1000.0 * (done - start))
+        self._commit_ms.extend(1000.0 * (done - queued) for _, queued in batch)
+        self.written += len(invoices)
+        self.batches += 1
+
+    def flush(self):
+        """Wait until every invoice queued so far has been written (or given up on)."""
+        self._queue.join()
+
+    def close(self):
+        """Write everything still queued and stop the writer thread; later saves are written inline."""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._thread:
+                self._queue.put(None)
+        if self._thread:
+            self._thread.join()
+
+    def snapshot(self):
+        """Queue depth, write counts and write / end-to-end commit latency in milliseconds."""
+        write_ms = np.fromiter(self._write_ms, dtype=np.float64)
+        commit_ms = np.fromiter(self._commit_ms, dtype=np.float64)
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "written": self.written,
+            "batches": self.batches,
+            "retries": self.retried,
+            "failed": len(self.failed),
+            "write_p50_ms": float(np.percentile(write_ms, 50)) if len(write_ms) else None,
+            "write_p95_ms": float(np.percentile(write_ms, 95)) if len(write_ms) else None,
+            "commit_p95_ms": float(np.percentile(commit_ms, 95)) if len(commit_ms) else None,
+        }
+
+    def summary(self):
+        """One-line report of what the writer thread did."""
+        s = self.snapshot()
+        latency = f", write p50/p95 {s['write_p50_ms']:.1f}/{s['write_p95_ms']:.1f} ms" if s["batches"] else ""
+        return (f"Invoice writer: {s['written']} invoices in {s['batches']} commits{latency}, "
+                f"max queue depth {s['max_depth']}, {s['retries']} retries, {s['failed']} failed")
+
+
+# -------------------
+# Sales Queries
+# -------------------
+# Each of these is a range scan of one covering index (see schema.py)
+def revenue_between(db, start, end):
+    """(invoices, revenue in cents) for start <= date < end (epoch seconds)."""
+    count, total = db.execute("SELECT count(*), sum(total_cents) FROM invoices WHERE date >= ? AND date < ?",
+                              (start, end)).fetchone()
+    return count, total or 0
+
+
+def item_sales(db, item, start, end):
+    """(quantity, revenue in cents) of one item sold in start <= date < end."""
+    quantity, total = db.execute('''SELECT sum(quantity), sum(total_cents) FROM invoice_lines
+                                    WHERE product_id = (SELECT id FROM products WHERE name = ?)
+                                      AND date >= ? AND date < ?''', (item, start, end)).fetchone()
+    return quantity or 0, total or 0
+
+
+def customer_invoices(db, customer, start, end):
+    """[(date, total cents)] of one customer's invoices in start <= date < end."""
+    return db.execute('''SELECT date, total_cents FROM invoices
+                         WHERE customer = ? AND date >= ? AND date < ? ORDER BY date''',
+                      (customer, start, end)).fetchall()
+
+
+# -------------------
+# End-of-day Reports
+# -------------------
+# These read the rollup tables (see schema.py), so they cost the same on
+# the first day and after years of history
+def day_bounds(day):
+    """Epoch seconds of local midnight at the start and end of a datetime.date."""
+    start = datetime.datetime.combine(day, datetime.time())
+    return int(start.timestamp()), int((start + datetime.timedelta(days=1)).timestamp())
+
+
+def day_items(db, day):
+    """[(item, quantity, revenue in cents)] sold on a local day, best sellers first."""
+    return db.execute('''SELECT p.name, r.quantity, r.total_cents FROM daily_item_sales r
+                         JOIN products p ON p.id = r.product_id
+                         WHERE r.day = ? ORDER BY r.total_cents DESC''', (day.isoformat(),)).fetchall()
+
+
+def day_lanes(db, day):
+    """[(hour start in epoch seconds, lane, invoices, revenue in cents)] of a local day."""
+    return db.execute('''SELECT hour, lane, invoices, total_cents FROM hourly_lane_sales
+                         WHERE hour >= ? AND hour < ? ORDER BY hour, lane''', day_bounds(day)).fetchall()
+
+
+def day_summary(db, day):
+    """(invoices, revenue in cents) of a local day."""
+    count, total = db.execute('''SELECT sum(invoices), sum(total_cents) FROM hourly_lane_sales
+                                 WHERE hour >= ? AND hour < ?''', day_bounds(day)).fetchone()
+    return count or 0, total or 0
+
+
+# -------------------
+# Process-wide Registry
+# -------------------
+_databases = {}
+_writers = {}
+_queues = {}
+_lock = threading.Lock()
+
+
+def database(path):
+    """The shared Database for this file, created on first use."""
+    key = os.path.abspath(path)
+    with _lock:
+        db = _databases.get(key)
+        if db is None:
+            db = _databases[key] = Database(path)
+    return db
+
+
+def sales_db():
+    return database(SALES_DB)
+
+
+def users_db():
+    return database(USERS_DB)
+
+
+def invoice_writer(group_window=0.0):
+    """The shared InvoiceWriter for sales.db with this group-commit window."""
+    with _lock:
+        writer = _writers.get(group_window)
+    if writer is None:
+        writer = InvoiceWriter(sales_db(), group_window)
+        with _lock:
+            writer = _writers.setdefault(group_window, writer)
+    return writer
+
+
+def invoice_queue():
+    """The shared, started WriteBehindQueue in front of invoice_writer()."""
+    writer = invoice_writer()
+    with _lock:
+        invoices = _queues.get(SALES_DB)
+        if invoices is None:
+            invoices = _queues[SALES_DB] = WriteBehindQueue(writer).start()
+    return invoices
+
+
+@atexit.register
+def close_all():
+    """Flush the write-behind queues, then close every connection (runs at exit)."""
+    with _lock:
+        queues = list(_queues.values())
+        databases = list(_databases.values())
+    for invoices in queues:
+        invoices.close()
+        if invoices.failed:
+            print(f"{len(invoices.failed)} invoices could not be saved")
+    for db in databases:
+        db.close()
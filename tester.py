@@ -1,46 +1,35 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import sqlite3
-import datetime
 import pandas as pd
-import cv2
-import numpy as np
 import time
 import threading
 import hashlib
-import sqlite3
 
-def save_to_sales_db(customer_name, detected_items, items_prices):
-    """Save sales data to the sales database."""
-    conn = sqlite3.connect("sales.db")
-    c = conn.cursor()
-
-    # Record each item sold in the database
-    for item, quantity in detected_items.items():
-        price = items_prices.get(item, 0)
-        total = price * quantity
-        date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+from backends import load_fastest_detector
+from detection_engine import DetectionEngine
+from detector_registry import get_detector, preload
+from schema import migrate
+from storage import invoice_queue, sales_db, users_db
 
-        c.execute('''INSERT INTO sales (customer_name, item_name, quantity, price, total, date)
-                     VALUES (?, ?, ?, ?, ?, ?)''', 
-                     (customer_name, item, quantity, price, total, date))
+# Model files (Ensure these paths are correct)
+CLASS_FILE = r'C:\Users\analo\object detection model\coco.names'
+WEIGHTS_PATH = r'C:\Users\analo\object detection model\frozen_inference_graph.pb'
+CONFIG_PATH = r'C:\Users\analo\object detection model\ssd_mobilenet_v3_large_coco_2020_01_14.pbtxt'
 
-    conn.commit()
-    conn.close()
+def save_to_sales_db(customer_name, detected_items, items_prices):
+    """Queue an invoice for the background writer, which saves it to the sales database."""
+    invoice_queue().save(customer_name, detected_items, items_prices)
 
 # -------------------
 # Database Setup for Users
 # -------------------
 def init_db():
     """Initialize the SQLite database with a users table if it doesn't exist."""
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-                    username TEXT PRIMARY KEY,
-                    password TEXT
-                )''')
-    conn.commit()
-    conn.close()
+    with users_db().transaction() as conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS users (
+                            username TEXT PRIMARY KEY,
+                            password TEXT
+                        )''')
 
 init_db()
 
@@ -82,16 +71,14 @@ class LoginApp:
         username = self.entry_username.get()
         password = self.entry_password.get()
 
-        conn = sqlite3.connect("users.db")
-        c = conn.cursor()
-        c.execute("SELECT * FROM users WHERE username = ? AND password = ?", (username, hash_password(password)))
-        result = c.fetchone()
-        conn.close()
+        result = users_db().execute("SELECT * FROM users WHERE username = ? AND password = ?",
+                                    (username, hash_password(password))).fetchone()
 
         if result:
             messagebox.showinfo("Login Successful", "Welcome!")
             self.master.destroy()  # Close login window
-            open_main_app()  # Open main application
+            login_time = time.perf_counter()
+            open_main_app(login_time)  # Open main application
         else:
             messagebox.showerror("Error", "Invalid username or password")
 
@@ -136,40 +123,31 @@ class RegisterWindow:
             messagebox.showerror("Error", "Incorrect Employer Password!")
             return
 
-        conn = sqlite3.connect("users.db")
-        c = conn.cursor()
-
         # Check if username already exists
-        c.execute("SELECT * FROM users WHERE username = ?", (username,))
-        if c.fetchone():
+        if users_db().execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone():
             messagebox.showerror("Error", "Username already taken!")
         else:
-            c.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, hash_password(password)))
-            conn.commit()
+            with users_db().transaction() as conn:
+                conn.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, hash_password(password)))
             messagebox.showinfo("Success", "Account created successfully!")
             self.window.destroy()  # Close the registration window
 
-        conn.close()
-
 # -------------------
 # Main Application (after login)
 # -------------------
 def reset_user_db():
     """Reset the users database (delete all records in the users table)."""
-    conn = sqlite3.connect("users.db")
-    c = conn.cursor()
-    c.execute("DELETE FROM users")  # Deletes all rows from the users table
-    conn.commit()
-    conn.close()
+    with users_db().transaction() as conn:
+        conn.execute("DELETE FROM users")  # Deletes all rows from the users table
     messagebox.showinfo("Database Reset", "User database has been reset.")
-def open_main_app():
+def open_main_app(login_time=None):
     """This function simulates the main application after login."""
     main_window = tk.Tk()
     main_window.title("Main Application")
     main_window.geometry("400x300")  # Set window size
 
     # Start Object Detection in a separate thread
-    threading.Thread(target=start_object_detection, daemon=True).start()
+    threading.Thread(target=start_object_detection, args=(login_time,), daemon=True).start()
 
     # Add a "Reset User Database" button to the main window
     reset_db_button = tk.Button(main_window, text="Reset User Database", command=reset_user_db)
@@ -186,148 +164,38 @@ def open_main_app():
 # -------------------
 # Object Detection and Billing
 # -------------------
-def start_object_detection():
+def start_object_detection(login_time=None):
     """Function to start object detection in a separate thread."""
-    thres = 0.45  # Confidence threshold
-    nms_threshold = 0.2
-    cap = cv2.VideoCapture(0)
-
-    # Load class names from coco.names file
-    classNames = []
-    classFile = r'C:\Users\analo\object detection model\coco.names'  # Ensure this path is correct
-    with open(classFile, 'rt') as f:
-        classNames = f.read().rstrip('\n').split('\n')
-
-    # Define objects of interest and prices
-    items_of_interest = {"bottle", "book", "toothbrush"}
     items_prices = {"bottle": 5, "book": 10, "toothbrush": 3}
 
-    # Tracking detected items
-    detected_items = {}  # Stores item counts
-    seen_items = set()   # Ensures each item is counted only once
-    last_detected_item = None  # Tracks the last detected item
-
-    # Load model files (Ensure these paths are correct)
-    weightsPath = r'C:\Users\analo\object detection model\frozen_inference_graph.pb'
-    configPath = r'C:\Users\analo\object detection model\ssd_mobilenet_v3_large_coco_2020_01_14.pbtxt'
-
-    # Load the pre-trained model
-    net = cv2.dnn_DetectionModel(weightsPath, configPath)
-    net.setInputSize(320, 320)
-    net.setInputScale(1.0 / 127.5)
-    net.setInputMean((127.5, 127.5, 127.5))
-    net.setInputSwapRB(True)
-
-    # Initialize FPS counter
-    prev_time = 0
-
-    while True:
-        success, img = cap.read()
-        if not success:
-            break
-
-        # Detect objects
-        classIds, confs, bbox = net.detect(img, confThreshold=thres)
-
-        if classIds is not None:
-            if isinstance(classIds, np.ndarray) and len(classIds) > 0:
-                indices = cv2.dnn.NMSBoxes(bbox, confs, thres, nms_threshold)
-
-                if len(indices) > 0:
-                    indices = indices.flatten()  # Flatten indices array
-
-                    for i in indices:
-                        classId = int(classIds[i]) if isinstance(classIds, np.ndarray) else int(classIds)
-                        confidence = float(confs[i]) if isinstance(confs, np.ndarray) else float(confs)
-                        box = bbox[i]
-
-                        class_name = classNames[classId - 1].lower()
-
-                        if class_name in items_of_interest and confidence > thres:
-                            # Draw bounding box and label
-                            cv2.rectangle(img, box, (0, 255, 0), 2)
-                            cv2.putText(img, f"{class_name.upper()} ({confidence:.2f})",
-                                       (box[0] + 10, box[1] + 30),
-                                       cv2.FONT_HERSHEY_COMPLEX, 0.8, (0, 255, 0), 2)
-
-                            # **Prevent Multiple Counting**
-                            if class_name not in seen_items:
-                                detected_items[class_name] = detected_items.get(class_name, 0) + 1
-                                seen_items.add(class_name)  # Mark as counted
-                                last_detected_item = class_name  # Store last detected item
-
-        # Create invoice panel
-        height, width = img.shape[:2]
-        panel_width = 320
-        white_panel = np.ones((height, panel_width, 3), dtype=np.uint8) * 255
-
-        # Invoice Header
-        cv2.putText(white_panel, "Invoice", (100, 40),
-                   cv2.FONT_HERSHEY_TRIPLEX, 0.8, (0, 0, 255), 2)
-
-        # Display detected items and prices
-        y_position = 80
-        total = 0
-        for item, count in detected_items.items():
-            price = items_prices[item]
-            item_total = price * count
-            total += item_total
-            cv2.putText(white_panel, f"{item}: {count} x ${price} = ${item_total}",
-                       (20, y_position), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 1)
-            y_position += 30
-
-        # Display total cost
-        cv2.putText(white_panel, f"Total: ${total}", (20, height - 60),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
-
-        # FPS Counter
-        curr_time = time.time()
-        fps = 1 / (curr_time - prev_time) if prev_time > 0 else 0
-        prev_time = curr_time
-        cv2.putText(img, f"FPS: {int(fps)}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-
-        # Combine main frame and invoice panel
-        combined = np.hstack((img, white_panel))
-        cv2.imshow("Object Detection & Billing System", combined)
-
-        # Handle key presses
-        key = cv2.waitKey(1)
-        if key == ord('q'):
-            break
-        elif key == ord('c'):  # Reset counts
-            detected_items.clear()
-            seen_items.clear()  # Reset seen items as well
-            last_detected_item = None
-        elif key == 13:  # Enter key to increase quantity
-            if last_detected_item:
-                detected_items[last_detected_item] += 1
-        elif key == ord('s'):  # Save invoice to database when 's' is pressed
-            customer_name = "Customer"  # You can get the customer name from another part of your system
-            save_to_sales_db(customer_name, detected_items, items_prices)
-            detected_items.clear()  # Reset the detected items after saving
-            seen_items.clear()
-
-    cap.release()
-    cv2.destroyAllWindows()
+    def save_invoice(detected_items, items_prices, total):
+        customer_name = "Customer"  # You can get the customer name from another part of your system
+        save_to_sales_db(customer_name, detected_items, items_prices)
+
+    # Reuse the detector preloaded at startup instead of reading the model files again
+    detector = get_detector(CLASS_FILE, WEIGHTS_PATH, CONFIG_PATH, loader=load_fastest_detector)
+    engine = DetectionEngine(
+        class_file=CLASS_FILE,
+        weights_path=WEIGHTS_PATH,
+        config_path=CONFIG_PATH,
+        items_prices=items_prices,
+        on_save=save_invoice,
+        net=detector.net,
+        class_names=detector.class_names)
+    engine.profiler.register("invoice_writer", invoice_queue().snapshot)
+    engine.run()
+    invoice_queue().flush()  # Saved invoices are in the database before the session ends
+    if engine.profiler.enabled:
+        print(invoice_queue().summary())
+        if login_time is not None and engine.first_result_at is not None:
+            print(f"Login to first detection: {engine.first_result_at - login_time:.2f} s")
 
 # -------------------
 # Sales Dashboard (After Object Detection)
 # -------------------
 def init_sales_db():
-    """Initialize the SQLite database with a sales table if it doesn't exist."""
-    conn = sqlite3.connect("sales.db")
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS sales (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    customer_name TEXT,
-                    item_name TEXT,
-                    quantity INTEGER,
-                    price REAL,
-                    total REAL,
-                    date TEXT
-                )''')
-    conn.commit()
-    conn.close()
+    """Create the sales database or upgrade it to the current schema (see schema.py)."""
+    migrate(sales_db())
 
 init_sales_db()
 
@@ -363,11 +231,7 @@ class SalesApp:
 
     def load_sales_data(self):
         """Load sales data from the database into the table."""
-        conn = sqlite3.connect("sales.db")
-        c = conn.cursor()
-        c.execute("SELECT * FROM sales")
-        rows = c.fetchall()
-        conn.close()
+        rows = sales_db().execute("SELECT * FROM sales").fetchall()
 
         for row in rows:
             self.tree.insert("", tk.END, values=row)
@@ -396,6 +260,8 @@ def open_sales_dashboard():
 # -------------------
 def start():
     """Initialize and run the login application."""
+    # Load and warm up the detector while the user is logging in
+    preload(CLASS_FILE, WEIGHTS_PATH, CONFIG_PATH, loader=load_fastest_detector)
     root = tk.Tk()
     login_app = LoginApp(root)
     root.mainloop()
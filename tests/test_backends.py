@@ -0,0 +1,63 @@
+import time
+
+import numpy as np
+import pytest
+
+from backends import Backend, load_fastest_backend
+from detector_registry import get_detector
+
+
+class SleepingBackend(Backend):
+    latency = 0.0
+
+    def __init__(self, name):
+        self.name = name
+
+    def detect_batch(self, frames, confThreshold=0.5):
+        time.sleep(self.latency * len(frames))
+        return [(np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32), np.empty((0, 4), dtype=np.int32))
+                for _ in frames]
+
+
+class SlowBackend(SleepingBackend):
+    latency = 0.01
+
+
+class FastBackend(SleepingBackend):
+    latency = 0.001
+
+
+def test_backend_needs_detect_batch():
+    class Incomplete(Backend):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_fastest_backend_wins():
+    backend = load_fastest_backend([(SlowBackend, ("slow",)), (FastBackend, ("fast",))], repeat=3)
+    assert isinstance(backend, FastBackend)
+
+
+def test_no_backend_available():
+    with pytest.raises(RuntimeError):
+        load_fastest_backend([])
+
+
+def test_registry_loads_with_the_given_loader_once_and_warms_it_up(tmp_path):
+    class_file = tmp_path / "coco.names"
+    class_file.write_text("person\nbottle\n")
+    loads = []
+
+    def loader(weights_path, config_path, input_size):
+        loads.append((weights_path, config_path, input_size))
+        return FastBackend("fast")
+
+    first = get_detector(str(class_file), "weights", "config", 192, loader=loader, timeout=5)
+    second = get_detector(str(class_file), "weights", "config", 192, loader=loader, timeout=5)
+    assert second is first
+    assert loads == [("weights", "config", 192)]
+    assert isinstance(first.net, FastBackend)
+    assert first.class_names == ["person", "bottle"]
+    assert first.warmup_seconds is not None
@@ -0,0 +1,42 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+from batch_detect import ITEMS_PRICES, run_batch
+from detection_engine import DetectionEngine, load_class_names
+from gating import MotionGate
+from tracking import DetectionScheduler
+
+BOTTLE = 44
+COCO_NAMES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "coco.names")
+
+
+class LabelledDetector:
+    """Finds one bottle in every image, wherever the image is."""
+
+    def detect(self, img, confThreshold=0.5):
+        return (np.array([BOTTLE], dtype=np.int32), np.array([0.9], dtype=np.float32),
+                np.array([[100, 80, 60, 120]], dtype=np.int32))
+
+
+def make_engine():
+    return DetectionEngine(None, None, None, ITEMS_PRICES, headless=True, net=LabelledDetector(),
+                           class_names=load_class_names(COCO_NAMES),
+                           scheduler=DetectionScheduler(max_interval=1), motion_gate=MotionGate(enabled=False))
+
+
+def test_image_folder_bills_every_image(tmp_path):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    for i in range(4):
+        cv2.imwrite(str(folder / f"{i}.png"), np.full((240, 320, 3), 40 * i, dtype=np.uint8))
+
+    summary = run_batch(make_engine(), str(folder), str(tmp_path / "out.jsonl"))
+
+    assert summary["frames"] == 4
+    assert summary["cart"] == {"bottle": 4}
+    assert summary["total"] == 4 * ITEMS_PRICES["bottle"]
+    lines = (tmp_path / "out.jsonl").read_text().splitlines()
+    assert json.loads(lines[-1])["summary"]["cart"] == {"bottle": 4}
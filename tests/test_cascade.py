@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from cascade import CascadeDetector
+
+BOTTLE, PERSON = 44, 1
+IMG = np.zeros((48, 64, 3), dtype=np.uint8)
+
+
+class FixedDetector:
+    """Reports the same rows above confThreshold on every frame and counts its calls."""
+
+    def __init__(self, rows):
+        self.class_ids = np.array([r[0] for r in rows], dtype=np.int32)
+        self.confs = np.array([r[1] for r in rows], dtype=np.float32)
+        self.boxes = np.tile(np.array([[10, 10, 40, 80]], dtype=np.int32), (len(rows), 1))
+        self.calls = 0
+
+    def detect(self, img, confThreshold=0.5):
+        self.calls += 1
+        keep = self.confs > confThreshold
+        return self.class_ids[keep], self.confs[keep], self.boxes[keep]
+
+
+@pytest.mark.parametrize("rows, escalates", [
+    ([(BOTTLE, 0.9)], False),  # A confident item of interest
+    ([(PERSON, 0.9)], False),  # A confident hand
+    ([(BOTTLE, 0.4)], True),  # A low-confidence item
+    ([(PERSON, 0.5)], True),  # A borderline other class may be a misread item
+    ([(BOTTLE, 0.9), (BOTTLE, 0.42)], True),
+    ([], False),  # Nothing on the tray
+])
+def test_full_model_runs_only_for_uncertain_candidates(rows, escalates):
+    first, full = FixedDetector(rows), FixedDetector([(BOTTLE, 0.8)])
+    cascade = CascadeDetector(first, full, thres=0.45, margin=0.1)
+    class_ids, confs, _ = cascade.detect(IMG, confThreshold=0.45)
+
+    assert first.calls == 1
+    assert full.calls == int(escalates)
+    assert cascade.full_runs == int(escalates)
+    if escalates:
+        assert class_ids.tolist() == [BOTTLE] and confs.tolist() == pytest.approx([0.8])
+
+
+def test_first_stage_looks_below_the_threshold_by_the_margin():
+    first = FixedDetector([(BOTTLE, 0.4), (PERSON, 0.3)])
+    cascade = CascadeDetector(first, FixedDetector([]), thres=0.45, margin=0.1)
+    cascade.detect(IMG, confThreshold=0.45)
+    # 0.4 is reported by the first stage (>= 0.35) and escalates; 0.3 alone would not
+    assert cascade.full_runs == 1
+    assert not cascade.needs_full([0.3])
+    assert not cascade.needs_full(None)
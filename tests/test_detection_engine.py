@@ -0,0 +1,218 @@
+import queue
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import detection_engine
+from detection_engine import CartEvent, DetectionEngine, LatestQueue
+from gating import MotionGate
+from postprocess import make_detections
+from preprocess import BlobPreprocessor
+from tracking import DetectionScheduler, MultiObjectTracker
+
+ITEMS_PRICES = {"bottle": 5, "book": 10}
+CLASS_NAMES = ["person", "bottle", "book"]
+
+
+class FakeCapture:
+    """cv2.VideoCapture stand-in that yields numbered frames (frame i is filled with i % 256)."""
+
+    def __init__(self, frames, error_at=None, interval=0.0):
+        self.frames = frames
+        self.error_at = error_at
+        self.interval = interval
+        self.read_count = 0
+        self.released = False
+
+    def read(self):
+        if self.read_count == self.error_at:
+            raise RuntimeError("camera unplugged")
+        if self.read_count >= self.frames:
+            return False, None
+        time.sleep(self.interval)
+        img = np.full((48, 64, 3), self.read_count % 256, dtype=np.uint8)
+        self.read_count += 1
+        return True, img
+
+    def release(self):
+        self.released = True
+
+
+class FakeNet:
+    """Finds nothing, takes `latency` seconds per frame and records the frames it saw."""
+
+    def __init__(self, latency=0.0, error_at=None):
+        self.latency = latency
+        self.error_at = error_at
+        self.seen = []
+
+    def detect(self, img, confThreshold=0.5):
+        if len(self.seen) == self.error_at:
+            raise ValueError("bad model output")
+        self.seen.append(int(img[0, 0, 0]))
+        time.sleep(self.latency)
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32), np.empty((0, 4), dtype=np.int32)
+
+
+@pytest.fixture
+def capture(monkeypatch):
+    """Make the engine read from a FakeCapture; set its attributes before run()."""
+    fake = FakeCapture(0)
+    monkeypatch.setattr(detection_engine.cv2, "VideoCapture", lambda source: fake)
+    return fake
+
+
+def make_engine(net, **options):
+    # Every frame goes to the detector, so what the net saw is what the pipeline delivered
+    return DetectionEngine(None, None, None, ITEMS_PRICES, headless=True, net=net, class_names=CLASS_NAMES,
+                           scheduler=DetectionScheduler(max_interval=1), motion_gate=MotionGate(enabled=False),
+                           **options)
+
+
+def run_with_timeout(engine, timeout=10):
+    """engine.run() on a helper thread; returns the exception it raised (or None)."""
+    outcome = []
+
+    def target():
+        try:
+            engine.run()
+            outcome.append(None)
+        except Exception as e:
+            outcome.append(e)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "run() did not shut down"
+    return outcome[0]
+
+
+def test_latest_queue_drops_the_oldest_item_when_full():
+    frames = LatestQueue()
+    assert frames.put(1) is None
+    assert frames.put(2) == 1
+    assert frames.put(3) == 2
+    assert frames.dropped == 2
+    assert frames.get() == 3
+    assert frames.get(timeout=0.01) is None
+
+
+def test_latest_queue_drains_before_reporting_closed():
+    frames = LatestQueue(maxsize=2)
+    frames.put(1)
+    frames.put(2)
+    frames.close()
+    assert [frames.get(), frames.get(), frames.get()] == [1, 2, None]
+    assert frames.closed
+
+
+def test_slow_detector_skips_stale_frames_but_sees_the_last_one(capture):
+    capture.frames = 60
+    net = FakeNet(latency=0.01)
+    engine = make_engine(net)
+    assert run_with_timeout(engine) is None
+
+    assert net.seen[-1] == capture.frames - 1
+    assert net.seen == sorted(net.seen)
+    assert len(net.seen) + engine.frames.dropped == capture.frames
+    assert engine.frames.dropped > 0
+    assert engine.processed_frames == len(net.seen)
+    assert capture.released
+
+
+def test_inference_error_is_raised_from_run(capture):
+    capture.frames, capture.interval = 1000, 0.001
+    engine = make_engine(FakeNet(error_at=3))
+    error = run_with_timeout(engine)
+    assert isinstance(error, ValueError)
+    assert capture.read_count < capture.frames  # The capture stage was stopped too
+    assert capture.released
+
+
+def test_capture_error_is_raised_from_run(capture):
+    capture.frames, capture.error_at = 100, 5
+    net = FakeNet()
+    error = run_with_timeout(make_engine(net))
+    assert isinstance(error, RuntimeError)
+    assert net.seen and net.seen[-1] <= 4
+
+
+def bottle_frame():
+    return make_detections([2], [0.9], [[40, 60, 80, 200]])
+
+
+def billing_engine(on_event, on_save=None):
+    engine = make_engine(FakeNet(), on_event=on_event, on_save=on_save)
+    engine.tracker = MultiObjectTracker(min_hits=1)
+    return engine
+
+
+def test_events_on_add_and_clear():
+    events = []
+    engine = billing_engine(events.append)
+    engine.update_bill(bottle_frame())
+    engine.apply_command('increase')
+    engine.apply_command('clear')
+
+    assert [(e.kind, e.item, e.quantity, e.items, e.total) for e in events] == [
+        ('item_added', 'bottle', 1, {'bottle': 1}, 5),
+        ('quantity_changed', 'bottle', 2, {'bottle': 2}, 10),
+        ('cart_cleared', None, None, {}, 0),
+    ]
+    assert engine.detected_items == {}
+
+
+def test_save_commits_and_empties_the_cart():
+    events, saved = [], []
+    engine = billing_engine(events.append, on_save=lambda items, prices, total: saved.append((items, total)))
+    engine.update_bill(bottle_frame())
+    engine.commit_invoice()  # Queued, applied by the render stage
+    assert saved == []
+    engine._apply_pending_commands()
+
+    assert saved == [({'bottle': 1}, 5)]
+    # The event carries the committed cart, which lanes.py saves from
+    assert (events[-1].kind, events[-1].items, events[-1].total) == ('invoice_committed', {'bottle': 1}, 5)
+    assert engine.detected_items == {}
+    # The paid bottle is still tracked, so it is not billed again
+    engine.update_bill(bottle_frame())
+    assert engine.detected_items == {}
+
+
+def test_unknown_commands_are_ignored():
+    events = []
+    engine = billing_engine(events.append)
+    engine.update_bill(bottle_frame())
+    engine.apply_command('refund')
+    assert engine.detected_items == {'bottle': 1}
+    assert [e.kind for e in events] == ['item_added']
+    assert not engine._quit
+
+
+def test_on_event_can_be_a_queue():
+    events = queue.Queue()
+    engine = billing_engine(events)
+    engine.update_bill(bottle_frame())
+    event = events.get_nowait()
+    assert isinstance(event, CartEvent)
+    assert (event.kind, event.item, event.items) == ('item_added', 'bottle', {'bottle': 1})
+
+
+class FakeBlobNet(FakeNet):
+    """FakeNet that takes ready-made blobs, like backends.OpenCVSSDBackend."""
+
+    def preprocessor(self, buffers=3):
+        return BlobPreprocessor(32, buffers=buffers)
+
+    def detect_blob(self, blob, width, height, confThreshold=0.5):
+        return self.detect(np.zeros((1, 1, 3), dtype=np.uint8), confThreshold)
+
+
+def test_capture_preprocessing_releases_the_blobs_of_dropped_frames(capture):
+    capture.frames = 200  # Far more frames than the 3 blob buffers
+    engine = make_engine(FakeBlobNet(latency=0.005), preprocess='capture')
+    assert run_with_timeout(engine) is None
+    assert engine.frames.dropped > 0
+    assert sorted(engine.preprocessor._free) == [0, 1, 2]
@@ -0,0 +1,64 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from frame_ring import FrameRing
+
+SHAPE = (4, 4, 3)
+
+
+def frame(value):
+    return np.full(SHAPE, value, dtype=np.uint8)
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing(SHAPE, slots=4)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+def reader_process(ring, results):
+    """Read the newest frame of a ring from another process and report (seq, first pixel)."""
+    seq, img = ring.reader().next(timeout=5.0)
+    results.put((seq, int(img[0, 0, 0]) if seq else None))
+    del img
+    ring.close()
+
+
+def test_wrap_around_keeps_only_the_newest_slots(ring):
+    for value in range(1, 11):
+        ring.write(frame(value))
+    assert ring.latest == 10
+    assert [ring.still_valid(seq) for seq in range(5, 11)] == [False, False, True, True, True, True]
+    assert [int(ring.read_latest(after)[1][0, 0, 0]) for after in (0, 9)] == [10, 10]
+
+
+def test_slow_consumer_sees_overrun_and_skips_to_the_newest(ring):
+    reader = ring.reader()
+    for value in range(1, 11):
+        ring.write(frame(value))
+    seq, img = reader.next(timeout=0)
+    assert seq == 10 and (img == 10).all() and reader.skipped == 0
+
+    # The slot of frame 10 is rewritten while the reader still uses it
+    for value in range(11, 15):
+        ring.write(frame(value))
+    assert not reader.done(10) and reader.overrun == 1
+    seq, img = reader.next(timeout=0)
+    assert seq == 14 and (img == 14).all() and reader.skipped == 3 and reader.done(14)
+    assert reader.next(timeout=0) == (None, None)
+    del img
+
+
+def test_another_process_reads_the_newest_frame(ring):
+    for value in range(1, 15):
+        ring.write(frame(value))
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=reader_process, args=(ring, results))
+    process.start()
+    assert results.get(timeout=30) == (14, 14)
+    process.join()
@@ -0,0 +1,33 @@
+import numpy as np
+
+from gating import MotionGate
+
+
+def tray(x=None, width=640, height=480):
+    """A noisy grey tray, with a bright 80x80 item at column x if given."""
+    img = np.random.default_rng(0).integers(60, 120, (height, width, 3), dtype=np.uint8)
+    if x is not None:
+        img[200:280, x:x + 80] = 230
+    return img
+
+
+def test_static_scene_skips_nearly_every_frame():
+    gate = MotionGate()
+    img = tray(100)
+    opened = [gate.changed(img) for _ in range(100)]
+    assert opened[0]
+    assert gate.skip_ratio >= 0.95
+
+
+def test_moving_item_skips_almost_nothing():
+    gate = MotionGate()
+    for x in range(0, 560, 20):
+        gate.changed(tray(x))
+    assert gate.skip_ratio <= 0.05
+
+
+def test_max_skip_forces_a_refresh():
+    gate = MotionGate(max_skip=10)
+    img = tray(100)
+    opened = [gate.changed(img) for _ in range(33)]
+    assert [i for i, o in enumerate(opened) if o] == [0, 11, 22]
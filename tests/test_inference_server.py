@@ -0,0 +1,96 @@
+import queue
+import threading
+import time
+
+import numpy as np
+from multiprocessing import shared_memory
+
+from inference_server import InferenceClient, Request, next_batch, serve
+
+INPUT_SIZE = 32
+
+
+def request(lane):
+    return Request(lane, 1, 1, time.perf_counter(), 0.5)
+
+
+def test_next_batch_stops_at_max_batch_size():
+    requests = queue.Queue()
+    for lane in range(5):
+        requests.put(request(lane))
+    batch, stop = next_batch(requests, 3, max_wait=1.0)
+    assert [r.lane for r in batch] == [0, 1, 2] and not stop
+    assert requests.qsize() == 2
+
+
+def test_next_batch_waits_at_most_max_wait_for_a_fuller_batch():
+    requests = queue.Queue()
+    requests.put(request(0))
+    start = time.perf_counter()
+    batch, stop = next_batch(requests, 8, max_wait=0.05)
+    waited = time.perf_counter() - start
+    assert len(batch) == 1 and not stop
+    assert 0.04 <= waited < 0.5
+
+
+def test_next_batch_sees_the_shutdown_sentinel():
+    requests = queue.Queue()
+    requests.put(None)
+    assert next_batch(requests, 8, 0.01) == ([], True)
+    requests.put(request(0))
+    requests.put(None)
+    batch, stop = next_batch(requests, 8, 0.01)
+    assert len(batch) == 1 and stop
+
+
+class PixelNetwork:
+    """Batch network stand-in: one detection per image whose class ID is the image's pixel value."""
+
+    def setInput(self, blob):
+        self.blob = blob
+
+    def forward(self):
+        images = len(self.blob)
+        rows = np.zeros((images, 7), dtype=np.float32)
+        rows[:, 0] = np.arange(images)
+        rows[:, 1] = np.round(self.blob.reshape(images, -1).mean(axis=1) * 127.5 + 127.5)
+        rows[:, 2] = 0.9
+        rows[:, 3:7] = [0.25, 0.25, 0.75, 0.75]
+        return rows.reshape(1, 1, -1, 7)
+
+
+def test_each_lane_gets_its_own_answer_back():
+    lanes = ["1", "2", "3", "4"]
+    shm = shared_memory.SharedMemory(create=True, size=len(lanes) * INPUT_SIZE * INPUT_SIZE * 3)
+    requests, responses, stats = queue.Queue(), [queue.Queue() for _ in lanes], queue.Queue()
+    server = threading.Thread(target=serve, args=(PixelNetwork(), None, None, shm.name, lanes, INPUT_SIZE, 8, 0.02,
+                                                  requests, responses, stats), daemon=True)
+    server.start()
+    try:
+        results = {}
+
+        def lane_loop(index):
+            client = InferenceClient(index, shm.name, len(lanes), INPUT_SIZE, requests, responses[index])
+            img = np.full((48, 64, 3), 10 * (index + 1), dtype=np.uint8)
+            results[index] = [client.detect(img) for _ in range(20)]
+
+        clients = [threading.Thread(target=lane_loop, args=(index,)) for index in range(len(lanes))]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join(10)
+        requests.put(None)
+        report = stats.get(timeout=10)
+    finally:
+        server.join(10)
+        shm.close()
+        shm.unlink()
+
+    for index in range(len(lanes)):
+        assert len(results[index]) == 20
+        for class_ids, confs, boxes in results[index]:
+            assert class_ids.tolist() == [10 * (index + 1)]
+            assert boxes.tolist() == [[16, 12, 32, 24]]  # The middle half of a 64x48 frame
+    assert report["frames"] == 80
+    assert report["batches"] < 80  # Concurrent lanes shared forward passes
+    assert set(report["lanes"]) == set(lanes)
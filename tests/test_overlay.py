@@ -0,0 +1,52 @@
+import tracemalloc
+
+import numpy as np
+
+from overlay import InvoiceOverlay
+
+ITEMS_PRICES = {"bottle": 5, "book": 10}
+# compose() allocates short-lived Python objects (shape tuples), a few hundred bytes a frame
+SMALL_ALLOCATION = 1024
+
+
+def frames(count, height=480, width=640):
+    return [np.random.default_rng(i).integers(0, 255, (height, width, 3), dtype=np.uint8) for i in range(count)]
+
+
+def test_compose_allocates_no_frame_buffers_once_warm():
+    overlay = InvoiceOverlay(ITEMS_PRICES)
+    images = frames(30)
+    cart = {"bottle": 2, "book": 1}
+    overlay.compose(images[0], cart)  # Allocates the output buffer and draws the panel
+    buffer = overlay.buffer
+
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        peaks = []
+        for img in images[1:]:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            overlay.compose(img, cart)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        retained = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+
+    assert overlay.buffer is buffer
+    assert max(peaks) < SMALL_ALLOCATION
+    assert retained < SMALL_ALLOCATION
+
+
+def test_compose_copies_the_frame_and_redraws_the_panel_when_invalidated():
+    overlay = InvoiceOverlay(ITEMS_PRICES)
+    first, second = frames(2)
+    np.testing.assert_array_equal(overlay.compose(first, {"bottle": 1}), first)
+    panel = overlay.panel.copy()
+
+    overlay.compose(second, {"bottle": 2})
+    np.testing.assert_array_equal(overlay.frame, second)
+    np.testing.assert_array_equal(overlay.panel, panel)  # Not invalidated, so not redrawn
+    overlay.invalidate()
+    overlay.compose(second, {"bottle": 2})
+    assert not np.array_equal(overlay.panel, panel)
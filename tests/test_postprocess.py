@@ -0,0 +1,75 @@
+import cv2
+import numpy as np
+import pytest
+
+from postprocess import interest_mask, postprocess
+
+CLASS_NAMES = ["person", "bicycle", "Bottle", "book", "cup"]
+ITEMS_OF_INTEREST = {"bottle", "book"}
+BOTTLE, BOOK, CUP = 3, 4, 5
+THRES, NMS_THRESHOLD = 0.45, 0.2
+MASK = interest_mask(CLASS_NAMES, ITEMS_OF_INTEREST)
+
+
+def per_box_loop(class_ids, confs, boxes):
+    """The per-detection loop postprocess() replaced: class-agnostic NMS, then a name lookup per box."""
+    detections = []
+    indices = cv2.dnn.NMSBoxes(boxes, confs, THRES, NMS_THRESHOLD)
+    for i in np.asarray(indices).flatten():
+        name = CLASS_NAMES[int(class_ids[i]) - 1].lower()
+        if name in ITEMS_OF_INTEREST and float(confs[i]) > THRES:
+            detections.append((int(class_ids[i]), float(confs[i]), list(boxes[i])))
+    return sorted(detections)
+
+
+def as_rows(detections):
+    return sorted((int(d['class_id']), float(d['confidence']), d['box'].tolist()) for d in detections)
+
+
+def test_interest_mask_is_case_insensitive_and_out_of_range_ids_are_false():
+    assert MASK.tolist() == [False, False, False, True, True, False, False]
+    assert not MASK[np.clip(99, 0, len(MASK) - 1)]
+
+
+def test_matches_the_per_box_loop_on_separate_boxes():
+    class_ids = np.array([BOTTLE, BOOK, BOTTLE, CUP, BOOK, 1], dtype=np.int32)
+    confs = np.array([0.9, 0.8, 0.85, 0.95, 0.3, 0.99], dtype=np.float32)
+    boxes = np.array([[10, 10, 50, 100], [200, 10, 80, 60], [14, 12, 50, 100],  # Two overlapping bottles
+                      [400, 300, 40, 40], [300, 300, 60, 60], [500, 10, 60, 150]], dtype=np.int32)
+    expected = per_box_loop(class_ids, confs, boxes)
+    assert as_rows(postprocess(class_ids, confs, boxes, MASK, THRES, NMS_THRESHOLD)) == expected
+    assert [class_id for class_id, _, _ in expected] == [BOTTLE, BOOK]
+
+
+def test_column_shaped_class_ids_are_accepted():
+    class_ids = np.array([[BOTTLE], [BOOK]], dtype=np.int32)
+    confs = np.array([[0.9], [0.8]], dtype=np.float32)
+    boxes = np.array([[10, 10, 50, 100], [200, 10, 80, 60]], dtype=np.int32)
+    detections = postprocess(class_ids, confs, boxes, MASK, THRES, NMS_THRESHOLD)
+    assert as_rows(detections) == per_box_loop(class_ids.ravel(), confs.ravel(), boxes)
+
+
+@pytest.mark.parametrize("raw", [
+    ((), (), ()),
+    (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32), np.empty((0, 4), dtype=np.int32)),
+    (None, None, None),
+])
+def test_no_raw_detections_give_an_empty_array(raw):
+    assert len(postprocess(*raw, MASK, THRES, NMS_THRESHOLD)) == 0
+
+
+def test_overlapping_boxes_of_different_classes_both_survive():
+    class_ids = np.array([BOTTLE, BOOK], dtype=np.int32)
+    confs = np.array([0.9, 0.8], dtype=np.float32)
+    boxes = np.array([[10, 10, 100, 100], [12, 12, 100, 100]], dtype=np.int32)
+    detections = postprocess(class_ids, confs, boxes, MASK, THRES, NMS_THRESHOLD)
+    assert sorted(detections['class_id'].tolist()) == [BOTTLE, BOOK]
+
+
+def test_uninteresting_classes_are_dropped_before_nms():
+    # A confident cup on top of a bottle must neither be kept nor suppress the bottle
+    class_ids = np.array([CUP, BOTTLE], dtype=np.int32)
+    confs = np.array([0.99, 0.7], dtype=np.float32)
+    boxes = np.array([[10, 10, 100, 100], [12, 12, 100, 100]], dtype=np.int32)
+    detections = postprocess(class_ids, confs, boxes, MASK, THRES, NMS_THRESHOLD)
+    assert detections['class_id'].tolist() == [BOTTLE]
@@ -0,0 +1,30 @@
+import cv2
+import numpy as np
+import pytest
+
+from preprocess import BlobPreprocessor
+
+
+@pytest.mark.parametrize("shape, size, swap_rb", [
+    ((480, 640, 3), 320, True),
+    ((720, 1280, 3), 192, True),
+    ((300, 300, 3), 416, False),
+])
+def test_blob_matches_blob_from_image(shape, size, swap_rb):
+    img = np.random.default_rng(0).integers(0, 255, shape, dtype=np.uint8)
+    preprocessor = BlobPreprocessor(size, swap_rb=swap_rb, buffers=2)
+    expected = cv2.dnn.blobFromImage(img, 1.0 / 127.5, (size, size), (127.5, 127.5, 127.5), swapRB=swap_rb)
+    for index in (0, 1):
+        blob = preprocessor(img, index)
+        assert blob.shape == expected.shape and blob.dtype == expected.dtype
+        assert np.abs(blob - expected).max() <= 1e-6
+
+
+def test_buffers_are_handed_out_once_until_released():
+    preprocessor = BlobPreprocessor(64, buffers=2)
+    first, second = preprocessor.acquire(), preprocessor.acquire()
+    assert first != second
+    with pytest.raises(RuntimeError):
+        preprocessor.acquire()
+    preprocessor.release(first)
+    assert preprocessor.acquire() == first
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import detection_engine
+from cascade import CascadeDetector
+from detection_engine import DetectionEngine
+from inference_server import InferenceClient
+from resolution import AdaptiveResolution
+
+ITEMS_PRICES = {"bottle": 5}
+CLASS_NAMES = ["person", "bottle"]
+
+
+class SizedDetector:
+    """A detector with an input_size attribute that finds nothing."""
+
+    def __init__(self, input_size=320):
+        self.input_size = input_size
+
+    def detect(self, img, confThreshold=0.5):
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32), np.empty((0, 4), dtype=np.int32)
+
+
+def make_engine(net, **options):
+    return DetectionEngine(None, None, None, ITEMS_PRICES, headless=True, net=net, class_names=CLASS_NAMES,
+                           **options)
+
+
+def test_frame_budget_resizes_the_net():
+    net = SizedDetector()
+    engine = make_engine(net, frame_budget=0.05)
+    assert isinstance(engine.net, AdaptiveResolution)
+    for _ in range(engine.net.patience):
+        engine.net.observe(1.0)
+    assert net.input_size < 320
+
+
+@pytest.mark.parametrize("net", [
+    CascadeDetector(SizedDetector(192), SizedDetector(320)),
+    InferenceClient(0, "unused", 1, 320, None, None),
+])
+def test_frame_budget_rejects_fixed_size_nets(net):
+    with pytest.raises(ValueError):
+        make_engine(net, frame_budget=0.05)
+
+
+class ResizableModel(SizedDetector):
+    """A cv2.dnn_DetectionModel-like net: resized through setInputSize(), no input_size attribute."""
+
+    def __init__(self):
+        self.sizes = []
+
+    def setInputSize(self, width, height):
+        self.sizes.append((width, height))
+
+
+class EmptyCapture:
+    def read(self):
+        return False, None
+
+    def release(self):
+        pass
+
+
+@pytest.mark.parametrize("net, size", [(SizedDetector(320), lambda net: net.input_size),
+                                       (ResizableModel(), lambda net: net.sizes[-1][0])])
+def test_run_restores_the_shared_net_size(net, size, monkeypatch):
+    monkeypatch.setattr(detection_engine.cv2, "VideoCapture", lambda source: EmptyCapture())
+    engine = make_engine(net, frame_budget=0.05)
+    for _ in range(engine.net.patience):
+        engine.net.observe(1.0)
+    assert size(net) < 320
+    engine.run()
+    assert size(net) == 320
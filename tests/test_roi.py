@@ -0,0 +1,35 @@
+import pickle
+import threading
+
+import numpy as np
+
+from roi import RegionOfInterest
+
+TRIANGLE = [(10, 10), (200, 20), (60, 150)]
+
+
+def frame(value):
+    return np.full((240, 320, 3), value, dtype=np.uint8)
+
+
+def test_polygon_crop_blanks_outside_pixels():
+    crop = RegionOfInterest(TRIANGLE).crop(frame(200))
+    assert crop[0, -1].tolist() == [0, 0, 0]
+    assert crop[20, 50].tolist() == [200, 200, 200]
+
+
+def test_threads_crop_into_their_own_buffers():
+    # The capture thread's crop must survive the inference thread cropping the next frame
+    roi = RegionOfInterest(TRIANGLE)
+    expected = roi.crop(frame(60)).copy()
+    captured = []
+    capture = threading.Thread(target=lambda: captured.append(roi.crop(frame(60))))
+    capture.start()
+    capture.join()
+    roi.crop(frame(180))
+    assert np.array_equal(captured[0], expected)
+
+
+def test_pickled_roi_still_crops():
+    roi = pickle.loads(pickle.dumps(RegionOfInterest(TRIANGLE)))
+    assert roi.crop(frame(90))[20, 50].tolist() == [90, 90, 90]
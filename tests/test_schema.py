@@ -0,0 +1,104 @@
+import datetime
+import time
+
+import pytest
+
+from schema import ROLLUPS, SALES_V1, SCHEMA_VERSION, check_rollups, migrate, schema_version
+from storage import Database, InvoiceWriter, day_bounds, day_lanes, day_summary, make_invoice, revenue_between
+
+INSERT_SALE = '''INSERT INTO sales (customer_name, item_name, quantity, price, total, date)
+                 VALUES (?, ?, ?, ?, ?, ?)'''
+PRICES = {"bottle": 5, "book": 10}
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / "sales.db"))
+    yield db
+    db.close()
+
+
+def legacy(db, rows):
+    with db.transaction() as conn:
+        conn.execute(SALES_V1)
+        conn.executemany(INSERT_SALE, rows)
+        conn.execute("PRAGMA user_version = 1")
+
+
+def test_lines_of_one_checkout_stamped_a_second_apart_form_one_invoice(db):
+    legacy(db, [
+        ("Customer", "bottle", 1, 5, 5, "2025-01-01 10:00:00"),
+        ("Customer", "book", 1, 10, 10, "2025-01-01 10:00:01"),
+        ("Customer", "toothbrush", 2, 3, 6, "2025-01-01 10:00:01"),
+        ("Customer", "bottle", 1, 5, 5, "2025-01-01 10:05:00"),
+        ("Ann", "book", 1, 10, 10, "2025-01-01 10:05:00"),
+        (None, "book", 1, 10, 10, "2025-01-01 10:06:00"),
+        (None, "bottle", 1, 5, 5, "2025-01-01 10:06:00"),
+    ])
+    assert migrate(db, None) == list(range(2, SCHEMA_VERSION + 1))
+
+    invoices = db.execute("SELECT id, customer, total_cents FROM invoices ORDER BY id").fetchall()
+    assert invoices == [(1, "Customer", 2100), (2, "Customer", 500), (3, "Ann", 1000), (4, None, 1500)]
+    lines = db.execute("SELECT id, invoice_id FROM invoice_lines ORDER BY id").fetchall()
+    assert [invoice for _, invoice in lines] == [1, 1, 1, 2, 3, 4, 4]
+    # Every line carries its invoice's time, the time of the invoice's first line
+    assert db.execute('''SELECT count(*) FROM invoice_lines l JOIN invoices i ON i.id = l.invoice_id
+                         WHERE l.date != i.date''').fetchone()[0] == 0
+
+
+def test_migrate_is_idempotent_and_keeps_the_sales_view(db):
+    legacy(db, [("Ann", "book", 2, 10.5, 21.0, "2025-01-02 09:30:00")])
+    migrate(db, None)
+    assert migrate(db, None) == []
+    assert schema_version(db) == SCHEMA_VERSION
+    assert db.execute("SELECT customer_name, item_name, quantity, price, total, date FROM sales").fetchall() == \
+        [("Ann", "book", 2, 10.5, 21.0, "2025-01-02 09:30:00")]
+
+
+def test_triggers_keep_the_rollups_correct(db):
+    migrate(db, None)
+    writer = InvoiceWriter(db)
+    start, _ = day_bounds(datetime.date(2025, 1, 1))
+    writer.write([make_invoice(f"Customer {i}", {"bottle": 1 + i % 3, "book": 1}, PRICES, start + 1500 * i,
+                               f"lane {i % 2}") for i in range(40)])
+    with db.transaction() as conn:
+        conn.execute("UPDATE invoice_lines SET quantity = quantity + 2, total_cents = total_cents + 2 * price_cents "
+                     "WHERE id % 3 = 0")
+        conn.execute("UPDATE invoices SET total_cents = (SELECT sum(total_cents) FROM invoice_lines "
+                     "WHERE invoice_id = invoices.id), lane = 'lane 2' WHERE id % 5 = 0")
+        conn.execute("UPDATE invoices SET date = date + 7200 WHERE id % 7 = 0")
+        conn.execute("DELETE FROM invoice_lines WHERE invoice_id % 4 = 0 OR id % 11 = 0")
+        conn.execute("DELETE FROM invoices WHERE id % 4 = 0")
+        assert check_rollups(conn) == {table: 0 for table in ROLLUPS}
+
+
+def test_day_reports_follow_local_midnight_with_a_half_hour_offset(db, monkeypatch):
+    monkeypatch.setenv("TZ", "Asia/Kolkata")  # UTC+5:30
+    time.tzset()
+    try:
+        migrate(db, None)
+        day = datetime.date(2025, 1, 2)
+        start, end = day_bounds(day)
+        # A bottle just inside and a book just outside both edges of the local day
+        InvoiceWriter(db).write([make_invoice("Customer", {item: 1}, PRICES, date)
+                                 for item, date in (("book", start - 60), ("bottle", start + 60),
+                                                    ("bottle", end - 60), ("book", end + 60))])
+        assert day_summary(db, day) == revenue_between(db, start, end) == (2, 1000)
+        assert sum(invoices for _, _, invoices, _ in day_lanes(db, day)) == 2
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+def test_a_new_database_does_not_import_an_exported_csv(db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "account").mkdir()
+    (tmp_path / "account" / "sales.csv").write_text("Customer,Item,Qty,Price,Total,Date\n"
+                                                    "Ann,book,1,10,10,2025-01-02 09:30:00\n")
+    assert migrate(db) == list(range(1, SCHEMA_VERSION + 1))
+    assert db.execute("SELECT count(*) FROM invoices").fetchone()[0] == 0
+
+    imported = Database(str(tmp_path / "imported.db"))
+    migrate(imported, "account/sales.csv")
+    assert imported.execute("SELECT customer, total_cents FROM invoices").fetchall() == [("Ann", 1000)]
+    imported.close()
@@ -0,0 +1,123 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from schema import migrate
+from storage import Database, InvoiceWriter, WriteBehindQueue
+
+CART = {"bottle": 2, "book": 1}
+PRICES = {"bottle": 5, "book": 10}
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / "sales.db"))
+    migrate(db, None)
+    yield db
+    db.close()
+
+
+def invoice_count(db):
+    return db.execute("SELECT count(*) FROM invoices").fetchone()[0]
+
+
+def test_save_racing_close_is_not_queued_behind_the_stop_sentinel(db):
+    invoices = WriteBehindQueue(InvoiceWriter(db)).start()
+    putting, release = threading.Event(), threading.Event()
+    put = invoices._queue.put
+
+    def slow_put(item, *args, **kwargs):
+        if item is not None:
+            putting.set()
+            release.wait(5)
+        put(item, *args, **kwargs)
+
+    invoices._queue.put = slow_put
+    saver = threading.Thread(target=invoices.save, args=("Customer", CART, PRICES))
+    saver.start()
+    putting.wait(5)
+    closer = threading.Thread(target=invoices.close)
+    closer.start()
+    closer.join(0.2)  # Let close() reach the sentinel while the save is mid-put
+    release.set()
+    saver.join(5)
+    closer.join(5)
+
+    flushed = threading.Thread(target=invoices.flush, daemon=True)
+    flushed.start()
+    flushed.join(5)
+    assert not flushed.is_alive()
+    assert invoice_count(db) == 1
+
+
+def test_flush_waits_for_queued_invoices(db):
+    invoices = WriteBehindQueue(InvoiceWriter(db)).start()
+    for _ in range(10):
+        invoices.save("Customer", CART, PRICES)
+    invoices.flush()
+    assert invoice_count(db) == 10
+    invoices.close()
+    invoices.save("Customer", CART, PRICES)  # Written inline once closed
+    assert invoice_count(db) == 11
+
+
+class SlowWriter(InvoiceWriter):
+    """An InvoiceWriter whose commits take long enough for concurrent saves to pile up."""
+
+    def __init__(self, db, **options):
+        super().__init__(db, **options)
+        self.groups = []
+
+    def write(self, invoices):
+        self.groups.append(len(invoices))
+        time.sleep(0.02)
+        super().write(invoices)
+
+
+def save_concurrently(writer, threads):
+    """Save one invoice per thread, all released at once; returns {customer: raised exception or None}."""
+    start = threading.Barrier(threads)
+    results = {}
+
+    def save(customer):
+        start.wait()
+        try:
+            writer.save(customer, CART, PRICES)
+            results[customer] = None
+        except Exception as e:
+            results[customer] = e
+
+    savers = [threading.Thread(target=save, args=(f"Customer {i}",), daemon=True) for i in range(threads)]
+    for saver in savers:
+        saver.start()
+    for saver in savers:
+        saver.join(10)
+    assert not any(saver.is_alive() for saver in savers), "a save() caller was left waiting"
+    return results
+
+
+def test_group_commit_writes_every_invoice_once_in_fewer_transactions(db):
+    writer = SlowWriter(db, group_window=0.05)
+    results = save_concurrently(writer, 16)
+    assert list(results.values()) == [None] * 16
+
+    customers = db.execute("SELECT customer FROM invoices").fetchall()
+    assert sorted(customer for customer, in customers) == sorted(results)
+    lines = db.execute("SELECT invoice_id, count(*) FROM invoice_lines GROUP BY invoice_id").fetchall()
+    assert len(lines) == 16 and all(count == len(CART) for _, count in lines)
+    assert writer.invoices == 16
+    assert writer.transactions < 16
+
+
+def test_failed_group_commit_raises_in_every_waiting_caller(db):
+    db.execute("CREATE TRIGGER forced_failure BEFORE INSERT ON invoices BEGIN SELECT RAISE(ABORT, 'forced'); END")
+    writer = SlowWriter(db, group_window=0.05)
+    results = save_concurrently(writer, 16)
+
+    assert len(results) == 16
+    assert all(isinstance(error, sqlite3.IntegrityError) for error in results.values())
+    assert max(writer.groups) > 1  # Followers shared the leader's failed transaction
+    assert invoice_count(db) == 0
+    assert writer.transactions == 0
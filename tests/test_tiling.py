@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from postprocess import postprocess
+from tiling import TiledDetector, tile_grid
+
+BOTTLE = 44
+
+
+@pytest.mark.parametrize("width, height, tile_size, overlap", [
+    (1920, 1080, 640, 0.2),
+    (800, 600, 320, 0.25),
+    (641, 639, 640, 0.1),
+    (300, 200, 640, 0.2),  # Smaller than one tile
+])
+def test_tiles_cover_the_image_with_overlap_and_stay_inside_it(width, height, tile_size, overlap):
+    grid = tile_grid(width, height, tile_size, overlap)
+    covered = np.zeros((height, width), dtype=bool)
+    for x, y, w, h in grid:
+        assert x >= 0 and y >= 0 and x + w <= width and y + h <= height
+        assert w == min(tile_size, width) and h == min(tile_size, height)
+        covered[y:y + h, x:x + w] = True
+    assert covered.all()
+
+    # The last row and column end on the image edge; neighbours overlap by at least `overlap`
+    for starts, length, size in ((np.unique(grid[:, 0]), width, grid[0, 2]),
+                                 (np.unique(grid[:, 1]), height, grid[0, 3])):
+        assert starts[0] == 0 and starts[-1] + size == length
+        assert all(size - step >= overlap * tile_size for step in np.diff(starts))
+
+
+class BrightSpotNetwork:
+    """Batch network stand-in: reports the bright pixels of each image as one bottle.
+
+    Rows are DetectionOutput-shaped, with coordinates relative to the image,
+    plus a padding row with image index -1 like the real network's output.
+    """
+
+    def __init__(self):
+        self.batches = []
+
+    def setInput(self, blob):
+        self.blob = blob
+
+    def forward(self):
+        self.batches.append(len(self.blob))
+        rows = [[-1, 0, 0, 0, 0, 0, 0]]
+        for index, image in enumerate(self.blob):
+            ys, xs = np.nonzero(image[0] > 0)
+            if len(xs):
+                height, width = image.shape[1:]
+                rows.append([index, BOTTLE, 0.9, xs.min() / width, ys.min() / height,
+                             (xs.max() + 1) / width, (ys.max() + 1) / height])
+        return np.array(rows, dtype=np.float32).reshape(1, 1, -1, 7)
+
+
+def test_tile_boxes_map_back_to_the_frame_and_merge_across_the_overlap():
+    img = np.zeros((600, 800, 3), dtype=np.uint8)
+    img[100:150, 250:300] = 255  # Inside the overlap of the first two tiles of the top row
+    img[400:460, 600:640] = 255  # Only in the bottom-right tiles
+    network = BrightSpotNetwork()
+    detector = TiledDetector(network, input_size=320, tile_size=320, overlap=0.25, batch_size=4)
+    class_ids, confs, boxes = detector.detect(img, confThreshold=0.5)
+
+    assert len(detector.tiles(img)) == 9
+    assert network.batches == [4, 4, 1]
+    # Every tile that saw an item reports it in frame coordinates
+    assert {tuple(box) for box in boxes.tolist()} == {(250, 100, 50, 50), (600, 400, 40, 60)}
+    assert boxes.tolist().count([250, 100, 50, 50]) == 2
+
+    mask = np.zeros(BOTTLE + 2, dtype=bool)
+    mask[BOTTLE] = True
+    merged = postprocess(class_ids, confs, boxes, mask, 0.45, 0.2)
+    assert sorted(merged['box'].tolist()) == [[250, 100, 50, 50], [600, 400, 40, 60]]
+
+
+def test_no_detections_in_any_tile():
+    detector = TiledDetector(BrightSpotNetwork(), input_size=320, tile_size=320)
+    class_ids, confs, boxes = detector.detect(np.zeros((600, 800, 3), dtype=np.uint8))
+    assert len(class_ids) == len(confs) == 0 and boxes.shape == (0, 4)
@@ -0,0 +1,85 @@
+import cv2
+import numpy as np
+
+from postprocess import empty_detections, make_detections
+from tracking import DetectionScheduler, MultiObjectTracker
+
+BOTTLE = 44
+
+
+def bottles(*boxes):
+    return make_detections([BOTTLE] * len(boxes), [0.9] * len(boxes), list(boxes))
+
+
+def textured_frame(shift=0, width=640, height=480):
+    """Smooth random texture that optical flow can follow, moved `shift` pixels to the right."""
+    noise = np.random.default_rng(0).integers(0, 255, (height, width), dtype=np.uint8)
+    gray = cv2.GaussianBlur(noise, (0, 0), 3)
+    gray = cv2.normalize(gray, None, 0, 255, cv2.NORM_MINMAX)
+    return cv2.cvtColor(np.roll(gray, shift, axis=1), cv2.COLOR_GRAY2BGR)
+
+
+class CountingDetector:
+    """Returns the same bottle box for every frame and records which frames it saw."""
+
+    def __init__(self):
+        self.frames = []
+
+    def __call__(self, img):
+        self.frames.append(img)
+        return bottles([200, 150, 120, 160])
+
+
+def billed(tracker, frames):
+    """Every (track_id, class_id) the tracker confirms over these frames."""
+    confirmed = []
+    for detections in frames:
+        confirmed += tracker.update(detections)
+    return confirmed
+
+
+def test_two_bottles_in_one_frame_bill_as_two():
+    tracker = MultiObjectTracker()
+    frame = bottles([40, 60, 80, 200], [300, 60, 80, 200])
+    confirmed = billed(tracker, [frame] * tracker.min_hits)
+    assert len(confirmed) == 2
+    assert {class_id for _, class_id in confirmed} == {BOTTLE}
+
+
+def test_one_bottle_across_many_frames_bills_once():
+    tracker = MultiObjectTracker()
+    frames = [bottles([40 + 3 * i, 60, 80, 200]) for i in range(100)]
+    assert len(billed(tracker, frames)) == 1
+
+
+def test_short_disappearance_is_not_billed_again():
+    tracker = MultiObjectTracker(max_misses=15)
+    frame = bottles([40, 60, 80, 200])
+    before = billed(tracker, [frame] * 10)
+    gone = billed(tracker, [empty_detections()] * (tracker.max_misses - 1))
+    after = billed(tracker, [frame] * 10)
+    assert len(before) == 1
+    assert gone == [] and after == []
+
+
+def test_long_disappearance_bills_a_new_item():
+    tracker = MultiObjectTracker(max_misses=5)
+    frame = bottles([40, 60, 80, 200])
+    billed(tracker, [frame] * 10)
+    billed(tracker, [empty_detections()] * (tracker.max_misses + 1))
+    assert len(billed(tracker, [frame] * 10)) == 1
+
+
+def test_scheduler_detects_every_interval_frames_and_propagates_in_between():
+    scheduler = DetectionScheduler(min_interval=4, max_interval=4)
+    detect = CountingDetector()
+    frames = [textured_frame(2 * i) for i in range(12)]
+    results = [scheduler.process(img, detect) for img in frames]
+
+    assert [any(seen is img for seen in detect.frames) for img in frames] == [i % 4 == 0 for i in range(12)]
+    assert scheduler.detector_calls == 3
+    assert scheduler.saved_calls == 9
+    # Between detections the box follows the texture, 2 pixels per frame
+    for i, detections in enumerate(results):
+        assert len(detections) == 1
+        assert abs(detections['box'][0, 0] - (200 + 2 * (i % 4))) <= 1
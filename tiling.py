@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+
+
+# -------------------
+# Tile Layout
+# -------------------
+def tile_grid(width, height, tile_size, overlap):
+    """(N, 4) array of x, y, w, h tiles of at most tile_size covering the image.
+
+    Neighbouring tiles overlap by at least `overlap` (a fraction of the tile
+    size) so an item cut by one tile edge is whole in the next tile. The last
+    row and column are aligned to the image edge instead of running past it.
+    """
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        stride = max(1, int(tile_size * (1.0 - overlap)))
+        positions = list(range(0, length - tile_size, stride))
+        return positions + [length - tile_size]
+
+    tile_w, tile_h = min(tile_size, width), min(tile_size, height)
+    return np.array([(x, y, tile_w, tile_h) for y in starts(height) for x in starts(width)], dtype=np.int32)
+
+
+# -------------------
+# Tiled Detector
+# -------------------
+class TiledDetector:
+    """Detect small items in high-resolution frames by running overlapping tiles.
+
+    All tiles of a frame are preprocessed with one blobFromImages call and
+    run through the raw SSD network in batches of `batch_size`. detect()
+    returns the same (class IDs, confidences, boxes) as
+    cv2.dnn_DetectionModel.detect, in frame coordinates, so the engine's
+    class-aware NMS in postprocess() merges the duplicates that the tile
+    overlap produces.
+    """
+
+    def __init__(self, network, input_size=320, tile_size=640, overlap=0.2, batch_size=8):
+        self.network = network
+        self.input_size = input_size
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.batch_size = batch_size
+        self._grid = None
+        self._grid_shape = None
+
+    def tiles(self, img):
+        """Tile layout for this frame size, computed once per size."""
+        if self._grid_shape != img.shape[:2]:
+            self._grid_shape = img.shape[:2]
+            self._grid = tile_grid(img.shape[1], img.shape[0], self.tile_size, self.overlap)
+        return self._grid
+
+    def detect(self, img, confThreshold=0.5):
+        grid = self.tiles(img)
+        crops = [img[y:y + h, x:x + w] for x, y, w, h in grid]
+        outputs = []
+        for first in range(0, len(crops), self.batch_size):
+            batch = crops[first:first + self.batch_size]
+            blob = cv2.dnn.blobFromImages(batch, 1.0 / 127.5, (self.input_size, self.input_size),
+                                          (127.5, 127.5, 127.5), swapRB=True)
+            self.network.setInput(blob)
+            # DetectionOutput rows: [image in batch, class ID, confidence, x1, y1, x2, y2]
+            out = self.network.forward().reshape(-1, 7)
+            out = out[(out[:, 0] >= 0) & (out[:, 2] > confThreshold)]
+            out[:, 0] += first
+            outputs.append(out)
+
+        rows = np.concatenate(outputs) if outputs else np.empty((0, 7), dtype=np.float32)
+        tiles = grid[rows[:, 0].astype(np.intp)].astype(np.float32)
+        x1 = tiles[:, 0] + rows[:, 3] * tiles[:, 2]
+        y1 = tiles[:, 1] + rows[:, 4] * tiles[:, 3]
+        x2 = tiles[:, 0] + rows[:, 5] * tiles[:, 2]
+        y2 = tiles[:, 1] + rows[:, 6] * tiles[:, 3]
+        boxes = np.stack([x1, y1, x2 - x1, y2 - y1], axis=1).round().astype(np.int32)
+        return rows[:, 1].astype(np.int32), rows[:, 2].astype(np.float32), boxes
@@ -0,0 +1,281 @@
+import time
+
+import cv2
+import numpy as np
+
+from postprocess import empty_detections
+
+
+# -------------------
+# Box Propagation Between Detections
+# -------------------
+class BoxPropagator:
+    """Carry the last detections forward with sparse optical flow.
+
+    A small grid of points inside every box is tracked with pyramidal
+    Lucas-Kanade on a downscaled grayscale frame; each box moves by the median
+    displacement of its points. confidence is the fraction of points that were
+    tracked reliably, so it drops when items are moved, covered or removed.
+    """
+
+    def __init__(self, scale=0.5, grid=3, max_error=20.0):
+        self.scale = scale
+        self.grid = grid
+        self.max_error = max_error
+        self.detections = empty_detections()
+        self.confidence = 0.0
+        self._prev_gray = None
+        self._points = None
+
+    def _gray(self, img):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        if self.scale != 1.0:
+            gray = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def _grid_points(self, boxes):
+        """(N, grid*grid, 2) points spread evenly inside each (x, y, w, h) box."""
+        boxes = boxes.astype(np.float32) * self.scale
+        steps = (np.arange(self.grid, dtype=np.float32) + 0.5) / self.grid
+        xs = boxes[:, 0, None, None] + boxes[:, 2, None, None] * steps[None, None, :]
+        ys = boxes[:, 1, None, None] + boxes[:, 3, None, None] * steps[None, :, None]
+        xs, ys = np.broadcast_arrays(xs, ys)
+        return np.stack([xs, ys], axis=-1).reshape(len(boxes), -1, 2)
+
+    def reset(self, img, detections):
+        """Start propagating a fresh set of detections from this frame."""
+        self.detections = detections.copy()
+        self.confidence = 1.0
+        self._prev_gray = self._gray(img)
+        if len(detections):
+            self._points = self._grid_points(detections['box']).reshape(-1, 1, 2)
+        else:
+            self._points = None
+
+    def update(self, img):
+        """Move the stored boxes onto this frame and return the propagated detections."""
+        gray = self._gray(img)
+        if self._points is None or self._prev_gray is None:
+            self._prev_gray = gray
+            return self.detections
+
+        new_points, status, error = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, self._points, None)
+        per_box = self.grid * self.grid
+        good = ((status.ravel() == 1) & (error.ravel() < self.max_error)).reshape(-1, per_box)
+        shift = (new_points - self._points).reshape(-1, per_box, 2)
+
+        # Median shift of the well-tracked points; boxes with none stay put
+        tracked = good.any(axis=1)
+        median_shift = np.zeros((len(good), 2), dtype=np.float32)
+        if tracked.any():
+            moved = np.where(good[tracked, :, None], shift[tracked], np.nan)
+            median_shift[tracked] = np.nanmedian(moved, axis=1)
+
+        propagated = self.detections.copy()
+        propagated['box'][:, :2] += np.round(median_shift / self.scale).astype(np.int32)
+
+        self.detections = propagated
+        self.confidence = float(good.mean(axis=1).min())
+        self._prev_gray = gray
+        self._points = new_points
+        return propagated
+
+
+# -------------------
+# Detect-every-N Scheduler
+# -------------------
+class DetectionScheduler:
+    """Decide on which frames the full detector has to run.
+
+    The detector runs every `interval` frames, or earlier when the propagated
+    boxes lose confidence. The interval adapts so that the average per-frame
+    cost of one detection plus (interval - 1) cheap propagations fits the
+    target frame rate.
+    """
+
+    def __init__(self, target_fps=15.0, min_interval=1, max_interval=8, min_confidence=0.6,
+                 smoothing=0.2):
+        self.target_fps = target_fps
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.min_confidence = min_confidence
+        self.smoothing = smoothing
+        self.propagator = BoxPropagator()
+        self.interval = min_interval
+
+        self.frames = 0
+        self.detector_calls = 0
+        self._since_detection = None
+        self._detect_time = None
+        self._track_time = None
+
+    def _average(self, previous, sample):
+        return sample if previous is None else previous + self.smoothing * (sample - previous)
+
+    def _adapt_interval(self):
+        """Pick the smallest interval whose average frame cost fits the budget."""
+        if self._detect_time is None:
+            return
+        # Until a propagation has been timed, assume it is free
+        track_time = self._track_time or 0.0
+        budget = 1.0 / self.target_fps
+        if self._detect_time <= budget:
+            interval = self.min_interval
+        elif track_time >= budget:
+            interval = self.max_interval
+        else:
+            interval = int(np.ceil((self._detect_time - track_time) / (budget - track_time)))
+        self.interval = max(self.min_interval, min(self.max_interval, interval))
+
+    def should_detect(self):
+        """True when the next frame has to go through the full detector."""
+        return (self._since_detection is None
+                or self._since_detection >= self.interval
+                or self.propagator.confidence < self.min_confidence)
+
+    def process(self, img, detect):
+        """Return detections for this frame, calling detect(img) only when needed."""
+        self.frames += 1
+        start = time.perf_counter()
+        if self.should_detect():
+            detections = detect(img)
+            self.propagator.reset(img, detections)
+            self.detector_calls += 1
+            self._since_detection = 1
+            self._detect_time = self._average(self._detect_time, time.perf_counter() - start)
+        else:
+            detections = self.propagator.update(img)
+            self._since_detection += 1
+            self._track_time = self._average(self._track_time, time.perf_counter() - start)
+        self._adapt_interval()
+        return detections
+
+    @property
+    def saved_calls(self):
+        """Number of frames that were served by propagation instead of the detector."""
+        return self.frames - self.detector_calls
+
+    def summary(self):
+        """One-line report of how much detector work was skipped."""
+        saved_pct = 100.0 * self.saved_calls / self.frames if self.frames else 0.0
+        return (f"Detector ran on {self.detector_calls}/{self.frames} frames, "
+                f"saved {self.saved_calls} calls ({saved_pct:.0f}%), current interval {self.interval}")
+
+
+# -------------------
+# Per-instance Multi-object Tracker
+# -------------------
+def iou_matrix(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) arrays of x, y, w, h boxes."""
+    ax1, ay1 = a[:, 0:1], a[:, 1:2]
+    ax2, ay2 = ax1 + a[:, 2:3], ay1 + a[:, 3:4]
+    bx1, by1 = b[:, 0], b[:, 1]
+    bx2, by2 = bx1 + b[:, 2], by1 + b[:, 3]
+    inter_w = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None)
+    inter_h = np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    inter = inter_w * inter_h
+    union = a[:, 2:3] * a[:, 3:4] + b[:, 2] * b[:, 3] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+class MultiObjectTracker:
+    """Give every physical item on the tray its own track ID.
+
+    Detections are matched to existing tracks of the same class by IoU, with a
+    centroid-distance fallback for small or fast-moving boxes. A track is
+    confirmed after min_hits matches and dropped after max_misses frames
+    without one, so an item is counted exactly once while it stays in view
+    and flickering detections do not create extra items.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_distance=0.5, min_hits=3, max_misses=15):
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+        self.reset()
+
+    def reset(self):
+        """Forget every track, so items still in view are counted again."""
+        self.ids = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 4), dtype=np.float32)
+        self.class_ids = np.empty(0, dtype=np.int32)
+        self.hits = np.empty(0, dtype=np.int32)
+        self.misses = np.empty(0, dtype=np.int32)
+        self.confirmed = np.empty(0, dtype=bool)
+        self._next_id = 1
+
+    def _cost_matrix(self, det_boxes, det_classes):
+        """Match cost per (track, detection); np.inf where they may not be matched."""
+        iou = iou_matrix(self.boxes, det_boxes)
+        track_centers = self.boxes[:, :2] + self.boxes[:, 2:] / 2
+        det_centers = det_boxes[:, :2] + det_boxes[:, 2:] / 2
+        distance = np.linalg.norm(track_centers[:, None, :] - det_centers[None, :, :], axis=2)
+        diagonal = np.hypot(self.boxes[:, 2], self.boxes[:, 3])[:, None]
+        distance /= np.maximum(diagonal, 1e-6)
+
+        # IoU matches always rank ahead of centroid-only matches
+        cost = np.where(iou >= self.iou_threshold, 1.0 - iou, 1.0 + distance)
+        allowed = (iou >= self.iou_threshold) | (distance < self.max_distance)
+        allowed &= self.class_ids[:, None] == det_classes[None, :]
+        cost[~allowed] = np.inf
+        return cost
+
+    def _assign(self, cost):
+        """Greedy lowest-cost assignment; returns matched (track, detection) index arrays."""
+        rows, cols = np.nonzero(np.isfinite(cost))
+        order = np.argsort(cost[rows, cols], kind='stable')
+        used_tracks = np.zeros(cost.shape[0], dtype=bool)
+        used_dets = np.zeros(cost.shape[1], dtype=bool)
+        matched_tracks, matched_dets = [], []
+        for r, c in zip(rows[order], cols[order]):
+            if not used_tracks[r] and not used_dets[c]:
+                used_tracks[r] = used_dets[c] = True
+                matched_tracks.append(r)
+                matched_dets.append(c)
+        return np.array(matched_tracks, dtype=np.intp), np.array(matched_dets, dtype=np.intp)
+
+    def update(self, detections):
+        """Feed one frame's detection array.
+
+        Returns the (track_id, class_id) pairs that were confirmed on this
+        frame, i.e. the items that should be added to the bill.
+        """
+        det_boxes = detections['box'].astype(np.float32)
+        det_classes = detections['class_id']
+
+        matched_tracks, matched_dets = self._assign(self._cost_matrix(det_boxes, det_classes))
+
+        # Matched tracks follow their detection; the rest age by one miss
+        matched = np.zeros(len(self.ids), dtype=bool)
+        matched[matched_tracks] = True
+        self.boxes[matched_tracks] = det_boxes[matched_dets]
+        self.hits[matched_tracks] += 1
+        self.misses[matched_tracks] = 0
+        self.misses[~matched] += 1
+
+        newly_confirmed = ~self.confirmed & (self.hits >= self.min_hits)
+        self.confirmed |= newly_confirmed
+        confirmed = list(zip(self.ids[newly_confirmed].tolist(), self.class_ids[newly_confirmed].tolist()))
+
+        # Drop tracks that have been gone too long
+        keep = self.misses <= self.max_misses
+        self.ids, self.boxes, self.class_ids = self.ids[keep], self.boxes[keep], self.class_ids[keep]
+        self.hits, self.misses, self.confirmed = self.hits[keep], self.misses[keep], self.confirmed[keep]
+
+        # Start tentative tracks for unmatched detections
+        unmatched = np.ones(len(det_boxes), dtype=bool)
+        unmatched[matched_dets] = False
+        count = int(unmatched.sum())
+        if count:
+            self.ids = np.concatenate([self.ids, np.arange(self._next_id, self._next_id + count)])
+            self._next_id += count
+            self.boxes = np.concatenate([self.boxes, det_boxes[unmatched]])
+            self.class_ids = np.concatenate([self.class_ids, det_classes[unmatched]])
+            self.hits = np.concatenate([self.hits, np.ones(count, dtype=np.int32)])
+            self.misses = np.concatenate([self.misses, np.zeros(count, dtype=np.int32)])
+            self.confirmed = np.concatenate([self.confirmed, np.zeros(count, dtype=bool)])
+            if self.min_hits <= 1:
+                self.confirmed[-count:] = True
+                confirmed += list(zip(self.ids[-count:].tolist(), det_classes[unmatched].tolist()))
+        return confirmed